@@ -32,19 +32,19 @@ const BookDetail: React.FC = () => {
     if (!id) return
 
     try {
-      const response = await booksApi.getById(id)
+      // Requested together so both go out in one batch request
+      const [response, reservationsResponse] = await Promise.all([
+        booksApi.getById(id),
+        isLibrarian ? reservationsApi.getBookReservations(id) : null,
+      ])
       if (response.data.success && response.data.data) {
         setBook(response.data.data.book)
         setCurrentLoan(response.data.data.current_loan)
         setReservationCount(response.data.data.reservation_count)
       }
 
-      // Fetch reservations if librarian
-      if (isLibrarian) {
-        const reservationsResponse = await reservationsApi.getBookReservations(id)
-        if (reservationsResponse.data.success && reservationsResponse.data.data) {
-          setReservations(reservationsResponse.data.data)
-        }
+      if (reservationsResponse?.data.success && reservationsResponse.data.data) {
+        setReservations(reservationsResponse.data.data)
       }
     } catch (error) {
       console.error("Error fetching book details:", error)
@@ -214,6 +214,7 @@ const BookDetail: React.FC = () => {
               <dt className="text-sm font-medium text-gray-500">Status</dt>
               <dd className="mt-1 text-sm text-gray-900">
                 {book.is_available ? "Available for loan" : "Currently on loan"}
+                {book.total_copies !== undefined && ` (${book.available_copies} of ${book.total_copies} copies free)`}
               </dd>
             </div>
             {reservationCount > 0 && (
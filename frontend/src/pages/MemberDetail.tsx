@@ -67,7 +67,7 @@ const MemberDetail: React.FC = () => {
     )
   }
 
-  const { member, active_loans, loan_history, reservations } = memberData
+  const { member, summary, active_loans, loan_history, reservations } = memberData
 
   return (
     <div className="px-4 py-6 sm:px-0">
@@ -119,7 +119,18 @@ const MemberDetail: React.FC = () => {
             </div>
             <div>
               <dt className="text-sm font-medium text-gray-500">Active Loans</dt>
-              <dd className="mt-1 text-sm text-gray-900">{active_loans.length}</dd>
+              <dd className="mt-1 text-sm text-gray-900">
+                {summary.active_loans}
+                {summary.overdue_loans > 0 && <span className="text-red-600"> ({summary.overdue_loans} overdue)</span>}
+              </dd>
+            </div>
+            <div>
+              <dt className="text-sm font-medium text-gray-500">Lifetime Loans</dt>
+              <dd className="mt-1 text-sm text-gray-900">{summary.lifetime_loans}</dd>
+            </div>
+            <div>
+              <dt className="text-sm font-medium text-gray-500">Total Fines</dt>
+              <dd className="mt-1 text-sm text-gray-900">${summary.total_fines}</dd>
             </div>
             {member.address && (
               <div className="sm:col-span-2">
@@ -143,13 +154,16 @@ const MemberDetail: React.FC = () => {
                 <li key={loan.name} className="px-4 py-4 sm:px-6">
                   <div className="flex items-center justify-between">
                     <div>
-                      <p className="text-sm font-medium text-gray-900">{loan.book}</p>
+                      <p className="text-sm font-medium text-gray-900">{loan.book_title || loan.book}</p>
+                      {loan.book_author && <p className="text-sm text-gray-500">{loan.book_author}</p>}
                       <p className="text-sm text-gray-500">Loaned: {loan.loan_date}</p>
                     </div>
                     <div className="text-right">
                       <p className="text-sm text-gray-900">Due: {loan.return_date}</p>
-                      {new Date(loan.return_date) < new Date() && (
-                        <p className="text-sm text-red-600 font-medium">Overdue</p>
+                      {loan.overdue_days > 0 && (
+                        <p className="text-sm text-red-600 font-medium">
+                          Overdue {loan.overdue_days} {loan.overdue_days === 1 ? "day" : "days"}
+                        </p>
                       )}
                     </div>
                   </div>
@@ -172,7 +186,8 @@ const MemberDetail: React.FC = () => {
                 <li key={reservation.name} className="px-4 py-4 sm:px-6">
                   <div className="flex items-center justify-between">
                     <div>
-                      <p className="text-sm font-medium text-gray-900">{reservation.book}</p>
+                      <p className="text-sm font-medium text-gray-900">{reservation.book_title || reservation.book}</p>
+                      {reservation.book_author && <p className="text-sm text-gray-500">{reservation.book_author}</p>}
                       <p className="text-sm text-gray-500">Reserved: {reservation.reserve_date}</p>
                     </div>
                     <div className="text-right">
@@ -185,6 +200,9 @@ const MemberDetail: React.FC = () => {
                       >
                         {reservation.status}
                       </span>
+                      {reservation.queue_position && (
+                        <p className="text-sm text-gray-500 mt-1">#{reservation.queue_position} in queue</p>
+                      )}
                       {reservation.expiry_date && (
                         <p className="text-sm text-gray-500 mt-1">Expires: {reservation.expiry_date}</p>
                       )}
@@ -209,7 +227,7 @@ const MemberDetail: React.FC = () => {
                 <li key={loan.name} className="px-4 py-4 sm:px-6">
                   <div className="flex items-center justify-between">
                     <div>
-                      <p className="text-sm font-medium text-gray-900">{loan.book}</p>
+                      <p className="text-sm font-medium text-gray-900">{loan.book_title || loan.book}</p>
                       <p className="text-sm text-gray-500">
                         {loan.loan_date} - {loan.actual_return_date}
                       </p>
@@ -1,5 +1,5 @@
 import axios, { type AxiosResponse } from "axios"
-import type { ApiResponse, Book, Member, Loan, Reservation, User, LibraryStats } from "../types"
+import type { ApiResponse, Book, BulkResult, Member, MemberSummary, Loan, Reservation, User, LibraryStats } from "../types"
 
 const API_BASE = "/api/method/library_app.api"
 
@@ -12,18 +12,49 @@ const api = axios.create({
   withCredentials: true,
 })
 
+// Responses that carried an ETag, by request URL, replayed when the server answers 304
+const MAX_ETAG_ENTRIES = 200
+const etagCache = new Map<string, { etag: string; data: unknown }>()
+
 // Request interceptor to add auth token
 api.interceptors.request.use((config) => {
   const token = localStorage.getItem("auth_token")
   if (token) {
     config.headers.Authorization = `Bearer ${token}`
   }
+
+  // Revalidate a response we already hold instead of downloading it again
+  const cached = config.method === "get" ? etagCache.get(api.getUri(config)) : undefined
+  if (cached) {
+    config.headers["If-None-Match"] = cached.etag
+    config.validateStatus = (status) => (status >= 200 && status < 300) || status === 304
+  }
   return config
 })
 
 // Response interceptor to handle errors
 api.interceptors.response.use(
-  (response) => response,
+  (response) => {
+    if (response.config.method !== "get") {
+      return response
+    }
+
+    const key = api.getUri(response.config)
+    const cached = etagCache.get(key)
+    if (response.status === 304 && cached) {
+      return { ...response, status: 200, data: cached.data }
+    }
+
+    const etag = response.headers["etag"]
+    if (etag) {
+      etagCache.delete(key)
+      etagCache.set(key, { etag, data: response.data })
+      if (etagCache.size > MAX_ETAG_ENTRIES) {
+        etagCache.delete(etagCache.keys().next().value as string)
+      }
+    }
+    return response
+  },
   (error) => {
     if (error.response?.status === 401) {
       localStorage.removeItem("auth_token")
@@ -33,6 +64,61 @@ api.interceptors.response.use(
   },
 )
 
+// Read calls made in the same tick are coalesced into one batch.batch request;
+// a call left on its own is sent as a plain GET so it keeps its ETag
+const MAX_BATCH_CALLS = 20
+
+// Batches run serially; the reports are slow enough that two or more of them
+// are worth running side by side on the server
+const isSlowCall = (call: PendingCall) => call.method.startsWith("reports.")
+
+type PendingCall = {
+  method: string
+  args: Record<string, unknown>
+  resolve: (response: AxiosResponse<any>) => void
+  reject: (error: unknown) => void
+}
+
+let pendingCalls: PendingCall[] = []
+
+const sendBatch = async (calls: PendingCall[]) => {
+  if (calls.length === 1) {
+    const [call] = calls
+    api.get(`/${call.method}`, { params: call.args }).then(call.resolve, call.reject)
+    return
+  }
+
+  try {
+    const response = await api.post<ApiResponse<any[]>>("/batch.batch", {
+      calls: calls.map(({ method, args }) => ({ method, args })),
+      ...(calls.filter(isSlowCall).length > 1 && { parallel: 1 }),
+    })
+    const results = response.data.data
+    if (!response.data.success || !results) {
+      throw new Error(response.data.error || "Batch request failed")
+    }
+    calls.forEach((call, i) => call.resolve({ ...response, data: results[i] }))
+  } catch (error) {
+    calls.forEach((call) => call.reject(error))
+  }
+}
+
+const flushCalls = () => {
+  const calls = pendingCalls
+  pendingCalls = []
+  for (let i = 0; i < calls.length; i += MAX_BATCH_CALLS) {
+    sendBatch(calls.slice(i, i + MAX_BATCH_CALLS))
+  }
+}
+
+const batched = <T>(method: string, args: Record<string, unknown> = {}): Promise<AxiosResponse<T>> =>
+  new Promise((resolve, reject) => {
+    pendingCalls.push({ method, args, resolve, reject })
+    if (pendingCalls.length === 1) {
+      queueMicrotask(flushCalls)
+    }
+  })
+
 // Auth API
 export const authApi = {
   login: (email: string, password: string): Promise<AxiosResponse<ApiResponse<{ user: User }>>> =>
@@ -48,6 +134,10 @@ export const authApi = {
   }): Promise<AxiosResponse<ApiResponse<{ membership_id: string; email: string }>>> =>
     api.post("/auth.register_member", data),
 
+  registerMany: (
+    members: { full_name: string; email: string; password?: string; phone?: string }[],
+  ): Promise<AxiosResponse<ApiResponse<BulkResult[]>>> => api.post("/auth.register_members", { members }),
+
   getCurrentUser: (): Promise<AxiosResponse<ApiResponse<{ user: User }>>> => api.get("/auth.get_current_user"),
 
   changePassword: (oldPassword: string, newPassword: string): Promise<AxiosResponse<ApiResponse<null>>> =>
@@ -60,10 +150,13 @@ export const booksApi = {
     filters?: any
     limit?: number
     start?: number
+    cursor?: string
+    with_total?: 0 | 1
   }): Promise<AxiosResponse<ApiResponse<Book[]>>> => api.get("/book.get_all_books", { params }),
 
   getById: (
     id: string,
+    fields?: (keyof Book)[],
   ): Promise<
     AxiosResponse<
       ApiResponse<{
@@ -72,7 +165,7 @@ export const booksApi = {
         reservation_count: number
       }>
     >
-  > => api.get("/book.get_book", { params: { book_id: id } }),
+  > => batched("book.get_book", { book_id: id, fields: fields?.join(",") }),
 
   create: (data: Partial<Book>): Promise<AxiosResponse<ApiResponse<Book>>> => api.post("/book.create_book", data),
 
@@ -81,6 +174,9 @@ export const booksApi = {
 
   delete: (id: string): Promise<AxiosResponse<ApiResponse<null>>> => api.post("/book.delete_book", { book_id: id }),
 
+  addCopies: (id: string, count: number, location?: string): Promise<AxiosResponse<ApiResponse<string[]>>> =>
+    api.post("/book.add_book_copies", { book_id: id, count, location }),
+
   search: (query: string, limit?: number): Promise<AxiosResponse<ApiResponse<Book[]>>> =>
     api.get("/book.search_books", { params: { query, limit } }),
 }
@@ -91,20 +187,24 @@ export const membersApi = {
     filters?: any
     limit?: number
     start?: number
+    cursor?: string
+    with_total?: 0 | 1
   }): Promise<AxiosResponse<ApiResponse<Member[]>>> => api.get("/member.get_all_members", { params }),
 
   getById: (
     id: string,
+    fields?: (keyof Member)[],
   ): Promise<
     AxiosResponse<
       ApiResponse<{
         member: Member
+        summary: MemberSummary
         active_loans: any[]
         loan_history: any[]
         reservations: any[]
       }>
     >
-  > => api.get("/member.get_member", { params: { member_id: id } }),
+  > => batched("member.get_member", { member_id: id, fields: fields?.join(",") }),
 
   create: (data: Partial<Member>): Promise<AxiosResponse<ApiResponse<Member>>> =>
     api.post("/member.create_member", data),
@@ -117,6 +217,14 @@ export const membersApi = {
 
   search: (query: string, limit?: number): Promise<AxiosResponse<ApiResponse<Member[]>>> =>
     api.get("/member.search_members", { params: { query, limit } }),
+
+  checkEligibility: (
+    memberIds: string[],
+  ): Promise<
+    AxiosResponse<
+      ApiResponse<Record<string, { can_borrow: boolean; message: string; active_loans: number; overdue_loans: number }>>
+    >
+  > => api.post("/member.check_borrowing_eligibility", { members: memberIds }),
 }
 
 // Loans API
@@ -125,6 +233,8 @@ export const loansApi = {
     filters?: any
     limit?: number
     start?: number
+    cursor?: string
+    with_total?: 0 | 1
   }): Promise<AxiosResponse<ApiResponse<Loan[]>>> => api.get("/loan.get_all_loans", { params }),
 
   create: (data: {
@@ -136,6 +246,13 @@ export const loansApi = {
   returnBook: (loanId: string, actualReturnDate?: string): Promise<AxiosResponse<ApiResponse<Loan>>> =>
     api.post("/loan.return_book", { loan_id: loanId, actual_return_date: actualReturnDate }),
 
+  bulkCreate: (
+    loans: { book: string; member: string; return_date?: string }[],
+  ): Promise<AxiosResponse<ApiResponse<BulkResult[]>>> => api.post("/loan.bulk_create_loans", { loans }),
+
+  bulkReturn: (loanIds: string[], actualReturnDate?: string): Promise<AxiosResponse<ApiResponse<BulkResult[]>>> =>
+    api.post("/loan.bulk_return_books", { loan_ids: loanIds, actual_return_date: actualReturnDate }),
+
   getActive: (): Promise<AxiosResponse<ApiResponse<any[]>>> => api.get("/loan.get_active_loans"),
 
   getOverdue: (): Promise<AxiosResponse<ApiResponse<any[]>>> => api.get("/loan.get_overdue_loans"),
@@ -152,13 +269,13 @@ export const reservationsApi = {
   }): Promise<AxiosResponse<ApiResponse<Reservation>>> => api.post("/reservation.create_reservation", data),
 
   getMemberReservations: (memberId: string): Promise<AxiosResponse<ApiResponse<any[]>>> =>
-    api.get("/reservation.get_member_reservations", { params: { member: memberId } }),
+    batched("reservation.get_member_reservations", { member: memberId }),
 
   cancel: (reservationId: string): Promise<AxiosResponse<ApiResponse<null>>> =>
     api.post("/reservation.cancel_reservation", { reservation_id: reservationId }),
 
   getBookReservations: (bookId: string): Promise<AxiosResponse<ApiResponse<any[]>>> =>
-    api.get("/reservation.get_book_reservations", { params: { book: bookId } }),
+    batched("reservation.get_book_reservations", { book: bookId }),
 }
 
 // Reports API
@@ -170,7 +287,7 @@ export const reportsApi = {
         statistics: any
       }>
     >
-  > => api.get("/reports.get_active_loans_report"),
+  > => batched("reports.get_active_loans_report"),
 
   getOverdueBooks: (): Promise<
     AxiosResponse<
@@ -179,13 +296,24 @@ export const reportsApi = {
         statistics: any
       }>
     >
-  > => api.get("/reports.get_overdue_books_report"),
+  > => batched("reports.get_overdue_books_report"),
+
+  exportActiveLoans: (
+    fileFormat: "csv" | "parquet" = "csv",
+  ): Promise<AxiosResponse<ApiResponse<{ file_url: string; format: string; rows: number; statistics: any }>>> =>
+    api.post("/reports.export_active_loans_report", { file_format: fileFormat }),
+
+  exportOverdueBooks: (
+    fileFormat: "csv" | "parquet" = "csv",
+  ): Promise<AxiosResponse<ApiResponse<{ file_url: string; format: string; rows: number; statistics: any }>>> =>
+    api.post("/reports.export_overdue_books_report", { file_format: fileFormat }),
 
-  getPopularBooks: (limit?: number): Promise<AxiosResponse<ApiResponse<any[]>>> =>
-    api.get("/reports.get_popular_books_report", { params: { limit } }),
+  getPopularBooks: (limit?: number, window?: 30 | 90 | 365): Promise<AxiosResponse<ApiResponse<any[]>>> =>
+    batched("reports.get_popular_books_report", { limit, window }),
 
   getMemberActivity: (limit?: number): Promise<AxiosResponse<ApiResponse<any[]>>> =>
-    api.get("/reports.get_member_activity_report", { params: { limit } }),
+    batched("reports.get_member_activity_report", { limit }),
 
-  getLibraryStats: (): Promise<AxiosResponse<ApiResponse<LibraryStats>>> => api.get("/reports.get_library_statistics"),
+  getLibraryStats: (forceRefresh?: boolean): Promise<AxiosResponse<ApiResponse<LibraryStats>>> =>
+    forceRefresh ? api.post("/reports.refresh_library_statistics") : batched("reports.get_library_statistics"),
 }
@@ -5,6 +5,8 @@ export interface Book {
   isbn?: string
   publish_date?: string
   is_available: boolean
+  total_copies?: number
+  available_copies?: number
   description?: string
   category?: string
 }
@@ -20,6 +22,13 @@ export interface Member {
   status: "Active" | "Inactive" | "Suspended"
 }
 
+export interface MemberSummary {
+  lifetime_loans: number
+  total_fines: number
+  active_loans: number
+  overdue_loans: number
+}
+
 export interface Loan {
   name: string
   book: string
@@ -28,6 +37,9 @@ export interface Loan {
   return_date: string
   actual_return_date?: string
   returned: boolean
+  book_copy?: string
+  is_overdue?: boolean
+  overdue_bucket?: "" | "1-7 Days" | "8-30 Days" | "Over 30 Days"
   fine_amount?: number
   notes?: string
 }
@@ -56,7 +68,18 @@ export interface ApiResponse<T> {
   data?: T
   error?: string
   message?: string
-  total?: number
+  total?: number | null
+  next_cursor?: string | null
+}
+
+export interface BulkResult {
+  index: number
+  success: boolean
+  loan?: string
+  fine_amount?: number
+  member?: string
+  membership_id?: string
+  error?: string
 }
 
 export interface LibraryStats {
@@ -1,7 +1,12 @@
 import frappe
 from frappe import _
 from frappe.auth import LoginManager
-from frappe.utils import cint
+from frappe.utils import cint, now, today
+from library_app import membership, projection, response_cache, statistics
+
+# Largest batch accepted by register_members, and members committed per chunk
+MAX_BULK_MEMBERS = 5000
+REGISTER_CHUNK_SIZE = 200
 
 @frappe.whitelist(allow_guest=True)
 def login(usr, pwd):
@@ -101,25 +106,141 @@ def register_member(full_name, email, password, phone=None):
 
 def generate_membership_id():
 	"""Generate unique membership ID"""
-	from datetime import datetime
+	return membership.allocate_membership_ids(1)[0]
+
+@frappe.whitelist()
+def register_members(members):
+	"""Register many members in one call, reporting a result per item
+	
+	`members` is a list of {"full_name", "email", "phone", "password"} items.
+	Existing emails are looked up once per chunk, membership IDs are reserved
+	as one block and Member rows are inserted in bulk. Each chunk is
+	committed, so a failure part way keeps the members already registered.
+	"""
+	try:
+		frappe.has_permission("Member", "create", throw=True)
+		
+		items = frappe.parse_json(members) or []
+		if len(items) > MAX_BULK_MEMBERS:
+			return {"success": False, "error": f"At most {MAX_BULK_MEMBERS} members can be registered at once"}
+		
+		results = []
+		seen = set()
+		for start in range(0, len(items), REGISTER_CHUNK_SIZE):
+			results.extend(register_chunk(items[start:start + REGISTER_CHUNK_SIZE], start, seen))
+			frappe.db.commit()
+		
+		created = sum(1 for result in results if result["success"])
+		return {
+			"success": True,
+			"data": results,
+			"created": created,
+			"failed": len(items) - created
+		}
+	except Exception as e:
+		# Only the failing chunk is uncommitted; without the rollback its
+		# users would be committed at the end of the request with no member
+		frappe.db.rollback()
+		frappe.log_error(f"Error registering members in bulk: {str(e)}")
+		return {"success": False, "error": str(e)}
+
+def register_chunk(items, offset, seen):
+	"""Validate and register one chunk of members, returning a result per item"""
+	emails = list({(item.get("email") or "").strip().lower() for item in items} - {""})
+	existing = set()
+	if emails:
+		existing = set(frappe.get_all("User", filters={"name": ["in", emails]}, pluck="name"))
+		existing |= set(frappe.get_all("Member", filters={"email": ["in", emails]}, pluck="email"))
+	
+	results = {}
+	accepted = []
+	for index, item in enumerate(items, start=offset):
+		full_name = (item.get("full_name") or "").strip()
+		email = (item.get("email") or "").strip().lower()
+		member = frappe.get_doc({
+			"doctype": "Member",
+			"name1": full_name,
+			"email": email,
+			"phone": item.get("phone"),
+			"join_date": today(),
+			"status": "Active"
+		})
+		
+		error = None
+		if not full_name:
+			error = "Full name is required"
+		elif not email:
+			error = "Email is required"
+		elif email in existing:
+			error = f"User with email {email} already exists"
+		elif email in seen:
+			error = f"Email {email} appears twice in the batch"
+		else:
+			try:
+				member.validate_email()
+				member.validate_phone()
+			except frappe.ValidationError as e:
+				error = str(e)
+		
+		if error:
+			results[index] = {"index": index, "success": False, "error": error}
+			continue
+		
+		seen.add(email)
+		accepted.append((index, member, item.get("password")))
 	
-	year = datetime.now().year
+	membership_ids = membership.allocate_membership_ids(len(accepted))
 	
-	# Get the last membership ID for this year
-	last_member = frappe.db.sql("""
-		SELECT membership_id FROM `tabMember`
-		WHERE membership_id LIKE %(pattern)s
-		ORDER BY membership_id DESC
-		LIMIT 1
-	""", {"pattern": f"LIB-{year}-%"})
+	registered = []
+	for (index, member, password), membership_id in zip(accepted, membership_ids):
+		full_name = member.name1
+		user = frappe.get_doc({
+			"doctype": "User",
+			"email": member.email,
+			"first_name": full_name.split()[0],
+			"last_name": " ".join(full_name.split()[1:]),
+			"full_name": full_name,
+			"new_password": password,
+			"user_type": "Website User",
+			"send_welcome_email": 0,
+			"roles": [{"role": "Library Member"}]
+		})
+		
+		# One bad user must not undo the rest of the chunk
+		frappe.db.savepoint("register_member")
+		try:
+			user.insert(ignore_permissions=True)
+		except Exception as e:
+			frappe.db.rollback(save_point="register_member")
+			results[index] = {"index": index, "success": False, "error": str(e)}
+			continue
+		
+		member.name = frappe.generate_hash(length=10)
+		member.membership_id = membership_id
+		member.before_save()
+		registered.append(member)
+		results[index] = {"index": index, "success": True, "member": member.name, "membership_id": membership_id}
 	
-	if last_member:
-		last_id = last_member[0][0]
-		sequence = int(last_id.split('-')[2]) + 1
-	else:
-		sequence = 1
+	if registered:
+		timestamp = now()
+		frappe.db.bulk_insert("Member",
+			fields=[
+				"name", "name1", "membership_id", "email", "phone", "join_date", "status",
+				"creation", "modified", "owner", "modified_by"
+			],
+			values=[(
+				member.name, member.name1, member.membership_id, member.email, member.phone, member.join_date, member.status,
+				timestamp, timestamp, frappe.session.user, frappe.session.user
+			) for member in registered]
+		)
+		
+		statistics.update_statistics({
+			"total_members": len(registered),
+			"active_members": len(registered)
+		})
+		response_cache.invalidate(("Member", None))
 	
-	return f"LIB-{year}-{sequence:03d}"
+	return [results[index] for index in sorted(results)]
 
 @frappe.whitelist()
 def get_current_user():
@@ -133,8 +254,9 @@ def get_current_user():
 		
 		# Get member record if exists
 		member = None
-		if frappe.db.exists("Member", {"email": user.email}):
-			member = frappe.get_doc("Member", {"email": user.email})
+		member_name = frappe.db.get_value("Member", {"email": user.email})
+		if member_name:
+			member = projection.get_projection("Member", member_name)
 		
 		user_type = "member"
 		if "System Manager" in roles:
@@ -150,7 +272,7 @@ def get_current_user():
 				"email": user.email,
 				"roles": roles,
 				"user_type": user_type,
-				"member": member.as_dict() if member else None
+				"member": member
 			}
 		}
 	except Exception as e:
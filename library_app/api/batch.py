@@ -0,0 +1,97 @@
+import frappe
+from frappe import _
+from frappe.utils import cint
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_BATCH_CALLS = 20
+
+# Threads, each with its own database connection, for parallel read-only calls
+MAX_PARALLEL_CALLS = 4
+
+# The only methods that can be batched: they only read, so a failing call
+# cannot undo another, and they may run side by side on separate connections
+READ_ONLY_METHODS = {
+	"auth.get_current_user",
+	"book.get_all_books",
+	"book.get_book",
+	"book.search_books",
+	"member.get_all_members",
+	"member.get_member",
+	"member.search_members",
+	"member.check_borrowing_eligibility",
+	"loan.get_all_loans",
+	"loan.get_active_loans",
+	"loan.get_overdue_loans",
+	"reservation.get_member_reservations",
+	"reservation.get_book_reservations",
+	"reports.get_active_loans_report",
+	"reports.get_overdue_books_report",
+	"reports.get_popular_books_report",
+	"reports.get_member_activity_report",
+	"reports.get_library_statistics"
+}
+
+@frappe.whitelist()
+def batch(calls, parallel=0):
+	"""Run several read-only API calls in one request, returning a result per call
+
+	`calls` is a list of {"method": "book.get_book", "args": {...}} items,
+	with methods relative to library_app.api and limited to READ_ONLY_METHODS.
+	Writes are refused, since endpoints such as create_loan roll back or
+	commit the whole transaction themselves. Results come back in the
+	caller's order; with `parallel` set, the calls run side by side.
+	"""
+	try:
+		calls = frappe.parse_json(calls) or []
+		if len(calls) > MAX_BATCH_CALLS:
+			return {"success": False, "error": f"At most {MAX_BATCH_CALLS} calls can be batched at once"}
+
+		if cint(parallel) and len(calls) > 1:
+			results = run_parallel(calls)
+		else:
+			results = [run_call(call) for call in calls]
+
+		return {
+			"success": True,
+			"data": results
+		}
+	except Exception as e:
+		frappe.log_error(f"Error running batch: {str(e)}")
+		return {"success": False, "error": str(e)}
+
+def get_method(method):
+	"""Resolve a batched method name, allowing only read-only API methods"""
+	if method not in READ_ONLY_METHODS:
+		frappe.throw(_("Method {0} cannot be batched").format(method), frappe.PermissionError)
+
+	fn = frappe.get_attr(f"library_app.api.{method}")
+	frappe.is_whitelisted(fn)
+	return fn
+
+def run_call(call):
+	"""Run one sub-call, turning an exception into a failed result"""
+	try:
+		return frappe.call(get_method(call.get("method")), **(call.get("args") or {}))
+	except Exception as e:
+		frappe.clear_messages()
+		return {"success": False, "error": str(e)}
+
+def run_parallel(calls):
+	"""Run sub-calls in worker threads, each connected as the caller"""
+	site = frappe.local.site
+	sites_path = frappe.local.sites_path
+	user = frappe.session.user
+
+	def worker(call):
+		frappe.init(site=site, sites_path=sites_path)
+		try:
+			frappe.connect()
+			frappe.set_user(user)
+			return run_call(call)
+		except Exception as e:
+			return {"success": False, "error": str(e)}
+		finally:
+			frappe.destroy()
+
+	with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_CALLS, len(calls))) as executor:
+		return list(executor.map(worker, calls))
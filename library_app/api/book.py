@@ -1,12 +1,34 @@
 import frappe
 from frappe import _
+from frappe.utils import cint
+from library_app.pagination import get_estimated_count, get_keyset_page
+from library_app import inventory, projection, response_cache, search
 
 @frappe.whitelist()
-def get_all_books(filters=None, fields=None, limit=20, start=0):
-	"""Get all books with optional filters"""
+def get_all_books(filters=None, fields=None, limit=20, start=0, cursor=None, with_total=1):
+	"""Get all books with optional filters
+	
+	Pass `cursor` (empty for the first page) to page by keyset instead of offset;
+	the response then carries `next_cursor` and a cached `total` estimate.
+	"""
 	try:
 		if not fields:
-			fields = ["name", "title", "author", "isbn", "publish_date", "is_available", "category"]
+			fields = ["name", "title", "author", "isbn", "publish_date", "is_available", "available_copies", "total_copies", "category"]
+		
+		if cursor is not None:
+			books, next_cursor = get_keyset_page("Book", "title",
+				filters=filters,
+				fields=fields,
+				limit=limit,
+				cursor=cursor
+			)
+			
+			return {
+				"success": True,
+				"data": books,
+				"next_cursor": next_cursor,
+				"total": get_estimated_count("Book", filters) if cint(with_total) else None
+			}
 		
 		books = frappe.get_all("Book", 
 			filters=filters or {},
@@ -19,21 +41,27 @@ def get_all_books(filters=None, fields=None, limit=20, start=0):
 		return {
 			"success": True,
 			"data": books,
-			"total": frappe.db.count("Book", filters or {})
+			"total": frappe.db.count("Book", filters or {}) if cint(with_total) else None
 		}
 	except Exception as e:
 		frappe.log_error(f"Error fetching books: {str(e)}")
 		return {"success": False, "error": str(e)}
 
 @frappe.whitelist()
-def get_book(book_id):
-	"""Get single book details"""
+@response_cache.cached(tags=lambda book_id, fields=None: [("Book", book_id)])
+def get_book(book_id, fields=None):
+	"""Get single book details
+	
+	`fields` picks the Book fields returned, defaulting to projection.DEFAULT_FIELDS.
+	"""
 	try:
-		book = frappe.get_doc("Book", book_id)
+		fields = projection.parse_fields("Book", fields)
+		book = projection.get_projection("Book", book_id, [*fields, "is_available"])
+		is_available = book.is_available if "is_available" in fields else book.pop("is_available")
 		
 		# Get current loan info if book is not available
 		current_loan = None
-		if not book.is_available:
+		if not is_available:
 			loan = frappe.get_all("Loan",
 				filters={"book": book_id, "returned": 0},
 				fields=["name", "member", "return_date"],
@@ -42,6 +70,12 @@ def get_book(book_id):
 			if loan:
 				current_loan = loan[0]
 		
+		copies = frappe.get_all("Book Copy",
+			filters={"book": book_id},
+			fields=["name", "barcode", "status", "location"],
+			order_by="barcode asc"
+		)
+		
 		# Get reservation count
 		reservation_count = frappe.db.count("Reservation", {
 			"book": book_id,
@@ -51,8 +85,9 @@ def get_book(book_id):
 		return {
 			"success": True,
 			"data": {
-				"book": book.as_dict(),
+				"book": book,
 				"current_loan": current_loan,
+				"copies": copies,
 				"reservation_count": reservation_count
 			}
 		}
@@ -63,8 +98,8 @@ def get_book(book_id):
 		return {"success": False, "error": str(e)}
 
 @frappe.whitelist()
-def create_book(title, author, isbn=None, publish_date=None, description=None, category=None):
-	"""Create a new book"""
+def create_book(title, author, isbn=None, publish_date=None, description=None, category=None, copies=1, location=None):
+	"""Create a new book with `copies` physical copies shelved at `location`"""
 	try:
 		book = frappe.get_doc({
 			"doctype": "Book",
@@ -73,14 +108,15 @@ def create_book(title, author, isbn=None, publish_date=None, description=None, c
 			"isbn": isbn,
 			"publish_date": publish_date,
 			"description": description,
-			"category": category,
-			"is_available": 1
+			"category": category
 		})
+		book.flags.initial_copies = cint(copies)
+		book.flags.copy_location = location
 		book.insert()
 		
 		return {
 			"success": True,
-			"data": book.as_dict(),
+			"data": projection.project(book),
 			"message": "Book created successfully"
 		}
 	except Exception as e:
@@ -103,7 +139,7 @@ def update_book(book_id, **kwargs):
 		
 		return {
 			"success": True,
-			"data": book.as_dict(),
+			"data": projection.project(book),
 			"message": "Book updated successfully"
 		}
 	except frappe.DoesNotExistError:
@@ -112,6 +148,29 @@ def update_book(book_id, **kwargs):
 		frappe.log_error(f"Error updating book {book_id}: {str(e)}")
 		return {"success": False, "error": str(e)}
 
+@frappe.whitelist()
+def add_book_copies(book_id, count=1, location=None):
+	"""Register more physical copies of a book"""
+	try:
+		frappe.has_permission("Book Copy", "create", throw=True)
+		book = frappe.get_doc("Book", book_id)
+
+		copies = inventory.add_copies(book.name, count, location)
+
+		# New copies may release members waiting in the queue
+		book.process_reservations()
+
+		return {
+			"success": True,
+			"data": copies,
+			"message": f"{len(copies)} copies added"
+		}
+	except frappe.DoesNotExistError:
+		return {"success": False, "error": "Book not found"}
+	except Exception as e:
+		frappe.log_error(f"Error adding copies of book {book_id}: {str(e)}")
+		return {"success": False, "error": str(e)}
+
 @frappe.whitelist()
 def delete_book(book_id):
 	"""Delete a book"""
@@ -148,20 +207,9 @@ def delete_book(book_id):
 
 @frappe.whitelist()
 def search_books(query, limit=10):
-	"""Search books by title, author, or ISBN"""
+	"""Search books by title, author, category, description or ISBN"""
 	try:
-		books = frappe.db.sql("""
-			SELECT name, title, author, isbn, is_available
-			FROM `tabBook`
-			WHERE title LIKE %(query)s 
-			   OR author LIKE %(query)s 
-			   OR isbn LIKE %(query)s
-			ORDER BY title
-			LIMIT %(limit)s
-		""", {
-			"query": f"%{query}%",
-			"limit": limit
-		}, as_dict=True)
+		books = search.search_books(query, limit=limit)
 		
 		return {
 			"success": True,
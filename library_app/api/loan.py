@@ -1,14 +1,42 @@
 import frappe
 from frappe import _
+from frappe.utils import cint, getdate, now
+from library_app import eligibility, inventory, locking, member_profile, popularity, projection, reservation_queue, response_cache, statistics
+from library_app.pagination import get_estimated_count, get_keyset_page
+from library_app.settings import get_settings
+from collections import Counter
 from datetime import date, timedelta
 
+# Upper bound on items accepted by the bulk checkout and return endpoints
+MAX_BULK_ITEMS = 500
+
 @frappe.whitelist()
-def get_all_loans(filters=None, fields=None, limit=20, start=0):
-	"""Get all loans with optional filters"""
+def get_all_loans(filters=None, fields=None, limit=20, start=0, cursor=None, with_total=1):
+	"""Get all loans with optional filters
+	
+	Pass `cursor` (empty for the first page) to page by keyset instead of offset;
+	the response then carries `next_cursor` and a cached `total` estimate.
+	"""
 	try:
 		if not fields:
 			fields = ["name", "book", "member", "loan_date", "return_date", "returned", "fine_amount"]
 		
+		if cursor is not None:
+			loans, next_cursor = get_keyset_page("Loan", "loan_date",
+				descending=True,
+				filters=filters,
+				fields=fields,
+				limit=limit,
+				cursor=cursor
+			)
+			
+			return {
+				"success": True,
+				"data": loans,
+				"next_cursor": next_cursor,
+				"total": get_estimated_count("Loan", filters) if cint(with_total) else None
+			}
+		
 		loans = frappe.get_all("Loan",
 			filters=filters or {},
 			fields=fields,
@@ -20,56 +48,65 @@ def get_all_loans(filters=None, fields=None, limit=20, start=0):
 		return {
 			"success": True,
 			"data": loans,
-			"total": frappe.db.count("Loan", filters or {})
+			"total": frappe.db.count("Loan", filters or {}) if cint(with_total) else None
 		}
 	except Exception as e:
 		frappe.log_error(f"Error fetching loans: {str(e)}")
 		return {"success": False, "error": str(e)}
 
 @frappe.whitelist()
-def create_loan(book, member, return_date=None):
-	"""Create a new loan"""
+def create_loan(book, member, return_date=None, book_copy=None):
+	"""Create a new loan, of a given copy or of any free copy of the book"""
 	try:
-		# Validate book availability
-		book_doc = frappe.get_doc("Book", book)
-		if not book_doc.is_available:
-			return {"success": False, "error": "Book is not available for loan"}
-		
-		# Validate member eligibility
-		member_doc = frappe.get_doc("Member", member)
-		can_borrow, message = member_doc.can_borrow_book()
-		if not can_borrow:
-			return {"success": False, "error": message}
-		
-		# Set default return date if not provided
-		if not return_date:
-			loan_period = frappe.db.get_single_value("Library Settings", "default_loan_period") or 14
-			return_date = date.today() + timedelta(days=loan_period)
-		
-		loan = frappe.get_doc({
-			"doctype": "Loan",
-			"book": book,
-			"member": member,
-			"loan_date": date.today(),
-			"return_date": return_date,
-			"returned": 0
-		})
-		loan.insert()
-		
-		return {
-			"success": True,
-			"data": loan.as_dict(),
-			"message": "Loan created successfully"
-		}
+		return checkout_book(book, member, return_date, book_copy)
+	except frappe.QueryTimeoutError:
+		return {"success": False, "error": "Book is being checked out by someone else, please try again"}
 	except Exception as e:
 		frappe.log_error(f"Error creating loan: {str(e)}")
 		return {"success": False, "error": str(e)}
 
+@locking.retry_on_lock_timeout
+def checkout_book(book, member, return_date=None, book_copy=None):
+	"""Check out a book; Loan.validate claims and locks the copy"""
+	# Cheap early exit, the copy claim below is what guarantees availability
+	available_copies = frappe.db.get_value("Book", book, "available_copies")
+	if available_copies is None:
+		return {"success": False, "error": "Book not found"}
+	if not available_copies:
+		return {"success": False, "error": "Book is not available for loan"}
+	
+	# Validate member eligibility, memoized for Loan.validate_member_eligibility
+	can_borrow, message = eligibility.check_eligibility(member)
+	if not can_borrow:
+		return {"success": False, "error": message}
+	
+	# Set default return date if not provided
+	if not return_date:
+		return_date = date.today() + timedelta(days=get_settings().default_loan_period)
+	
+	loan = frappe.get_doc({
+		"doctype": "Loan",
+		"book": book,
+		"book_copy": book_copy,
+		"member": member,
+		"loan_date": date.today(),
+		"return_date": return_date,
+		"returned": 0
+	})
+	loan.insert()
+	
+	return {
+		"success": True,
+		"data": projection.project(loan),
+		"message": "Loan created successfully"
+	}
+
 @frappe.whitelist()
 def return_book(loan_id, actual_return_date=None):
 	"""Process book return"""
 	try:
-		loan = frappe.get_doc("Loan", loan_id)
+		# Lock the loan so a concurrent return cannot process it twice
+		loan = frappe.get_doc("Loan", loan_id, for_update=True)
 		
 		if loan.returned:
 			return {"success": False, "error": "Book already returned"}
@@ -80,7 +117,7 @@ def return_book(loan_id, actual_return_date=None):
 		
 		return {
 			"success": True,
-			"data": loan.as_dict(),
+			"data": projection.project(loan),
 			"message": "Book returned successfully"
 		}
 	except frappe.DoesNotExistError:
@@ -89,6 +126,239 @@ def return_book(loan_id, actual_return_date=None):
 		frappe.log_error(f"Error returning book {loan_id}: {str(e)}")
 		return {"success": False, "error": str(e)}
 
+@frappe.whitelist()
+def bulk_create_loans(loans):
+	"""Create many loans in one call, reporting a result per item
+	
+	`loans` is a list of {"book", "member", "return_date"} items. Books and
+	members are fetched once for the whole batch and every item is validated
+	against those snapshots, so later items see the effect of earlier ones.
+	"""
+	try:
+		frappe.has_permission("Loan", "create", throw=True)
+		
+		items = frappe.parse_json(loans) or []
+		if len(items) > MAX_BULK_ITEMS:
+			return {"success": False, "error": f"At most {MAX_BULK_ITEMS} loans can be created at once"}
+		
+		book_names = list({item.get("book") for item in items if item.get("book")})
+		member_names = list({item.get("member") for item in items if item.get("member")})
+		
+		books = get_book_snapshots(book_names)
+		members = eligibility.get_member_snapshots(member_names)
+		today = date.today()
+		
+		settings = get_settings()
+		
+		results = []
+		accepted = []
+		for index, item in enumerate(items):
+			book = books.get(item.get("book"))
+			member = members.get(item.get("member"))
+			return_date = getdate(item.get("return_date")) if item.get("return_date") else today + timedelta(days=settings.default_loan_period)
+			
+			error = None
+			if not book:
+				error = f"Book '{item.get('book')}' not found"
+			elif not book.free_copies:
+				error = f"Book '{book.name}' is not available for loan"
+			elif return_date <= today:
+				error = "Return date must be after loan date"
+			else:
+				can_borrow, message = eligibility.evaluate(member)
+				if not can_borrow:
+					error = message
+			
+			if error:
+				results.append({"index": index, "success": False, "error": error})
+				continue
+			
+			# Later items in the batch must see this checkout
+			book_copy = book.free_copies.pop()
+			member.active_loans += 1
+			
+			loan_name = frappe.generate_hash(length=10)
+			accepted.append((loan_name, book.name, book_copy, member.name, today, return_date))
+			results.append({"index": index, "success": True, "loan": loan_name})
+		
+		if accepted:
+			timestamp = now()
+			frappe.db.bulk_insert("Loan",
+				fields=[
+					"name", "book", "book_copy", "member", "loan_date", "return_date", "returned", "fine_amount",
+					"creation", "modified", "owner", "modified_by"
+				],
+				values=[
+					(name, book, book_copy, member, loan_date, return_date, 0, 0,
+						timestamp, timestamp, frappe.session.user, frappe.session.user)
+					for name, book, book_copy, member, loan_date, return_date in accepted
+				]
+			)
+			
+			inventory.set_copy_status([loan[2] for loan in accepted], "On Loan")
+			for book, count in Counter(loan[1] for loan in accepted).items():
+				inventory.adjust_counters(book, -count)
+			
+			statistics.update_statistics({
+				"total_loans": len(accepted),
+				"active_loans": len(accepted)
+			})
+			
+			popularity.increment_books({
+				book: {"loan_count": count, "current_loans": count}
+				for book, count in Counter(loan[1] for loan in accepted).items()
+			})
+			popularity.increment_days({
+				book_day: {"loan_count": count}
+				for book_day, count in Counter((loan[1], loan[4]) for loan in accepted).items()
+			})
+			for member in {loan[3] for loan in accepted}:
+				eligibility.clear_cache(member)
+			for member, count in Counter(loan[3] for loan in accepted).items():
+				member_profile.adjust_summary(member, loans=count)
+			
+			response_cache.invalidate(("Loan", None), *{("Member", loan[3]) for loan in accepted})
+		
+		return {
+			"success": True,
+			"data": results,
+			"created": len(accepted),
+			"failed": len(items) - len(accepted)
+		}
+	except Exception as e:
+		frappe.log_error(f"Error creating loans in bulk: {str(e)}")
+		return {"success": False, "error": str(e)}
+
+@frappe.whitelist()
+def bulk_return_books(loan_ids, actual_return_date=None):
+	"""Return many loans in one call, reporting a result per item"""
+	try:
+		frappe.has_permission("Loan", "write", throw=True)
+		
+		loan_ids = frappe.parse_json(loan_ids) or []
+		if len(loan_ids) > MAX_BULK_ITEMS:
+			return {"success": False, "error": f"At most {MAX_BULK_ITEMS} loans can be returned at once"}
+		
+		# Locked in name order, so a concurrent return waits here and then
+		# sees these loans as returned
+		loans = {
+			loan.name: loan for loan in frappe.get_all("Loan",
+				filters={"name": ["in", loan_ids]},
+				fields=["name", "book", "book_copy", "member", "loan_date", "return_date", "returned", "is_overdue", "fine_amount"],
+				order_by="name asc",
+				for_update=True
+			)
+		} if loan_ids else {}
+		
+		fine_per_day = get_settings().fine_per_day
+		returned_on = getdate(actual_return_date) if actual_return_date else date.today()
+		
+		results = []
+		returned = []
+		overdue_count = 0
+		for index, loan_id in enumerate(loan_ids):
+			loan = loans.get(loan_id)
+			
+			error = None
+			if not loan:
+				error = "Loan not found"
+			elif loan.returned:
+				error = "Book already returned"
+			elif returned_on < getdate(loan.loan_date):
+				error = "Actual return date cannot be before loan date"
+			
+			if error:
+				results.append({"index": index, "loan": loan_id, "success": False, "error": error})
+				continue
+			
+			fine_amount = loan.fine_amount
+			overdue_days = (returned_on - getdate(loan.return_date)).days
+			if overdue_days > 0:
+				fine_amount = overdue_days * fine_per_day
+			if loan.is_overdue:
+				overdue_count += 1
+			
+			# Guard against the same loan appearing twice in the batch
+			loan.returned = 1
+			returned.append((loan, fine_amount))
+			results.append({"index": index, "loan": loan_id, "success": True, "fine_amount": fine_amount})
+		
+		if returned:
+			returned_loans = [loan for loan, fine_amount in returned]
+			timestamp = now()
+			values = {
+				"names": tuple(loan.name for loan in returned_loans),
+				"returned_on": returned_on,
+				"now": timestamp,
+				"user": frappe.session.user
+			}
+			fine_cases = []
+			for i, (loan, fine_amount) in enumerate(returned):
+				values[f"name_{i}"] = loan.name
+				values[f"fine_{i}"] = fine_amount
+				fine_cases.append(f"WHEN %(name_{i})s THEN %(fine_{i})s")
+			
+			frappe.db.sql(f"""
+				UPDATE `tabLoan`
+				SET returned = 1,
+				    is_overdue = 0,
+				    overdue_bucket = NULL,
+				    actual_return_date = %(returned_on)s,
+				    fine_amount = CASE name {" ".join(fine_cases)} ELSE fine_amount END,
+				    modified = %(now)s,
+				    modified_by = %(user)s
+				WHERE name IN %(names)s AND returned = 0
+			""", values)
+			
+			inventory.set_copy_status([loan.book_copy for loan in returned_loans if loan.book_copy], "Available")
+			freed_copies = Counter(loan.book for loan in returned_loans if loan.book_copy)
+			for book, count in freed_copies.items():
+				inventory.adjust_counters(book, count)
+			
+			statistics.update_statistics({
+				"active_loans": -len(returned),
+				"overdue_loans": -overdue_count
+			})
+			
+			popularity.increment_books({
+				book: {"current_loans": -count}
+				for book, count in Counter(loan.book for loan in returned_loans).items()
+			})
+			
+			fines = Counter()
+			for loan, fine_amount in returned:
+				fines[loan.member] += fine_amount - (loan.fine_amount or 0)
+			for member, fine_delta in fines.items():
+				member_profile.adjust_summary(member, fines=fine_delta)
+			
+			response_cache.invalidate(("Loan", None), *{("Member", loan.member) for loan in returned_loans})
+			
+			# Hand freed copies to the members first in each book's queue
+			reservation_queue.promote_pending(set(freed_copies))
+		
+		return {
+			"success": True,
+			"data": results,
+			"returned": len(returned),
+			"failed": len(loan_ids) - len(returned)
+		}
+	except Exception as e:
+		frappe.log_error(f"Error returning books in bulk: {str(e)}")
+		return {"success": False, "error": str(e)}
+
+def get_book_snapshots(book_names):
+	"""Fetch the free copies of many books, locking them for the batch"""
+	if not book_names:
+		return {}
+	
+	books = {
+		name: frappe._dict(name=name, free_copies=[])
+		for name in frappe.get_all("Book", filters={"name": ["in", book_names]}, pluck="name")
+	}
+	for copy in inventory.claim_free_copies(list(books)):
+		books[copy.book].free_copies.append(copy.name)
+	return books
+
 @frappe.whitelist()
 def get_active_loans():
 	"""Get all active loans"""
@@ -96,7 +366,7 @@ def get_active_loans():
 		loans = frappe.db.sql("""
 			SELECT l.name, l.book, b.title as book_title, l.member, m.name1 as member_name,
 			       l.loan_date, l.return_date,
-			       CASE WHEN l.return_date < CURDATE() THEN 1 ELSE 0 END as is_overdue,
+			       l.is_overdue, l.overdue_bucket,
 			       DATEDIFF(CURDATE(), l.return_date) as days_overdue
 			FROM `tabLoan` l
 			JOIN `tabBook` b ON l.book = b.name
@@ -119,12 +389,12 @@ def get_overdue_loans():
 	try:
 		loans = frappe.db.sql("""
 			SELECT l.name, l.book, b.title as book_title, l.member, m.name1 as member_name,
-			       m.email as member_email, l.loan_date, l.return_date,
+			       m.email as member_email, l.loan_date, l.return_date, l.overdue_bucket,
 			       DATEDIFF(CURDATE(), l.return_date) as days_overdue
 			FROM `tabLoan` l
 			JOIN `tabBook` b ON l.book = b.name
 			JOIN `tabMember` m ON l.member = m.name
-			WHERE l.returned = 0 AND l.return_date < CURDATE()
+			WHERE l.is_overdue = 1
 			ORDER BY l.return_date ASC
 		""", as_dict=True)
 		
@@ -140,7 +410,8 @@ def get_overdue_loans():
 def extend_loan(loan_id, new_return_date):
 	"""Extend loan return date"""
 	try:
-		loan = frappe.get_doc("Loan", loan_id)
+		# Lock the loan so a concurrent return cannot process it twice
+		loan = frappe.get_doc("Loan", loan_id, for_update=True)
 		
 		if loan.returned:
 			return {"success": False, "error": "Cannot extend returned loan"}
@@ -159,7 +430,7 @@ def extend_loan(loan_id, new_return_date):
 		
 		return {
 			"success": True,
-			"data": loan.as_dict(),
+			"data": projection.project(loan),
 			"message": "Loan extended successfully"
 		}
 	except frappe.DoesNotExistError:
@@ -1,13 +1,36 @@
 import frappe
 from frappe import _
+from frappe.utils import cint
+from library_app import eligibility, member_profile, projection, response_cache
+from library_app.api.reports import REPORT_CACHE_TTL
+from library_app.pagination import get_estimated_count, get_keyset_page
 
 @frappe.whitelist()
-def get_all_members(filters=None, fields=None, limit=20, start=0):
-	"""Get all members with optional filters"""
+def get_all_members(filters=None, fields=None, limit=20, start=0, cursor=None, with_total=1):
+	"""Get all members with optional filters
+	
+	Pass `cursor` (empty for the first page) to page by keyset instead of offset;
+	the response then carries `next_cursor` and a cached `total` estimate.
+	"""
 	try:
 		if not fields:
 			fields = ["name", "name1", "membership_id", "email", "phone", "status", "join_date"]
 		
+		if cursor is not None:
+			members, next_cursor = get_keyset_page("Member", "name1",
+				filters=filters,
+				fields=fields,
+				limit=limit,
+				cursor=cursor
+			)
+			
+			return {
+				"success": True,
+				"data": members,
+				"next_cursor": next_cursor,
+				"total": get_estimated_count("Member", filters) if cint(with_total) else None
+			}
+		
 		members = frappe.get_all("Member",
 			filters=filters or {},
 			fields=fields,
@@ -19,48 +42,29 @@ def get_all_members(filters=None, fields=None, limit=20, start=0):
 		return {
 			"success": True,
 			"data": members,
-			"total": frappe.db.count("Member", filters or {})
+			"total": frappe.db.count("Member", filters or {}) if cint(with_total) else None
 		}
 	except Exception as e:
 		frappe.log_error(f"Error fetching members: {str(e)}")
 		return {"success": False, "error": str(e)}
 
 @frappe.whitelist()
-def get_member(member_id):
-	"""Get single member details with loan history"""
+# Any reservation change can move this member's place in a queue, and
+# overdue days count from today
+@response_cache.cached(
+	tags=lambda member_id, fields=None: [("Member", member_id), ("Reservation", None), response_cache.BOOK_TITLES_TAG],
+	ttl=REPORT_CACHE_TTL
+)
+def get_member(member_id, fields=None):
+	"""Get single member details with loans, reservations and a summary
+	
+	`fields` picks the Member fields returned, defaulting to projection.DEFAULT_FIELDS.
+	Loans and reservations come with the title and author of their book.
+	"""
 	try:
-		member = frappe.get_doc("Member", member_id)
-		
-		# Get active loans
-		active_loans = frappe.get_all("Loan",
-			filters={"member": member_id, "returned": 0},
-			fields=["name", "book", "loan_date", "return_date"],
-			order_by="loan_date desc"
-		)
-		
-		# Get loan history
-		loan_history = frappe.get_all("Loan",
-			filters={"member": member_id, "returned": 1},
-			fields=["name", "book", "loan_date", "return_date", "actual_return_date", "fine_amount"],
-			order_by="loan_date desc",
-			limit=10
-		)
-		
-		# Get active reservations
-		reservations = frappe.get_all("Reservation",
-			filters={"member": member_id, "status": ["in", ["Pending", "Ready"]]},
-			fields=["name", "book", "reserve_date", "status", "expiry_date"],
-			order_by="reserve_date desc"
-		)
-		
 		return {
 			"success": True,
-			"data": {
-				"member": member.as_dict(),
-				"active_loans": active_loans,
-				"loan_history": loan_history,
-				"reservations": reservations
-			}
+			"data": member_profile.load_profile(member_id, fields)
 		}
 	except frappe.DoesNotExistError:
 		return {"success": False, "error": "Member not found"}
@@ -85,7 +89,7 @@ def create_member(name1, membership_id, email, phone=None, address=None):
 		
 		return {
 			"success": True,
-			"data": member.as_dict(),
+			"data": projection.project(member),
 			"message": "Member created successfully"
 		}
 	except Exception as e:
@@ -108,7 +112,7 @@ def update_member(member_id, **kwargs):
 		
 		return {
 			"success": True,
-			"data": member.as_dict(),
+			"data": projection.project(member),
 			"message": "Member updated successfully"
 		}
 	except frappe.DoesNotExistError:
@@ -175,3 +179,30 @@ def search_members(query, limit=10):
 	except Exception as e:
 		frappe.log_error(f"Error searching members: {str(e)}")
 		return {"success": False, "error": str(e)}
+
+@frappe.whitelist()
+def check_borrowing_eligibility(members):
+	"""Check if many members can borrow, for the checkout desk"""
+	try:
+		members = frappe.parse_json(members) or []
+		if isinstance(members, str):
+			members = [members]
+		
+		snapshots = eligibility.get_member_snapshots(members)
+		results = {}
+		for member, snapshot in snapshots.items():
+			can_borrow, message = eligibility.evaluate(snapshot)
+			results[member] = {
+				"can_borrow": can_borrow,
+				"message": message,
+				"active_loans": snapshot.active_loans if snapshot else 0,
+				"overdue_loans": snapshot.overdue_loans if snapshot else 0
+			}
+		
+		return {
+			"success": True,
+			"data": results
+		}
+	except Exception as e:
+		frappe.log_error(f"Error checking borrowing eligibility: {str(e)}")
+		return {"success": False, "error": str(e)}
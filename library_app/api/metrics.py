@@ -0,0 +1,28 @@
+import frappe
+from frappe import _
+from library_app import instrumentation
+
+@frappe.whitelist()
+def get_metrics():
+	"""Expose API latency and query histograms in the Prometheus text format
+	
+	Scrape with the API key of a System Manager user.
+	"""
+	frappe.only_for("System Manager")
+	
+	frappe.response["type"] = "download"
+	frappe.response["filename"] = "metrics.txt"
+	frappe.response["filecontent"] = instrumentation.render_metrics()
+	frappe.response["display_content_as"] = "inline"
+
+@frappe.whitelist()
+def reset_metrics():
+	"""Drop every recorded API metric"""
+	try:
+		frappe.only_for("System Manager")
+		instrumentation.reset_metrics()
+		
+		return {"success": True, "message": "Metrics reset"}
+	except Exception as e:
+		frappe.log_error(f"Error resetting metrics: {str(e)}")
+		return {"success": False, "error": str(e)}
@@ -1,40 +1,72 @@
 import frappe
 from frappe import _
+from library_app import exports, popularity, response_cache, statistics
+from library_app.settings import get_settings
+
+# Reports count days from today, so cached ones are recomputed at least this often
+REPORT_CACHE_TTL = 300
+
+# Tags of the reports over every active loan
+LOAN_REPORT_TAGS = [("Loan", None), ("Book", None), ("Member", None), ("Library Settings", None)]
+
+ACTIVE_LOANS_QUERY = """
+	SELECT l.name, l.book, b.title as book_title, b.author,
+	       l.member, m.name1 as member_name, m.email, m.phone,
+	       l.loan_date, l.return_date,
+	       DATEDIFF(l.return_date, CURDATE()) as days_remaining,
+	       CASE WHEN l.is_overdue = 1 THEN 'Overdue'
+	            WHEN DATEDIFF(l.return_date, CURDATE()) <= %(due_soon_days)s THEN 'Due Soon'
+	            ELSE 'Active' END as status
+	FROM `tabLoan` l
+	JOIN `tabBook` b ON l.book = b.name
+	JOIN `tabMember` m ON l.member = m.name
+	WHERE l.returned = 0
+	ORDER BY l.return_date ASC
+"""
+
+ACTIVE_LOANS_COLUMNS = [
+	("name", "string"), ("book", "string"), ("book_title", "string"), ("author", "string"),
+	("member", "string"), ("member_name", "string"), ("email", "string"), ("phone", "string"),
+	("loan_date", "date"), ("return_date", "date"), ("days_remaining", "int"), ("status", "string")
+]
+
+OVERDUE_BOOKS_QUERY = """
+	SELECT l.name, l.book, b.title as book_title, b.author,
+	       l.member, m.name1 as member_name, m.email, m.phone,
+	       l.loan_date, l.return_date, l.overdue_bucket,
+	       DATEDIFF(CURDATE(), l.return_date) as days_overdue,
+	       (DATEDIFF(CURDATE(), l.return_date) * %(fine_per_day)s) as estimated_fine
+	FROM `tabLoan` l
+	JOIN `tabBook` b ON l.book = b.name
+	JOIN `tabMember` m ON l.member = m.name
+	WHERE l.is_overdue = 1
+	ORDER BY l.return_date ASC
+"""
+
+OVERDUE_BOOKS_COLUMNS = [
+	("name", "string"), ("book", "string"), ("book_title", "string"), ("author", "string"),
+	("member", "string"), ("member_name", "string"), ("email", "string"), ("phone", "string"),
+	("loan_date", "date"), ("return_date", "date"), ("overdue_bucket", "string"),
+	("days_overdue", "int"), ("estimated_fine", "float")
+]
 
 @frappe.whitelist()
+@response_cache.cached(tags=lambda: LOAN_REPORT_TAGS, ttl=REPORT_CACHE_TTL)
 def get_active_loans_report():
 	"""Generate active loans report"""
 	try:
-		loans = frappe.db.sql("""
-			SELECT l.name, l.book, b.title as book_title, b.author,
-			       l.member, m.name1 as member_name, m.email, m.phone,
-			       l.loan_date, l.return_date,
-			       DATEDIFF(l.return_date, CURDATE()) as days_remaining,
-			       CASE WHEN l.return_date < CURDATE() THEN 'Overdue'
-			            WHEN DATEDIFF(l.return_date, CURDATE()) <= 3 THEN 'Due Soon'
-			            ELSE 'Active' END as status
-			FROM `tabLoan` l
-			JOIN `tabBook` b ON l.book = b.name
-			JOIN `tabMember` m ON l.member = m.name
-			WHERE l.returned = 0
-			ORDER BY l.return_date ASC
-		""", as_dict=True)
+		loans = frappe.db.sql(ACTIVE_LOANS_QUERY, {"due_soon_days": get_settings().due_soon_days}, as_dict=True)
 		
 		# Calculate statistics
-		total_loans = len(loans)
-		overdue_count = len([l for l in loans if l.status == 'Overdue'])
-		due_soon_count = len([l for l in loans if l.status == 'Due Soon'])
+		summary = exports.ActiveLoansSummary()
+		for loan in loans:
+			summary.add(loan)
 		
 		return {
 			"success": True,
 			"data": {
 				"loans": loans,
-				"statistics": {
-					"total_active_loans": total_loans,
-					"overdue_loans": overdue_count,
-					"due_soon_loans": due_soon_count,
-					"active_loans": total_loans - overdue_count - due_soon_count
-				}
+				"statistics": summary.result()
 			}
 		}
 	except Exception as e:
@@ -42,33 +74,41 @@ def get_active_loans_report():
 		return {"success": False, "error": str(e)}
 
 @frappe.whitelist()
+def export_active_loans_report(file_format="csv"):
+	"""Stream the active loans report to a CSV or Parquet file"""
+	try:
+		result = exports.export_report("active-loans", ACTIVE_LOANS_QUERY,
+			{"due_soon_days": get_settings().due_soon_days},
+			ACTIVE_LOANS_COLUMNS,
+			exports.ActiveLoansSummary(),
+			file_format=file_format
+		)
+		
+		return {
+			"success": True,
+			"data": result
+		}
+	except Exception as e:
+		frappe.log_error(f"Error exporting active loans report: {str(e)}")
+		return {"success": False, "error": str(e)}
+
+@frappe.whitelist()
+@response_cache.cached(tags=lambda: LOAN_REPORT_TAGS, ttl=REPORT_CACHE_TTL)
 def get_overdue_books_report():
 	"""Generate overdue books report"""
 	try:
-		overdue_loans = frappe.db.sql("""
-			SELECT l.name, l.book, b.title as book_title, b.author,
-			       l.member, m.name1 as member_name, m.email, m.phone,
-			       l.loan_date, l.return_date,
-			       DATEDIFF(CURDATE(), l.return_date) as days_overdue,
-			       (DATEDIFF(CURDATE(), l.return_date) * 1.0) as estimated_fine
-			FROM `tabLoan` l
-			JOIN `tabBook` b ON l.book = b.name
-			JOIN `tabMember` m ON l.member = m.name
-			WHERE l.returned = 0 AND l.return_date < CURDATE()
-			ORDER BY days_overdue DESC
-		""", as_dict=True)
+		overdue_loans = frappe.db.sql(OVERDUE_BOOKS_QUERY, {"fine_per_day": get_settings().fine_per_day}, as_dict=True)
 		
 		# Calculate total estimated fines
-		total_fines = sum(loan.estimated_fine for loan in overdue_loans)
+		summary = exports.OverdueBooksSummary()
+		for loan in overdue_loans:
+			summary.add(loan)
 		
 		return {
 			"success": True,
 			"data": {
 				"overdue_loans": overdue_loans,
-				"statistics": {
-					"total_overdue": len(overdue_loans),
-					"total_estimated_fines": total_fines
-				}
+				"statistics": summary.result()
 			}
 		}
 	except Exception as e:
@@ -76,21 +116,33 @@ def get_overdue_books_report():
 		return {"success": False, "error": str(e)}
 
 @frappe.whitelist()
-def get_popular_books_report(limit=10):
-	"""Generate popular books report based on loan frequency"""
+def export_overdue_books_report(file_format="csv"):
+	"""Stream the overdue books report to a CSV or Parquet file"""
 	try:
-		popular_books = frappe.db.sql("""
-			SELECT b.name, b.title, b.author, b.category,
-			       COUNT(l.name) as loan_count,
-			       COUNT(CASE WHEN l.returned = 0 THEN 1 END) as current_loans,
-			       COUNT(r.name) as reservation_count
-			FROM `tabBook` b
-			LEFT JOIN `tabLoan` l ON b.name = l.book
-			LEFT JOIN `tabReservation` r ON b.name = r.book AND r.status = 'Pending'
-			GROUP BY b.name, b.title, b.author, b.category
-			ORDER BY loan_count DESC, reservation_count DESC
-			LIMIT %(limit)s
-		""", {"limit": limit}, as_dict=True)
+		result = exports.export_report("overdue-books", OVERDUE_BOOKS_QUERY,
+			{"fine_per_day": get_settings().fine_per_day},
+			OVERDUE_BOOKS_COLUMNS,
+			exports.OverdueBooksSummary(),
+			file_format=file_format
+		)
+		
+		return {
+			"success": True,
+			"data": result
+		}
+	except Exception as e:
+		frappe.log_error(f"Error exporting overdue books report: {str(e)}")
+		return {"success": False, "error": str(e)}
+
+@frappe.whitelist()
+@response_cache.cached(tags=lambda limit, window: [("Loan", None), ("Reservation", None), ("Book", None)], ttl=REPORT_CACHE_TTL)
+def get_popular_books_report(limit=10, window=None):
+	"""Generate popular books report based on loan frequency
+	
+	`window` restricts the ranking to the last 30, 90 or 365 days.
+	"""
+	try:
+		popular_books = popularity.get_popular_books(limit=limit, window=window)
 		
 		return {
 			"success": True,
@@ -101,6 +153,7 @@ def get_popular_books_report(limit=10):
 		return {"success": False, "error": str(e)}
 
 @frappe.whitelist()
+@response_cache.cached(tags=lambda limit: [("Loan", None), ("Member", None)])
 def get_member_activity_report(limit=10):
 	"""Generate member activity report"""
 	try:
@@ -108,7 +161,7 @@ def get_member_activity_report(limit=10):
 			SELECT m.name, m.name1, m.membership_id, m.email,
 			       COUNT(l.name) as total_loans,
 			       COUNT(CASE WHEN l.returned = 0 THEN 1 END) as active_loans,
-			       COUNT(CASE WHEN l.returned = 0 AND l.return_date < CURDATE() THEN 1 END) as overdue_loans,
+			       COUNT(CASE WHEN l.is_overdue = 1 THEN 1 END) as overdue_loans,
 			       MAX(l.loan_date) as last_loan_date
 			FROM `tabMember` m
 			LEFT JOIN `tabLoan` l ON m.name = l.member
@@ -130,28 +183,7 @@ def get_member_activity_report(limit=10):
 def get_library_statistics():
 	"""Get overall library statistics"""
 	try:
-		stats = {}
-		
-		# Book statistics
-		stats['total_books'] = frappe.db.count('Book')
-		stats['available_books'] = frappe.db.count('Book', {'is_available': 1})
-		stats['books_on_loan'] = frappe.db.count('Book', {'is_available': 0})
-		
-		# Member statistics
-		stats['total_members'] = frappe.db.count('Member')
-		stats['active_members'] = frappe.db.count('Member', {'status': 'Active'})
-		
-		# Loan statistics
-		stats['total_loans'] = frappe.db.count('Loan')
-		stats['active_loans'] = frappe.db.count('Loan', {'returned': 0})
-		stats['overdue_loans'] = frappe.db.sql("""
-			SELECT COUNT(*) as count FROM `tabLoan` 
-			WHERE returned = 0 AND return_date < CURDATE()
-		""")[0][0]
-		
-		# Reservation statistics
-		stats['pending_reservations'] = frappe.db.count('Reservation', {'status': 'Pending'})
-		stats['ready_reservations'] = frappe.db.count('Reservation', {'status': 'Ready'})
+		stats = statistics.get_statistics()
 		
 		return {
 			"success": True,
@@ -160,3 +192,17 @@ def get_library_statistics():
 	except Exception as e:
 		frappe.log_error(f"Error generating library statistics: {str(e)}")
 		return {"success": False, "error": str(e)}
+
+@frappe.whitelist(methods=["POST"])
+def refresh_library_statistics():
+	"""Recount the library statistics from the tables and store them"""
+	try:
+		stats = statistics.reconcile_statistics()
+
+		return {
+			"success": True,
+			"data": stats
+		}
+	except Exception as e:
+		frappe.log_error(f"Error refreshing library statistics: {str(e)}")
+		return {"success": False, "error": str(e)}
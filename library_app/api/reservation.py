@@ -1,5 +1,6 @@
 import frappe
 from frappe import _
+from library_app import projection, response_cache
 
 @frappe.whitelist()
 def create_reservation(book, member):
@@ -33,7 +34,7 @@ def create_reservation(book, member):
 		
 		return {
 			"success": True,
-			"data": reservation.as_dict(),
+			"data": projection.project(reservation),
 			"message": "Reservation created successfully"
 		}
 	except Exception as e:
@@ -47,9 +48,11 @@ def get_member_reservations(member):
 		reservations = frappe.db.sql("""
 			SELECT r.name, r.book, b.title as book_title, b.author,
 			       r.reserve_date, r.status, r.expiry_date,
-			       (SELECT COUNT(*) FROM `tabReservation` r2 
-			        WHERE r2.book = r.book AND r2.status = 'Pending' 
-			        AND r2.reserve_date < r.reserve_date) + 1 as queue_position
+			       CASE WHEN r.status = 'Pending' THEN
+			           (SELECT COUNT(*) FROM `tabReservation` r2
+			            WHERE r2.book = r.book AND r2.status = 'Pending'
+			            AND r2.queue_sequence < r.queue_sequence) + 1
+			       END as queue_position
 			FROM `tabReservation` r
 			JOIN `tabBook` b ON r.book = b.name
 			WHERE r.member = %(member)s
@@ -92,6 +95,7 @@ def cancel_reservation(reservation_id):
 		return {"success": False, "error": str(e)}
 
 @frappe.whitelist()
+@response_cache.cached(tags=lambda book: [("Book", book), ("Member", None)])
 def get_book_reservations(book):
 	"""Get all reservations for a book"""
 	try:
@@ -101,7 +105,7 @@ def get_book_reservations(book):
 			FROM `tabReservation` r
 			JOIN `tabMember` m ON r.member = m.name
 			WHERE r.book = %(book)s AND r.status IN ('Pending', 'Ready')
-			ORDER BY r.reserve_date ASC
+			ORDER BY r.queue_sequence ASC
 		""", {"book": book}, as_dict=True)
 		
 		return {
@@ -0,0 +1 @@
+# Benchmark suite: synthetic library data and API scenario drivers
@@ -0,0 +1,228 @@
+import bisect
+import itertools
+import random
+import time
+from datetime import date, timedelta
+
+import frappe
+from frappe.utils import now
+from library_app import member_profile, membership, overdue, popularity, response_cache, search, statistics
+from library_app.catalogue_import import isbn10_to_isbn13
+from library_app.settings import get_settings
+
+# Rows per table at each scale, named after the size of the Loan table
+SCALES = {
+	"10k": {"books": 2000, "members": 1000, "loans": 10000, "reservations": 500},
+	"100k": {"books": 20000, "members": 10000, "loans": 100000, "reservations": 5000},
+	"1m": {"books": 200000, "members": 100000, "loans": 1000000, "reservations": 50000}
+}
+
+# Every generated row is owned by this user, which is how clear_data finds them
+BENCHMARK_OWNER = "benchmark@library.local"
+
+# Skew of book popularity and member activity (probability ~ 1 / rank ** exponent)
+BOOK_ZIPF_EXPONENT = 1.1
+MEMBER_ZIPF_EXPONENT = 0.8
+
+# Share of loans still out, and share of those past their return date
+ACTIVE_LOAN_RATIO = 0.1
+OVERDUE_RATIO = 0.2
+
+LOAN_HISTORY_DAYS = 730
+INSERT_CHUNK_SIZE = 5000
+
+WORDS = [
+	"shadow", "river", "garden", "silent", "winter", "empire", "secret", "light",
+	"ocean", "glass", "iron", "midnight", "crown", "forest", "storm", "memory",
+	"city", "star", "broken", "golden", "journey", "house", "fire", "north",
+	"lost", "last", "wild", "paper", "song", "stone", "harbor", "dream"
+]
+FIRST_NAMES = ["Ada", "Ben", "Chloe", "Dev", "Elena", "Farid", "Grace", "Hiro", "Ines", "Jonas", "Kemi", "Liam"]
+LAST_NAMES = ["Adams", "Brooks", "Chen", "Diaz", "Evans", "Fischer", "Gupta", "Hughes", "Ito", "Jensen", "Khan", "Lopez"]
+CATEGORIES = ["Fiction", "History", "Science", "Biography", "Poetry", "Travel", "Children", "Technology"]
+
+class ZipfSampler:
+	"""Pick items with probability proportional to 1 / rank ** exponent"""
+	def __init__(self, items, rng, exponent):
+		self.items = items
+		self.rng = rng
+		self.cumulative = list(itertools.accumulate(1 / rank ** exponent for rank in range(1, len(items) + 1)))
+
+	def pick(self):
+		return self.items[bisect.bisect_left(self.cumulative, self.rng.random() * self.cumulative[-1])]
+
+def insert_rows(doctype, fields, rows):
+	"""Bulk insert generated rows in chunks, stamped with the benchmark owner"""
+	timestamp = now()
+	fields = ["name", *fields, "creation", "modified", "owner", "modified_by"]
+	for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+		frappe.db.bulk_insert(doctype, fields=fields, values=[
+			(*row, timestamp, timestamp, BENCHMARK_OWNER, BENCHMARK_OWNER)
+			for row in rows[start:start + INSERT_CHUNK_SIZE]
+		])
+
+def generate_data(scale="10k", seed=42):
+	"""Fill the site with a reproducible synthetic library
+
+	The same scale and seed always produce the same books, members, loans
+	and reservations (names and barcodes aside). Book popularity and member
+	activity follow Zipf distributions, a share of loans is still out and
+	some of those are overdue. Counters, copy states and queues are worked
+	out up front and every derived store is rebuilt at the end, since bulk
+	inserts skip the document hooks.
+	"""
+	if scale not in SCALES:
+		frappe.throw(f"Scale must be one of {', '.join(SCALES)}")
+
+	start_time = time.monotonic()
+	sizes = SCALES[scale]
+	rng = random.Random(seed)
+	today = date.today()
+	settings = get_settings()
+
+	# Membership IDs first: creating a missing sequence commits
+	membership_ids = []
+	for start in range(0, sizes["members"], membership.MAX_BLOCK_SIZE):
+		membership_ids += membership.allocate_membership_ids(min(membership.MAX_BLOCK_SIZE, sizes["members"] - start))
+
+	books = []
+	for i in range(sizes["books"]):
+		books.append(frappe._dict(
+			name=frappe.generate_hash(length=10),
+			title=" ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 4))).title(),
+			author=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+			isbn=isbn10_to_isbn13(f"{seed % 1000:03d}{i:06d}0"),
+			publish_date=today - timedelta(days=rng.randint(365, 365 * 80)),
+			category=rng.choice(CATEGORIES),
+			copies=[],
+			reservation_sequence=0
+		))
+
+	# Popular books (low rank) get more copies
+	for rank, book in enumerate(books, start=1):
+		for _ in range(3 if rank <= len(books) // 100 else rng.choice((1, 1, 2))):
+			book.copies.append(frappe._dict(name=frappe.generate_hash(length=10), on_loan=False))
+
+	members = [frappe._dict(
+		name=frappe.generate_hash(length=10),
+		name1=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+		membership_id=membership_id,
+		email=f"member{i}.{seed}@bench.example.com",
+		join_date=today - timedelta(days=rng.randint(0, LOAN_HISTORY_DAYS)),
+		active_loans=0
+	) for i, membership_id in enumerate(membership_ids)]
+
+	book_sampler = ZipfSampler(books, rng, BOOK_ZIPF_EXPONENT)
+	member_sampler = ZipfSampler(members, rng, MEMBER_ZIPF_EXPONENT)
+
+	loans = []
+	active_target = int(sizes["loans"] * ACTIVE_LOAN_RATIO)
+	for i in range(sizes["loans"]):
+		book = book_sampler.pick()
+		member = member_sampler.pick()
+		copy = next((c for c in book.copies if not c.on_loan), None)
+		active = i < active_target and copy and member.active_loans < settings.max_loans_per_member
+
+		if active:
+			if rng.random() < OVERDUE_RATIO:
+				loan_date = today - timedelta(days=settings.default_loan_period + rng.randint(1, 60))
+			else:
+				loan_date = today - timedelta(days=rng.randint(0, settings.default_loan_period - 1))
+			copy.on_loan = True
+			member.active_loans += 1
+			actual_return_date = None
+			fine_amount = 0
+		else:
+			loan_date = today - timedelta(days=rng.randint(settings.default_loan_period + 1, LOAN_HISTORY_DAYS))
+			actual_return_date = loan_date + timedelta(days=rng.randint(1, settings.default_loan_period + 10))
+			fine_amount = max((actual_return_date - loan_date).days - settings.default_loan_period, 0) * settings.fine_per_day
+
+		return_date = loan_date + timedelta(days=settings.default_loan_period)
+		is_overdue, overdue_bucket = overdue.get_overdue_state(return_date, 0 if active else 1, today)
+		loans.append((
+			frappe.generate_hash(length=10), book.name, copy.name if active else None, member.name,
+			loan_date, return_date, actual_return_date, 0 if active else 1, is_overdue, overdue_bucket, fine_amount
+		))
+
+	# Members queue for books with no free copy, in reservation order
+	reservations = []
+	queued = set()
+	for _ in range(sizes["reservations"] * 5):
+		if len(reservations) >= sizes["reservations"]:
+			break
+		book = book_sampler.pick()
+		member = member_sampler.pick()
+		if any(not c.on_loan for c in book.copies) or (book.name, member.name) in queued:
+			continue
+		queued.add((book.name, member.name))
+		book.reservation_sequence += 1
+		reservations.append((
+			frappe.generate_hash(length=10), book.name, member.name,
+			today - timedelta(days=rng.randint(0, 30)), "Pending", book.reservation_sequence
+		))
+
+	insert_rows("Book",
+		["title", "author", "isbn", "publish_date", "category",
+			"is_available", "total_copies", "available_copies", "reservation_sequence"],
+		[(
+			book.name, book.title, book.author, book.isbn, book.publish_date, book.category,
+			1 if free else 0, len(book.copies), free, book.reservation_sequence
+		) for book in books for free in [sum(1 for c in book.copies if not c.on_loan)]]
+	)
+	insert_rows("Book Copy",
+		["book", "barcode", "status", "location"],
+		[(
+			copy.name, book.name, f"BENCH{seed}-{copy.name.upper()}", "On Loan" if copy.on_loan else "Available", None
+		) for book in books for copy in book.copies]
+	)
+	insert_rows("Member",
+		["name1", "membership_id", "email", "join_date", "status"],
+		[(m.name, m.name1, m.membership_id, m.email, m.join_date, "Active") for m in members]
+	)
+	insert_rows("Loan",
+		["book", "book_copy", "member", "loan_date", "return_date", "actual_return_date",
+			"returned", "is_overdue", "overdue_bucket", "fine_amount"],
+		loans
+	)
+	insert_rows("Reservation",
+		["book", "member", "reserve_date", "status", "queue_sequence"],
+		reservations
+	)
+	frappe.db.commit()
+
+	rebuild_derived()
+
+	elapsed = time.monotonic() - start_time
+	counts = {"books": len(books), "members": len(members), "loans": len(loans), "reservations": len(reservations)}
+	print(f"Generated {scale} data set (seed {seed}): " +
+		", ".join(f"{count} {table}" for table, count in counts.items()) + f" in {elapsed:.1f}s")
+	return counts
+
+def rebuild_derived():
+	"""Rebuild the search index, popularity rollups, member summaries and counters after bulk changes"""
+	search.rebuild_index()
+	popularity.rebuild_popularity()
+	member_profile.rebuild_summaries()
+	statistics.store_statistics(statistics.compute_statistics())
+	response_cache.invalidate(*((doctype, None) for doctype in ("Book", "Book Copy", "Member", "Loan", "Reservation")))
+	frappe.db.commit()
+
+def clear_data():
+	"""Delete every generated row, and whatever the scenarios attached to them"""
+	books = frappe.get_all("Book", filters={"owner": BENCHMARK_OWNER}, pluck="name")
+	members = frappe.get_all("Member", filters={"owner": BENCHMARK_OWNER}, pluck="name")
+
+	# Loans and reservations made by scenario runs are owned by the runner
+	for start in range(0, len(members), INSERT_CHUNK_SIZE):
+		chunk = members[start:start + INSERT_CHUNK_SIZE]
+		frappe.db.delete("Loan", {"member": ["in", chunk]})
+		frappe.db.delete("Reservation", {"member": ["in", chunk]})
+	for start in range(0, len(books), INSERT_CHUNK_SIZE):
+		frappe.db.delete("Book Copy", {"book": ["in", books[start:start + INSERT_CHUNK_SIZE]]})
+
+	for doctype in ("Loan", "Reservation", "Book", "Member"):
+		frappe.db.delete(doctype, {"owner": BENCHMARK_OWNER})
+	frappe.db.commit()
+
+	rebuild_derived()
+	print(f"Removed {len(books)} benchmark books and {len(members)} members")
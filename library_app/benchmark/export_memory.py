@@ -0,0 +1,109 @@
+import resource
+import threading
+import time
+import tracemalloc
+
+import frappe
+from library_app import exports
+from library_app.api import reports
+from library_app.benchmark.data import BENCHMARK_OWNER, SCALES
+from library_app.settings import get_settings
+
+# Most memory an export may allocate at once, whatever the number of rows
+EXPORT_PEAK_LIMIT_MB = 32
+
+# Seconds between samples of the process RSS and Arrow allocations
+SAMPLE_INTERVAL = 0.01
+
+def get_rss():
+	"""Resident set size of this process in bytes, from /proc"""
+	with open("/proc/self/statm") as f:
+		return int(f.read().split()[1]) * resource.getpagesize()
+
+class MemorySampler:
+	"""Track the peak RSS growth and Arrow allocations while a block runs
+
+	tracemalloc only sees the Python heap, while Arrow buffers and the
+	result buffers of the MySQL client live in C memory, so those are
+	sampled from a background thread.
+	"""
+	def __enter__(self):
+		try:
+			import pyarrow
+			self.arrow_allocated = pyarrow.total_allocated_bytes
+		except ImportError:
+			self.arrow_allocated = lambda: 0
+
+		self.rss_start = get_rss()
+		self.arrow_start = self.arrow_allocated()
+		self.rss_peak = self.arrow_peak = 0
+		self.stopped = threading.Event()
+		self.thread = threading.Thread(target=self.run, daemon=True)
+		self.thread.start()
+		return self
+
+	def sample(self):
+		self.rss_peak = max(self.rss_peak, get_rss() - self.rss_start)
+		self.arrow_peak = max(self.arrow_peak, self.arrow_allocated() - self.arrow_start)
+
+	def run(self):
+		while not self.stopped.wait(SAMPLE_INTERVAL):
+			self.sample()
+
+	def __exit__(self, *exc):
+		self.stopped.set()
+		self.thread.join()
+		self.sample()
+
+def get_reports():
+	"""Name, query, values, columns and summary of every exported report"""
+	settings = get_settings()
+	return [
+		("active-loans", reports.ACTIVE_LOANS_QUERY, {"due_soon_days": settings.due_soon_days},
+			reports.ACTIVE_LOANS_COLUMNS, exports.ActiveLoansSummary),
+		("overdue-books", reports.OVERDUE_BOOKS_QUERY, {"fine_per_day": settings.fine_per_day},
+			reports.OVERDUE_BOOKS_COLUMNS, exports.OverdueBooksSummary)
+	]
+
+def check_export_memory(scale="1m", limit_mb=EXPORT_PEAK_LIMIT_MB):
+	"""Export every report as CSV and Parquet and fail if one allocates more than `limit_mb`
+
+	Needs the benchmark data of `scale` (generate-benchmark-data). Around
+	each export_report call the limit applies to the tracemalloc peak (rows
+	held by Python), the peak RSS growth (C buffers such as the MySQL
+	client's) and the peak of pyarrow.total_allocated_bytes (Arrow
+	buffers). The exported files are deleted again.
+	"""
+	loans = frappe.db.count("Loan", {"owner": BENCHMARK_OWNER})
+	if loans < SCALES[scale]["loans"]:
+		frappe.throw(f"Found {loans} benchmark loans, generate the {scale} data set first")
+
+	problems = []
+	for report_name, query, values, columns, summary in get_reports():
+		for file_format in exports.EXPORT_FORMATS:
+			tracemalloc.start()
+			start = time.monotonic()
+			try:
+				with MemorySampler() as sampler:
+					result = exports.export_report(report_name, query, values, columns, summary(), file_format=file_format)
+				_, python_peak = tracemalloc.get_traced_memory()
+			finally:
+				tracemalloc.stop()
+			elapsed = time.monotonic() - start
+
+			frappe.delete_doc("File", frappe.db.get_value("File", {"file_url": result["file_url"]}), ignore_permissions=True)
+			frappe.db.commit()
+
+			peaks = {"python": python_peak, "rss": sampler.rss_peak, "arrow": sampler.arrow_peak}
+			print(f"{report_name:<14} {file_format:<8} {result['rows']:>9} rows   " +
+				"   ".join(f"{kind} {peak / 1024 / 1024:>7.1f} MB" for kind, peak in peaks.items()) +
+				f"   {elapsed:>6.1f}s")
+			for kind, peak in peaks.items():
+				if peak / 1024 / 1024 > limit_mb:
+					problems.append(f"{report_name} as {file_format} peaked at {peak / 1024 / 1024:.1f} MB of {kind} memory, over {limit_mb} MB")
+
+	# ru_maxrss is in kilobytes on Linux
+	print(f"Peak RSS of the process: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+	if problems:
+		frappe.throw("Export memory check failed:\n" + "\n".join(problems))
+	print(f"Every export stayed under {limit_mb} MB")
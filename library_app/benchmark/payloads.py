@@ -0,0 +1,48 @@
+import time
+
+import frappe
+from library_app import projection
+from library_app.benchmark.data import BENCHMARK_OWNER
+
+def measure(fn, names, runs):
+	"""Median time to load and serialize every name, and the mean payload size"""
+	timings = []
+	for _ in range(runs):
+		start = time.perf_counter()
+		payloads = [fn(name) for name in names]
+		timings.append(time.perf_counter() - start)
+	return sorted(timings)[len(timings) // 2] * 1000, sum(len(p) for p in payloads) / len(payloads)
+
+def compare_payloads(samples=200, runs=5):
+	"""Compare full Document payloads against the default projections
+
+	The full path is what get_book and get_member used to do: frappe.get_doc,
+	as_dict and frappe.as_json. The projected path reads the default fields
+	with one get_value and serializes them with projection.dumps.
+	"""
+	results = []
+	for doctype in ("Book", "Member"):
+		names = frappe.get_all(doctype, filters={"owner": BENCHMARK_OWNER}, pluck="name", limit=samples) \
+			or frappe.get_all(doctype, pluck="name", limit=samples)
+		if not names:
+			continue
+
+		full_ms, full_bytes = measure(
+			lambda name: frappe.as_json(frappe.get_doc(doctype, name).as_dict()).encode(), names, runs)
+		projected_ms, projected_bytes = measure(
+			lambda name: projection.dumps(projection.get_projection(doctype, name)), names, runs)
+
+		results.append({
+			"doctype": doctype,
+			"documents": len(names),
+			"full_ms": round(full_ms, 3),
+			"projected_ms": round(projected_ms, 3),
+			"full_bytes": round(full_bytes),
+			"projected_bytes": round(projected_bytes)
+		})
+
+	for row in results:
+		print(f"{row['doctype']:>8}  full {row['full_bytes']:>6} B {row['full_ms']:>9.3f} ms   "
+			f"projected {row['projected_bytes']:>6} B {row['projected_ms']:>9.3f} ms   "
+			f"({1 - row['projected_bytes'] / row['full_bytes']:.0%} smaller, {row['documents']} documents)")
+	return results
@@ -0,0 +1,103 @@
+import json
+import math
+import time
+
+import frappe
+from frappe.utils import now
+from library_app.benchmark.scenarios import EXCLUDED_METHODS, SCENARIOS, Pool, run_mixed_workload, run_scenario
+
+# A scenario regresses when its p99 grows, or its throughput drops, by more than this
+DEFAULT_TOLERANCE = 0.2
+
+def percentile(timings, fraction):
+	"""Nearest-rank percentile of a list of durations"""
+	ordered = sorted(timings)
+	return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+def summarize(timings, errors, elapsed=None, sizes=None):
+	"""Throughput, latency and response size of a scenario, in calls per second, milliseconds and bytes"""
+	if not timings:
+		return {"calls": 0, "errors": errors}
+	summary = {
+		"calls": len(timings),
+		"errors": errors,
+		"throughput_per_s": round(len(timings) / (elapsed or sum(timings)), 2),
+		"mean_ms": round(sum(timings) / len(timings) * 1000, 3),
+		"p50_ms": round(percentile(timings, 0.5) * 1000, 3),
+		"p99_ms": round(percentile(timings, 0.99) * 1000, 3)
+	}
+	if sizes:
+		summary["mean_response_bytes"] = round(sum(sizes) / len(sizes))
+	return summary
+
+def run_benchmark(scale=None, iterations=50, methods=None, seed=42, workers=4, operations=200, use_cache=False):
+	"""Run every scenario against the benchmark data and return the results
+
+	Read endpoints skip the response cache unless `use_cache` is set, so
+	the numbers describe the queries rather than Redis. The mixed
+	checkout/return workload runs last, since it commits.
+	"""
+	pool = Pool(seed)
+	selected = [method for method in SCENARIOS if not methods or method in methods]
+	results = {}
+
+	frappe.flags.library_bypass_response_cache = not use_cache
+	try:
+		for method in selected:
+			timings, sizes, errors = run_scenario(method, SCENARIOS[method], pool, iterations)
+			results[method] = summarize(timings, errors, sizes=sizes)
+			print(f"{method:<40} p50 {results[method].get('p50_ms', 0):>9.3f} ms   "
+				f"p99 {results[method].get('p99_ms', 0):>9.3f} ms   errors {errors}")
+
+		if workers and (not methods or "mixed" in methods):
+			for name, (timings, errors, elapsed) in run_mixed_workload(pool, workers, operations, seed).items():
+				results[name] = summarize(timings, errors, elapsed)
+				print(f"{name:<40} {results[name].get('throughput_per_s', 0):>9.2f} /s   "
+					f"p99 {results[name].get('p99_ms', 0):>9.3f} ms   errors {errors}")
+	finally:
+		frappe.flags.library_bypass_response_cache = False
+
+	return {
+		"scale": scale,
+		"seed": seed,
+		"iterations": iterations,
+		"workers": workers,
+		"response_cache": bool(use_cache),
+		"run_at": now(),
+		"scenarios": results,
+		"excluded": EXCLUDED_METHODS
+	}
+
+def compare_with_baseline(results, baseline, tolerance=DEFAULT_TOLERANCE):
+	"""List the scenarios that got slower, or whose responses grew, by more than `tolerance`"""
+	regressions = []
+	for name, current in results["scenarios"].items():
+		previous = baseline.get("scenarios", {}).get(name)
+		if not previous or not current.get("calls") or not previous.get("calls"):
+			continue
+		if current["p99_ms"] > previous["p99_ms"] * (1 + tolerance):
+			regressions.append(f"{name}: p99 {previous['p99_ms']} ms -> {current['p99_ms']} ms")
+		if current["throughput_per_s"] < previous["throughput_per_s"] * (1 - tolerance):
+			regressions.append(f"{name}: throughput {previous['throughput_per_s']}/s -> {current['throughput_per_s']}/s")
+		if current.get("mean_response_bytes", 0) > previous.get("mean_response_bytes", math.inf) * (1 + tolerance):
+			regressions.append(f"{name}: response {previous['mean_response_bytes']} bytes -> {current['mean_response_bytes']} bytes")
+	return regressions
+
+def run(output=None, baseline=None, tolerance=DEFAULT_TOLERANCE, **kwargs):
+	"""Run the benchmark, write its JSON and fail on regressions against a baseline file"""
+	start = time.monotonic()
+	results = run_benchmark(**kwargs)
+	print(f"Ran {len(results['scenarios'])} scenarios in {time.monotonic() - start:.1f}s")
+
+	if output:
+		with open(output, "w") as f:
+			json.dump(results, f, indent=2, sort_keys=True)
+		print(f"Results written to {output}")
+
+	if baseline:
+		with open(baseline) as f:
+			regressions = compare_with_baseline(results, json.load(f), tolerance)
+		if regressions:
+			frappe.throw("Benchmark regressed against the baseline:\n" + "\n".join(regressions))
+		print(f"No scenario regressed by more than {tolerance:.0%} against {baseline}")
+	return results
@@ -0,0 +1,271 @@
+import random
+import threading
+import time
+from datetime import timedelta
+
+import frappe
+from frappe.utils import getdate, today
+from library_app import projection
+from library_app.api.auth import generate_membership_id
+from library_app.benchmark.data import BENCHMARK_OWNER, BOOK_ZIPF_EXPONENT, MEMBER_ZIPF_EXPONENT, WORDS, ZipfSampler
+from library_app.settings import get_settings
+
+class Pool:
+	"""Names from the benchmark data set that scenarios draw their arguments from
+
+	Books are ranked by loan count and members by loans taken, so reads hit
+	the same hot rows a real library would.
+	"""
+	def __init__(self, seed):
+		self.rng = random.Random(seed)
+		self.max_loans = get_settings().max_loans_per_member
+
+		self.books = frappe.db.sql_list("""
+			SELECT b.name FROM `tabBook` b
+			LEFT JOIN `tabBook Popularity` p ON p.name = b.name
+			WHERE b.owner = %(owner)s
+			ORDER BY IFNULL(p.loan_count, 0) DESC, b.name
+		""", {"owner": BENCHMARK_OWNER})
+		members = frappe.db.sql("""
+			SELECT m.name, m.name1, COUNT(l.name) as loans, SUM(l.returned = 0) as active_loans
+			FROM `tabMember` m
+			LEFT JOIN `tabLoan` l ON l.member = m.name
+			WHERE m.owner = %(owner)s
+			GROUP BY m.name, m.name1
+			ORDER BY loans DESC, m.name
+		""", {"owner": BENCHMARK_OWNER}, as_dict=True)
+		if not self.books or not members:
+			frappe.throw("No benchmark data found, run bench generate-benchmark-data first")
+
+		self.members = [m.name for m in members]
+		self.member_names = [m.name1 for m in members]
+		self.eligible_members = [m.name for m in members if (m.active_loans or 0) < self.max_loans]
+		self.available_books = frappe.get_all("Book",
+			filters={"owner": BENCHMARK_OWNER, "available_copies": [">", 0]}, pluck="name")
+		self.unavailable_books = frappe.get_all("Book",
+			filters={"owner": BENCHMARK_OWNER, "available_copies": 0}, pluck="name")
+		self.active_loans = frappe.get_all("Loan",
+			filters={"member": ["in", self.members[:1000]], "returned": 0}, fields=["name", "return_date"])
+		self.pending_reservations = frappe.get_all("Reservation",
+			filters={"member": ["in", self.members[:1000]], "status": "Pending"}, pluck="name")
+
+		self.book_sampler = ZipfSampler(self.books, self.rng, BOOK_ZIPF_EXPONENT)
+		self.member_sampler = ZipfSampler(self.members, self.rng, MEMBER_ZIPF_EXPONENT)
+
+	def book(self):
+		return self.book_sampler.pick()
+
+	def member(self):
+		return self.member_sampler.pick()
+
+	def word(self):
+		return self.rng.choice(WORDS)
+
+	def pick(self, names):
+		return self.rng.choice(names) if names else None
+
+	def new_email(self):
+		return f"bench-{frappe.generate_hash(length=10)}@bench.example.com"
+
+def create_book(pool):
+	"""A throwaway book, rolled back with the call that uses it"""
+	from library_app.api.book import create_book
+	return create_book(f"Bench {pool.word().title()}", "Bench Author")["data"]["name"]
+
+def create_member(pool):
+	"""A throwaway member, rolled back with the call that uses it"""
+	from library_app.api.member import create_member
+	return create_member("Bench Member", generate_membership_id(), pool.new_email())["data"]["name"]
+
+def extended_return_date(pool):
+	loan = pool.pick(pool.active_loans)
+	return {"loan_id": loan.name, "new_return_date": str(getdate(loan.return_date) + timedelta(days=7))}
+
+def remove_registered(kwargs, result):
+	"""register_members commits per chunk, so its members and users are deleted again"""
+	for row in (result or {}).get("data") or []:
+		if row.get("member"):
+			frappe.delete_doc("Member", row["member"], ignore_permissions=True, force=True)
+	for item in kwargs["members"]:
+		if frappe.db.exists("User", item["email"]):
+			frappe.delete_doc("User", item["email"], ignore_permissions=True, force=True)
+	frappe.db.commit()
+
+# API method (relative to library_app.api) -> how to call it. `args` draws the
+# arguments from the pool and runs untimed; calls with `writes` are rolled back
+# after each run so every run sees the same data.
+SCENARIOS = {
+	"auth.get_current_user": frappe._dict(args=lambda pool: {}),
+	"auth.register_member": frappe._dict(writes=True, args=lambda pool: {
+		"full_name": "Bench Member", "email": pool.new_email(), "password": frappe.generate_hash(length=16)
+	}),
+	"auth.register_members": frappe._dict(writes=True, cleanup=remove_registered, args=lambda pool: {
+		"members": [
+			{"full_name": "Bench Member", "email": pool.new_email(), "password": frappe.generate_hash(length=16)}
+			for _ in range(10)
+		]
+	}),
+	"book.get_all_books": frappe._dict(args=lambda pool: {"limit": 20, "start": pool.rng.randrange(0, 200)}),
+	"book.get_book": frappe._dict(args=lambda pool: {"book_id": pool.book()}),
+	"book.search_books": frappe._dict(args=lambda pool: {"query": pool.word()}),
+	"book.create_book": frappe._dict(writes=True, args=lambda pool: {
+		"title": f"Bench {pool.word().title()}", "author": "Bench Author", "copies": 2
+	}),
+	"book.update_book": frappe._dict(writes=True, args=lambda pool: {
+		"book_id": pool.book(), "description": f"Updated by the benchmark {pool.word()}"
+	}),
+	"book.add_book_copies": frappe._dict(writes=True, args=lambda pool: {"book_id": pool.book(), "count": 1}),
+	"book.delete_book": frappe._dict(writes=True, args=lambda pool: {"book_id": create_book(pool)}),
+	"member.get_all_members": frappe._dict(args=lambda pool: {"limit": 20, "start": pool.rng.randrange(0, 200)}),
+	"member.get_member": frappe._dict(args=lambda pool: {"member_id": pool.member()}),
+	"member.search_members": frappe._dict(args=lambda pool: {"query": pool.pick(pool.member_names).split()[0]}),
+	"member.check_borrowing_eligibility": frappe._dict(args=lambda pool: {
+		"members": [pool.member() for _ in range(10)]
+	}),
+	"member.create_member": frappe._dict(writes=True, args=lambda pool: {
+		"name1": "Bench Member",
+		"membership_id": generate_membership_id(),
+		"email": pool.new_email()
+	}),
+	"member.update_member": frappe._dict(writes=True, args=lambda pool: {
+		"member_id": pool.member(), "address": f"{pool.rng.randint(1, 999)} {pool.word().title()} Street"
+	}),
+	"member.delete_member": frappe._dict(writes=True, args=lambda pool: {"member_id": create_member(pool)}),
+	"loan.get_all_loans": frappe._dict(args=lambda pool: {"limit": 20, "start": pool.rng.randrange(0, 200)}),
+	"loan.get_active_loans": frappe._dict(args=lambda pool: {}),
+	"loan.get_overdue_loans": frappe._dict(args=lambda pool: {}),
+	"loan.create_loan": frappe._dict(writes=True, args=lambda pool: {
+		"book": pool.pick(pool.available_books), "member": pool.pick(pool.eligible_members)
+	}),
+	"loan.return_book": frappe._dict(writes=True, args=lambda pool: {"loan_id": pool.pick(pool.active_loans).name}),
+	"loan.extend_loan": frappe._dict(writes=True, args=extended_return_date),
+	"loan.bulk_create_loans": frappe._dict(writes=True, args=lambda pool: {
+		"loans": [
+			{"book": book, "member": pool.pick(pool.eligible_members)}
+			for book in pool.rng.sample(pool.available_books, min(10, len(pool.available_books)))
+		]
+	}),
+	"loan.bulk_return_books": frappe._dict(writes=True, args=lambda pool: {
+		"loan_ids": [loan.name for loan in pool.rng.sample(pool.active_loans, min(10, len(pool.active_loans)))]
+	}),
+	"reservation.get_member_reservations": frappe._dict(args=lambda pool: {"member": pool.member()}),
+	"reservation.get_book_reservations": frappe._dict(args=lambda pool: {"book": pool.book()}),
+	"reservation.create_reservation": frappe._dict(writes=True, args=lambda pool: {
+		"book": pool.pick(pool.unavailable_books), "member": pool.member()
+	}),
+	"reservation.cancel_reservation": frappe._dict(writes=True, args=lambda pool: {
+		"reservation_id": pool.pick(pool.pending_reservations)
+	}),
+	"reports.get_active_loans_report": frappe._dict(args=lambda pool: {}),
+	"reports.get_overdue_books_report": frappe._dict(args=lambda pool: {}),
+	"reports.get_popular_books_report": frappe._dict(args=lambda pool: {"limit": 10, "window": pool.pick([None, 30, 90, 365])}),
+	"reports.get_member_activity_report": frappe._dict(args=lambda pool: {"limit": 10}),
+	"reports.get_library_statistics": frappe._dict(args=lambda pool: {}),
+	"batch.batch": frappe._dict(args=lambda pool: {
+		"calls": [{"method": "book.get_book", "args": {"book_id": pool.book()}} for _ in range(5)]
+			+ [{"method": "member.get_member", "args": {"member_id": pool.member()}}],
+		"parallel": 0
+	})
+}
+
+# API methods no scenario calls, and why
+EXCLUDED_METHODS = {
+	"auth.login": "starts a session on the HTTP request",
+	"auth.logout": "ends the session on the HTTP request",
+	"auth.change_password": "would change the password of the user running the benchmark",
+	"reports.export_active_loans_report": "writes a file to disk",
+	"reports.export_overdue_books_report": "writes a file to disk",
+	"metrics.get_metrics": "reads instrumentation counters, not library data",
+	"metrics.reset_metrics": "would wipe the instrumentation counters"
+}
+
+def run_scenario(method, scenario, pool, iterations):
+	"""Call one API method `iterations` times, returning the wall time and response size of each call"""
+	fn = frappe.get_attr(f"library_app.api.{method}")
+	timings = []
+	sizes = []
+	errors = 0
+	for _ in range(iterations):
+		kwargs = scenario.args(pool)
+		start = time.perf_counter()
+		try:
+			result = fn(**kwargs)
+		except Exception:
+			result = None
+		timings.append(time.perf_counter() - start)
+		sizes.append(len(projection.dumps(result)))
+
+		if not (isinstance(result, dict) and result.get("success")):
+			errors += 1
+		if scenario.writes:
+			frappe.db.rollback()
+		if scenario.cleanup:
+			scenario.cleanup(kwargs, result)
+		frappe.clear_messages()
+	return timings, sizes, errors
+
+def run_mixed_workload(pool, workers=4, operations=200, seed=42):
+	"""Check out and return books from several connections at once
+
+	Each worker thread has its own connection and commits every operation,
+	so the calls contend for copies and counters the way concurrent desk
+	staff would. A worker checks out a popular book, or returns one of its
+	own loans about half the time, and returns whatever it still holds at
+	the end. Timings are per operation, across all workers.
+	"""
+	from library_app.api.loan import create_loan, return_book
+
+	site = frappe.local.site
+	sites_path = frappe.local.sites_path
+	results = {"checkout": [], "return": []}
+	errors = {"checkout": 0, "return": 0}
+	lock = threading.Lock()
+
+	def record(operation, duration, result):
+		with lock:
+			results[operation].append(duration)
+			if not (isinstance(result, dict) and result.get("success")):
+				errors[operation] += 1
+
+	def worker(index):
+		rng = random.Random(seed + index)
+		book_sampler = ZipfSampler(pool.available_books, rng, BOOK_ZIPF_EXPONENT)
+		members = pool.eligible_members[index::workers]
+		loans = []
+
+		frappe.init(site=site, sites_path=sites_path)
+		try:
+			frappe.connect()
+			frappe.set_user("Administrator")
+			for _ in range(operations // workers):
+				if loans and rng.random() < 0.5:
+					operation, call = "return", lambda: return_book(loans.pop(rng.randrange(len(loans))))
+				else:
+					operation, call = "checkout", lambda: create_loan(book_sampler.pick(), rng.choice(members))
+
+				start = time.perf_counter()
+				try:
+					result = call()
+					frappe.db.commit()
+				except Exception:
+					frappe.db.rollback()
+					result = None
+				record(operation, time.perf_counter() - start, result)
+
+				if operation == "checkout" and result and result.get("success"):
+					loans.append(result["data"]["name"])
+		finally:
+			for loan in loans:
+				return_book(loan, today())
+			frappe.db.commit()
+			frappe.destroy()
+
+	threads = [threading.Thread(target=worker, args=(index,)) for index in range(workers)]
+	start = time.perf_counter()
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	elapsed = time.perf_counter() - start
+
+	return {f"mixed.{operation}": (timings, errors[operation], elapsed) for operation, timings in results.items()}
@@ -0,0 +1,309 @@
+import csv
+import hashlib
+import os
+import re
+import time
+
+import frappe
+from frappe.utils import cint, getdate, now
+from library_app import inventory, response_cache, search, statistics
+
+IMPORT_FORMATS = ("csv", "marc")
+
+# Records validated, deduplicated and inserted per committed chunk
+IMPORT_CHUNK_SIZE = 1000
+
+IMPORT_CHECKPOINT_PREFIX = "library_app_catalogue_import"
+
+# CSV columns understood by the importer; title and author are required
+CSV_COLUMNS = ("title", "author", "isbn", "publish_date", "description", "category", "copies", "location")
+
+# Length of a Data column; longer values make the raw insert fail
+MAX_DATA_LENGTH = 140
+
+# Data fields of Book and Book Copy filled from a record, with their labels
+DATA_FIELDS = {"title": "Title", "author": "Author", "category": "Category", "location": "Location"}
+
+def clean_isbn(value):
+	"""Strip separators from an ISBN and upper-case a trailing X"""
+	return re.sub(r"[\s-]", "", value or "").upper()
+
+def is_valid_isbn10(isbn):
+	"""Check the length, characters and mod 11 checksum of an ISBN-10"""
+	if not re.match(r"^\d{9}[\dX]$", isbn):
+		return False
+	digits = [10 if c == "X" else int(c) for c in isbn]
+	return sum((10 - i) * d for i, d in enumerate(digits)) % 11 == 0
+
+def is_valid_isbn13(isbn):
+	"""Check the length, characters and mod 10 checksum of an ISBN-13"""
+	if not re.match(r"^\d{13}$", isbn):
+		return False
+	return sum(int(c) * (3 if i % 2 else 1) for i, c in enumerate(isbn)) % 10 == 0
+
+def is_valid_isbn(isbn):
+	"""Check a cleaned ISBN-10 or ISBN-13 including its checksum"""
+	return is_valid_isbn10(isbn) or is_valid_isbn13(isbn)
+
+def isbn10_to_isbn13(isbn):
+	"""Convert a valid ISBN-10 to its 978-prefixed ISBN-13"""
+	core = "978" + isbn[:9]
+	check = (10 - sum(int(c) * (3 if i % 2 else 1) for i, c in enumerate(core)) % 10) % 10
+	return core + str(check)
+
+def isbn13_to_isbn10(isbn):
+	"""Convert a 978-prefixed ISBN-13 to its ISBN-10, or None"""
+	if not isbn.startswith("978"):
+		return None
+	core = isbn[3:12]
+	check = (11 - sum((10 - i) * int(c) for i, c in enumerate(core)) % 11) % 11
+	return core + ("X" if check == 10 else str(check))
+
+def isbn_forms(isbn):
+	"""Both spellings of an ISBN, so an ISBN-10 matches its ISBN-13 twin"""
+	other = isbn10_to_isbn13(isbn) if len(isbn) == 10 else isbn13_to_isbn10(isbn)
+	return {isbn, other} - {None}
+
+def read_csv(path):
+	"""Yield the rows of a CSV catalogue as dicts, one at a time"""
+	with open(path, newline="", encoding="utf-8-sig") as f:
+		for row in csv.DictReader(f):
+			yield {column: (row.get(column) or "").strip() for column in CSV_COLUMNS}
+
+def read_marc(path):
+	"""Yield the records of a binary MARC 21 catalogue as dicts, one at a time"""
+	try:
+		from pymarc import MARCReader
+	except ImportError:
+		frappe.throw("MARC import requires the pymarc package")
+
+	def subfield(record, tag, code):
+		for field in record.get_fields(tag):
+			values = field.get_subfields(code)
+			if values:
+				return values[0].strip(" /:;,.")
+		return ""
+
+	with open(path, "rb") as f:
+		for record in MARCReader(f, to_unicode=True, force_utf8=True):
+			if record is None:
+				# pymarc yields None for a record it could not decode
+				yield {"error": "Unreadable MARC record"}
+				continue
+
+			title = subfield(record, "245", "a")
+			subtitle = subfield(record, "245", "b")
+			year = re.search(r"\d{4}", subfield(record, "264", "c") or subfield(record, "260", "c"))
+			yield {
+				"title": f"{title}: {subtitle}" if subtitle else title,
+				"author": subfield(record, "100", "a") or subfield(record, "110", "a"),
+				# 020 $a may carry a qualifier such as "(pbk.)"
+				"isbn": subfield(record, "020", "a").split(" ")[0],
+				"publish_date": f"{year.group(0)}-01-01" if year else "",
+				"description": subfield(record, "520", "a"),
+				"category": subfield(record, "650", "a"),
+				"copies": "",
+				"location": ""
+			}
+
+def parse_row(row):
+	"""Validate and normalize one record, raising ValueError on bad data"""
+	if row.get("error"):
+		raise ValueError(row["error"])
+
+	title = (row.get("title") or "").strip()
+	author = (row.get("author") or "").strip()
+	if not title:
+		raise ValueError("Title is missing")
+	if not author:
+		raise ValueError("Author is missing")
+	for field, label in DATA_FIELDS.items():
+		if len((row.get(field) or "").strip()) > MAX_DATA_LENGTH:
+			raise ValueError(f"{label} is longer than {MAX_DATA_LENGTH} characters")
+
+	isbn = clean_isbn(row.get("isbn"))
+	if isbn and not is_valid_isbn(isbn):
+		raise ValueError(f"Invalid ISBN '{row.get('isbn')}'")
+
+	publish_date = None
+	if row.get("publish_date"):
+		try:
+			publish_date = getdate(row["publish_date"])
+		except Exception:
+			raise ValueError(f"Invalid publish date '{row['publish_date']}'")
+
+	copies = cint(row.get("copies")) if row.get("copies") else 1
+	if copies < 0:
+		raise ValueError("Copies cannot be negative")
+
+	return frappe._dict(
+		title=title,
+		author=author,
+		isbn=isbn or None,
+		publish_date=publish_date,
+		description=row.get("description") or None,
+		category=row.get("category") or None,
+		copies=copies,
+		location=row.get("location") or None
+	)
+
+def get_existing_isbns(isbns):
+	"""Return which of the given ISBN spellings already exist, in one query"""
+	if not isbns:
+		return set()
+	return set(frappe.db.sql_list("""
+		SELECT isbn FROM `tabBook` WHERE isbn IN %(isbns)s
+	""", {"isbns": tuple(isbns)}))
+
+def import_chunk(rows):
+	"""Validate, deduplicate and insert one chunk of (row number, record)
+
+	Returns the number of books inserted and the per-row errors.
+	"""
+	errors = []
+	parsed = []
+	for row_number, row in rows:
+		try:
+			parsed.append((row_number, parse_row(row)))
+		except ValueError as e:
+			errors.append({"row": row_number, "error": str(e)})
+
+	existing = get_existing_isbns({form for _, book in parsed if book.isbn for form in isbn_forms(book.isbn)})
+
+	books = []
+	seen = set()
+	for row_number, book in parsed:
+		if book.isbn:
+			forms = isbn_forms(book.isbn)
+			if forms & existing:
+				errors.append({"row": row_number, "error": f"ISBN {book.isbn} is already in the catalogue"})
+				continue
+			if forms & seen:
+				errors.append({"row": row_number, "error": f"ISBN {book.isbn} appears twice in the file"})
+				continue
+			seen |= forms
+
+		book.name = frappe.generate_hash(length=10)
+		books.append((row_number, book))
+
+	insert_errors = insert_chunk(books)
+	errors.extend(insert_errors)
+	return len(books) - len(insert_errors), errors
+
+def insert_chunk(books):
+	"""Insert (row number, book) pairs, one row at a time if the chunk fails
+
+	A value the database rejects, or an ISBN inserted concurrently by
+	someone else, fails the bulk insert. The chunk is then rolled back and
+	retried book by book, so only the offending rows are reported.
+	"""
+	if not books:
+		return []
+
+	frappe.db.savepoint("catalogue_chunk")
+	try:
+		insert_books([book for _, book in books])
+		return []
+	except Exception:
+		frappe.db.rollback(save_point="catalogue_chunk")
+
+	errors = []
+	for row_number, book in books:
+		frappe.db.savepoint("catalogue_row")
+		try:
+			insert_books([book])
+		except Exception as e:
+			frappe.db.rollback(save_point="catalogue_row")
+			errors.append({"row": row_number, "error": str(e)})
+	return errors
+
+def insert_books(books):
+	"""Insert parsed books with their copies, search tokens and counters"""
+	timestamp = now()
+	user = frappe.session.user
+	frappe.db.bulk_insert("Book",
+		fields=[
+			"name", "title", "author", "isbn", "publish_date", "description", "category",
+			"is_available", "total_copies", "available_copies", "reservation_sequence",
+			"creation", "modified", "owner", "modified_by"
+		],
+		values=[(
+			book.name, book.title, book.author, book.isbn, book.publish_date, book.description, book.category,
+			1 if book.copies else 0, book.copies, book.copies, 0,
+			timestamp, timestamp, user, user
+		) for book in books]
+	)
+
+	inventory.insert_many_copies([(book.name, book.copies, book.location) for book in books])
+	search.insert_tokens(books)
+
+	available = sum(1 for book in books if book.copies)
+	statistics.update_statistics({
+		"total_books": len(books),
+		"available_books": available,
+		"books_on_loan": len(books) - available
+	})
+	response_cache.invalidate(("Book", None))
+
+def get_checkpoint_key(path):
+	"""Key of the import checkpoint of a file, by absolute path"""
+	return f"{IMPORT_CHECKPOINT_PREFIX}|{hashlib.sha1(os.path.abspath(path).encode()).hexdigest()}"
+
+def get_checkpoint(path):
+	"""Get the rows already imported from this file, if it is unchanged"""
+	checkpoint = frappe.db.get_global(get_checkpoint_key(path)) or ""
+	size, _, rows_done = checkpoint.partition("|")
+	return cint(rows_done) if size == str(os.path.getsize(path)) else 0
+
+def set_checkpoint(path, rows_done):
+	"""Record how many rows of this file are imported"""
+	frappe.db.set_global(get_checkpoint_key(path), f"{os.path.getsize(path)}|{rows_done}")
+
+def import_catalogue(path, file_format="csv", chunk_size=IMPORT_CHUNK_SIZE, restart=False):
+	"""Stream a CSV or MARC catalogue into Book, committing per chunk
+
+	Each chunk is committed together with a checkpoint, so an interrupted
+	run picks up after the last committed chunk when started again on the
+	same file. Rows that fail validation or duplicate an ISBN are skipped
+	and reported with their row number.
+	"""
+	if file_format not in IMPORT_FORMATS:
+		frappe.throw(f"Import format must be one of {', '.join(IMPORT_FORMATS)}")
+
+	start_time = time.monotonic()
+	reader = read_csv if file_format == "csv" else read_marc
+	skip = 0 if restart else get_checkpoint(path)
+
+	metrics = {"rows": 0, "imported": 0, "failed": 0, "skipped": skip, "chunks": 0}
+	errors = []
+	chunk = []
+
+	def flush(rows_done):
+		imported, chunk_errors = import_chunk(chunk)
+		set_checkpoint(path, rows_done)
+		frappe.db.commit()
+
+		metrics["rows"] += len(chunk)
+		metrics["imported"] += imported
+		metrics["failed"] += len(chunk_errors)
+		metrics["chunks"] += 1
+		errors.extend(chunk_errors)
+		chunk.clear()
+
+	row_number = 0
+	for row_number, row in enumerate(reader(path), start=1):
+		if row_number <= skip:
+			continue
+		chunk.append((row_number, row))
+		if len(chunk) >= chunk_size:
+			flush(row_number)
+
+	if chunk:
+		flush(row_number)
+
+	elapsed = time.monotonic() - start_time
+	metrics["seconds"] = round(elapsed, 3)
+	metrics["rows_per_second"] = round(metrics["rows"] / elapsed, 1) if elapsed else 0
+	print(f"Imported {metrics['imported']} of {metrics['rows']} rows in {metrics['chunks']} chunks "
+		f"({metrics['failed']} failed, {skip} already imported, {metrics['rows_per_second']} rows/s)")
+	return {**metrics, "errors": errors}
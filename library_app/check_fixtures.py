@@ -0,0 +1,32 @@
+import frappe
+from library_app import membership
+
+def create_book(label, copies=None):
+	"""Insert a book for a check, with `copies` copies (one by default), and return its name"""
+	book = frappe.get_doc({
+		"doctype": "Book",
+		"title": f"{label} {frappe.generate_hash(length=6)}",
+		"author": label
+	})
+	if copies is not None:
+		book.flags.initial_copies = copies
+	return book.insert(ignore_permissions=True).name
+
+def create_members(count, label):
+	"""Insert `count` active members for a check, returning {name: email} in insertion order"""
+	slug = label.lower().replace(" ", "-")
+	members = {}
+	for membership_id in membership.allocate_membership_ids(count):
+		member = frappe.get_doc({
+			"doctype": "Member",
+			"name1": label,
+			"membership_id": membership_id,
+			"email": f"{slug}-{frappe.generate_hash(length=10)}@example.com",
+			"status": "Active"
+		}).insert(ignore_permissions=True)
+		members[member.name] = member.email
+	return members
+
+def remove_members(members):
+	for member in members:
+		frappe.delete_doc("Member", member, ignore_permissions=True, force=True)
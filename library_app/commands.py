@@ -0,0 +1,218 @@
+import click
+import frappe
+from frappe.commands import get_site, pass_context
+
+@click.command("rebuild-book-search-index")
+@click.option("--chunk-size", default=1000, help="Number of books indexed per commit")
+@pass_context
+def rebuild_book_search_index(context, chunk_size):
+	"""Rebuild the book search index from the Book table"""
+	from library_app.search import rebuild_index
+
+	frappe.init(site=get_site(context))
+	frappe.connect()
+	try:
+		rebuild_index(chunk_size=chunk_size)
+	finally:
+		frappe.destroy()
+
+@click.command("benchmark-book-search")
+@click.option("--query", "queries", multiple=True, help="Query to benchmark, can be repeated")
+@click.option("--runs", default=5, help="Runs per query, the median is reported")
+@pass_context
+def benchmark_book_search(context, queries, runs):
+	"""Compare the book search index against the LIKE based search"""
+	from library_app.search import benchmark
+
+	frappe.init(site=get_site(context))
+	frappe.connect()
+	try:
+		benchmark(queries=list(queries) or None, runs=runs)
+	finally:
+		frappe.destroy()
+
+@click.command("check-query-plans")
+@pass_context
+def check_query_plans(context):
+	"""Fail if a hot query or any API endpoint statement falls back to a full table scan"""
+	from library_app.indexes import check_query_plans as check_plans
+
+	frappe.init(site=get_site(context))
+	frappe.connect()
+	try:
+		check_plans()
+	finally:
+		frappe.destroy()
+
+@click.command("check-query-budgets")
+@pass_context
+def check_query_budgets(context):
+	"""Fail if checkout, reserve, return or cancel miss their query budget or run N+1 queries"""
+	from library_app.query_budget import check_query_budgets as check_budgets
+
+	frappe.init(site=get_site(context))
+	frappe.connect()
+	try:
+		check_budgets()
+	finally:
+		frappe.destroy()
+
+@click.command("import-catalogue")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "file_format", type=click.Choice(["csv", "marc"]), default="csv", help="Catalogue file format")
+@click.option("--chunk-size", default=1000, help="Number of records inserted per commit")
+@click.option("--restart", is_flag=True, help="Ignore the checkpoint of a previous run on this file")
+@click.option("--errors", "errors_path", type=click.Path(dir_okay=False), help="Write per-row errors to this CSV file")
+@pass_context
+def import_catalogue(context, path, file_format, chunk_size, restart, errors_path):
+	"""Import books from a CSV or MARC catalogue, resuming an interrupted run"""
+	import csv
+
+	from library_app.catalogue_import import import_catalogue as run_import
+
+	frappe.init(site=get_site(context))
+	frappe.connect()
+	try:
+		result = run_import(path, file_format=file_format, chunk_size=chunk_size, restart=restart)
+	finally:
+		frappe.destroy()
+
+	if errors_path and result["errors"]:
+		with open(errors_path, "w", newline="", encoding="utf-8") as f:
+			writer = csv.DictWriter(f, fieldnames=["row", "error"])
+			writer.writeheader()
+			writer.writerows(result["errors"])
+		print(f"Wrote {len(result['errors'])} row errors to {errors_path}")
+	else:
+		for error in result["errors"][:20]:
+			print(f"Row {error['row']}: {error['error']}")
+
+@click.command("generate-benchmark-data")
+@click.option("--scale", type=click.Choice(["10k", "100k", "1m"]), default="10k", help="Data set size, by number of loans")
+@click.option("--seed", default=42, help="Random seed, the same seed generates the same data")
+@click.option("--clear", is_flag=True, help="Remove previously generated benchmark data first")
+@pass_context
+def generate_benchmark_data(context, scale, seed, clear):
+	"""Fill the site with synthetic books, members, loans and reservations"""
+	from library_app.benchmark.data import clear_data, generate_data
+
+	frappe.init(site=get_site(context))
+	frappe.connect()
+	try:
+		if clear:
+			clear_data()
+		generate_data(scale=scale, seed=seed)
+	finally:
+		frappe.destroy()
+
+@click.command("run-library-benchmark")
+@click.option("--scale", help="Scale of the generated data, recorded in the results")
+@click.option("--method", "methods", multiple=True, help="Only run this scenario (e.g. book.get_book or mixed), can be repeated")
+@click.option("--iterations", default=50, help="Calls per scenario")
+@click.option("--workers", default=4, help="Threads of the mixed checkout/return workload, 0 to skip it")
+@click.option("--operations", default=200, help="Operations of the mixed workload, across all workers")
+@click.option("--seed", default=42, help="Random seed for scenario arguments")
+@click.option("--use-cache", is_flag=True, help="Serve read endpoints from the response cache")
+@click.option("--output", type=click.Path(dir_okay=False), help="Write the results as JSON to this file")
+@click.option("--baseline", type=click.Path(exists=True, dir_okay=False), help="Fail if slower than this results file")
+@click.option("--tolerance", default=0.2, help="Allowed slowdown against the baseline, as a fraction")
+@pass_context
+def run_library_benchmark(context, scale, methods, iterations, workers, operations, seed, use_cache, output, baseline, tolerance):
+	"""Measure throughput, p50 and p99 of every API method on the benchmark data"""
+	from library_app.benchmark.runner import run
+
+	frappe.init(site=get_site(context))
+	frappe.connect()
+	try:
+		run(output=output, baseline=baseline, tolerance=tolerance, scale=scale, iterations=iterations,
+			methods=list(methods) or None, seed=seed, workers=workers, operations=operations, use_cache=use_cache)
+	finally:
+		frappe.destroy()
+
+@click.command("benchmark-payloads")
+@click.option("--samples", default=200, help="Books and members loaded per run")
+@click.option("--runs", default=5, help="Runs per path, the median is reported")
+@pass_context
+def benchmark_payloads(context, samples, runs):
+	"""Compare full as_dict payloads against the lean API projections"""
+	from library_app.benchmark.payloads import compare_payloads
+
+	frappe.init(site=get_site(context))
+	frappe.connect()
+	try:
+		compare_payloads(samples=samples, runs=runs)
+	finally:
+		frappe.destroy()
+
+@click.command("check-outbox-delivery")
+@click.option("--port", default=1025, help="Port the SMTP stub listens on")
+@pass_context
+def check_outbox_delivery(context, port):
+	"""Fail unless concurrent outbox drains deliver every notification to an SMTP stub exactly once"""
+	from library_app.outbox_check import check_outbox_delivery as check_delivery
+
+	frappe.init(site=get_site(context))
+	frappe.connect()
+	try:
+		check_delivery(port=port)
+	finally:
+		frappe.destroy()
+
+@click.command("check-concurrent-checkout")
+@click.option("--threads", default=8, help="Checkouts racing for the single copy")
+@pass_context
+def check_concurrent_checkout(context, threads):
+	"""Fail unless concurrent checkouts of a single-copy book create exactly one loan"""
+	from library_app.concurrency_check import check_single_copy_checkout
+
+	frappe.init(site=get_site(context))
+	frappe.connect()
+	try:
+		check_single_copy_checkout(threads=threads)
+	finally:
+		frappe.destroy()
+
+@click.command("check-concurrent-registration")
+@click.option("--threads", default=8, help="Registrations running at once")
+@click.option("--members", "members_per_thread", default=20, help="Members registered by each thread")
+@pass_context
+def check_concurrent_registration(context, threads, members_per_thread):
+	"""Fail if concurrent member registrations hit a unique constraint or share a membership ID"""
+	from library_app.concurrency_check import check_concurrent_registration as check_registration
+
+	frappe.init(site=get_site(context))
+	frappe.connect()
+	try:
+		check_registration(threads=threads, members_per_thread=members_per_thread)
+	finally:
+		frappe.destroy()
+
+@click.command("check-export-memory")
+@click.option("--scale", type=click.Choice(["10k", "100k", "1m"]), default="1m", help="Benchmark data set the site must hold")
+@click.option("--limit-mb", default=32, help="Most memory an export may allocate")
+@pass_context
+def check_export_memory(context, scale, limit_mb):
+	"""Fail if a CSV or Parquet report export allocates more than a fixed amount of memory"""
+	from library_app.benchmark.export_memory import check_export_memory as check_memory
+
+	frappe.init(site=get_site(context))
+	frappe.connect()
+	try:
+		check_memory(scale=scale, limit_mb=limit_mb)
+	finally:
+		frappe.destroy()
+
+commands = [
+	rebuild_book_search_index,
+	benchmark_book_search,
+	check_query_plans,
+	check_query_budgets,
+	import_catalogue,
+	generate_benchmark_data,
+	run_library_benchmark,
+	benchmark_payloads,
+	check_outbox_delivery,
+	check_concurrent_checkout,
+	check_concurrent_registration,
+	check_export_memory
+]
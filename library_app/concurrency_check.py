@@ -0,0 +1,132 @@
+import threading
+
+import frappe
+from library_app.check_fixtures import create_book, create_members, remove_members
+
+# Threads racing in each check
+DEFAULT_THREADS = 8
+
+def run_threads(count, fn):
+	"""Run fn(index) on `count` threads with their own connections, started together
+
+	Each call commits on success and rolls back on an exception. Returns
+	the result or the exception of every call, by index.
+	"""
+	site = frappe.local.site
+	sites_path = frappe.local.sites_path
+	barrier = threading.Barrier(count)
+	results = [None] * count
+
+	def worker(index):
+		frappe.init(site=site, sites_path=sites_path)
+		try:
+			frappe.connect()
+			frappe.set_user("Administrator")
+			barrier.wait()
+			try:
+				results[index] = fn(index)
+				frappe.db.commit()
+			except Exception as e:
+				frappe.db.rollback()
+				results[index] = e
+		finally:
+			frappe.destroy()
+
+	threads = [threading.Thread(target=worker, args=(index,)) for index in range(count)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	return results
+
+def check_single_copy_checkout(threads=DEFAULT_THREADS):
+	"""Race `threads` checkouts of a book with one copy and fail unless exactly one wins
+
+	Every thread checks the book out for its own member through
+	create_loan and commits. Afterwards the book must have exactly one
+	active loan and no free copy. The fixture is deleted at the end.
+	"""
+	from library_app.api.loan import create_loan
+
+	book = create_book("Concurrency Check", copies=1)
+	members = list(create_members(threads, "Concurrency Check"))
+	frappe.db.commit()
+
+	try:
+		results = run_threads(threads, lambda index: create_loan(book, members[index]))
+
+		problems = [f"checkout {index} raised {result!r}" for index, result in enumerate(results)
+			if isinstance(result, Exception)]
+		wins = sum(1 for result in results if isinstance(result, dict) and result.get("success"))
+		if wins != 1:
+			problems.append(f"{wins} checkouts succeeded instead of one")
+
+		active_loans = frappe.db.count("Loan", {"book": book, "returned": 0})
+		if active_loans != 1:
+			problems.append(f"the book has {active_loans} active loans instead of one")
+		available_copies = frappe.db.get_value("Book", book, "available_copies")
+		if available_copies != 0:
+			problems.append(f"the book has {available_copies} available copies instead of none")
+	finally:
+		for loan in frappe.get_all("Loan", filters={"book": book}, pluck="name"):
+			frappe.delete_doc("Loan", loan, ignore_permissions=True, force=True)
+		frappe.delete_doc("Book", book, ignore_permissions=True, force=True)
+		remove_members(members)
+		frappe.db.commit()
+
+	if problems:
+		frappe.throw("Single copy checkout check failed:\n" + "\n".join(problems))
+	print(f"{threads} concurrent checkouts of a single copy: one loan, no copy left")
+
+def check_concurrent_registration(threads=DEFAULT_THREADS, members_per_thread=20):
+	"""Register members from `threads` connections at once and fail on any duplicate
+
+	Every thread calls register_members with its own batch of new emails.
+	No item may fail, in particular not on a unique constraint, and every
+	membership ID handed out must be distinct. The members and their users
+	are deleted at the end.
+	"""
+	from library_app.api.auth import register_members
+	from library_app.benchmark.scenarios import remove_registered
+	from library_app.membership import ensure_sequences
+
+	# DDL commits, so the sequences are created before the threads start
+	ensure_sequences()
+	batches = [{"members": [{
+		"full_name": "Concurrency Check",
+		"email": f"concurrency-{frappe.generate_hash(length=10)}@example.com",
+		"password": frappe.generate_hash(length=16)
+	} for _ in range(members_per_thread)]} for _ in range(threads)]
+
+	results = run_threads(threads, lambda index: register_members(**batches[index]))
+	try:
+		problems = []
+		for index, result in enumerate(results):
+			if isinstance(result, Exception):
+				problems.append(f"registration {index} raised {result!r}")
+			elif not result.get("success"):
+				problems.append(f"registration {index} failed: {result.get('error')}")
+			else:
+				problems += [f"registration {index} item {row['index']}: {row['error']}"
+					for row in result["data"] if not row["success"]]
+
+		members = [row["member"] for result in results if isinstance(result, dict)
+			for row in result.get("data") or [] if row.get("member")]
+		membership_ids = frappe.get_all("Member", filters={"name": ["in", members]}, pluck="membership_id") if members else []
+		duplicates = frappe.db.sql("""
+			SELECT membership_id, COUNT(*) FROM `tabMember`
+			WHERE membership_id IN %(ids)s
+			GROUP BY membership_id
+			HAVING COUNT(*) > 1
+		""", {"ids": tuple(membership_ids)}) if membership_ids else []
+		problems += [f"membership ID {membership_id} is used by {count} members" for membership_id, count in duplicates]
+		if len(members) != threads * members_per_thread:
+			problems.append(f"{len(members)} members registered instead of {threads * members_per_thread}")
+	finally:
+		for batch, result in zip(batches, results):
+			remove_registered(batch, result if isinstance(result, dict) else None)
+
+	if problems:
+		frappe.throw("Concurrent registration check failed:\n" + "\n".join(problems))
+	print(f"{threads} concurrent registrations of {members_per_thread} members: "
+		f"{len(members)} members, all membership IDs distinct")
@@ -0,0 +1,68 @@
+import frappe
+from library_app.settings import get_settings
+
+def get_member_snapshots(members):
+	"""Get status and active/overdue loan counts for many members in one query
+
+	Results are memoized for the rest of the request; call clear_cache once
+	a member's loans change.
+	"""
+	cache = getattr(frappe.local, "library_eligibility", None)
+	if cache is None:
+		cache = frappe.local.library_eligibility = {}
+	missing = [member for member in set(members) if member and member not in cache]
+
+	if missing:
+		rows = frappe.db.sql("""
+			SELECT m.name, m.status,
+			       COUNT(l.name) as active_loans,
+			       COUNT(CASE WHEN l.is_overdue = 1 THEN 1 END) as overdue_loans
+			FROM `tabMember` m
+			LEFT JOIN `tabLoan` l ON l.member = m.name AND l.returned = 0
+			WHERE m.name IN %(members)s
+			GROUP BY m.name, m.status
+		""", {"members": tuple(missing)}, as_dict=True)
+
+		for member in missing:
+			cache[member] = None
+		for row in rows:
+			cache[row.name] = row
+
+	return {member: cache.get(member) for member in members}
+
+def evaluate(snapshot):
+	"""Decide if a member snapshot may borrow another book"""
+	if not snapshot:
+		return False, "Member not found"
+
+	max_loans = get_settings().max_loans_per_member
+	if snapshot.active_loans >= max_loans:
+		return False, f"Maximum loan limit ({max_loans}) reached"
+
+	if snapshot.status != "Active":
+		return False, f"Member status is {snapshot.status}"
+
+	# Check for overdue books
+	if snapshot.overdue_loans:
+		return False, "Cannot borrow new books while having overdue items"
+
+	return True, "Can borrow"
+
+def check_eligibility(member):
+	"""Check if a member can borrow more books, as (can_borrow, message)"""
+	return evaluate(get_member_snapshots([member])[member])
+
+def check_eligibility_batch(members):
+	"""Check many members at once, as {member: (can_borrow, message)}"""
+	snapshots = get_member_snapshots(members)
+	return {member: evaluate(snapshot) for member, snapshot in snapshots.items()}
+
+def clear_cache(member=None):
+	"""Forget memoized snapshots, for one member or all of them"""
+	cache = getattr(frappe.local, "library_eligibility", None)
+	if cache is None:
+		return
+	if member:
+		cache.pop(member, None)
+	else:
+		cache.clear()
@@ -0,0 +1,126 @@
+import csv
+import os
+
+import frappe
+from frappe.utils import cint, flt, now_datetime
+
+# Rows pulled from the server-side cursor per write
+EXPORT_CHUNK_SIZE = 5000
+
+EXPORT_FORMATS = ("csv", "parquet")
+
+class ActiveLoansSummary:
+	"""Running statistics of the active loans report"""
+	def __init__(self):
+		self.total = 0
+		self.overdue = 0
+		self.due_soon = 0
+
+	def add(self, row):
+		self.total += 1
+		if row["status"] == "Overdue":
+			self.overdue += 1
+		elif row["status"] == "Due Soon":
+			self.due_soon += 1
+
+	def result(self):
+		return {
+			"total_active_loans": self.total,
+			"overdue_loans": self.overdue,
+			"due_soon_loans": self.due_soon,
+			"active_loans": self.total - self.overdue - self.due_soon
+		}
+
+class OverdueBooksSummary:
+	"""Running statistics of the overdue books report"""
+	def __init__(self):
+		self.total = 0
+		self.fines = 0.0
+
+	def add(self, row):
+		self.total += 1
+		self.fines += flt(row["estimated_fine"])
+
+	def result(self):
+		return {
+			"total_overdue": self.total,
+			"total_estimated_fines": self.fines
+		}
+
+def iter_query(query, values=None):
+	"""Yield rows from a server-side (unbuffered) cursor"""
+	with frappe.db.unbuffered_cursor():
+		yield from frappe.db.sql(query, values, as_dict=True, as_iterator=True)
+
+def write_csv(rows, fileobj, columns, summary):
+	"""Write rows as CSV while feeding the summary, one row at a time"""
+	writer = csv.writer(fileobj)
+	writer.writerow([column for column, _ in columns])
+
+	count = 0
+	for row in rows:
+		summary.add(row)
+		writer.writerow([row[column] for column, _ in columns])
+		count += 1
+	return count
+
+def write_parquet(rows, path, columns, summary, chunk_size=EXPORT_CHUNK_SIZE):
+	"""Write rows as Parquet in row groups of chunk_size while feeding the summary"""
+	try:
+		import pyarrow as pa
+		import pyarrow.parquet as pq
+	except ImportError:
+		frappe.throw("Parquet export requires the pyarrow package")
+
+	arrow_types = {"string": pa.string(), "date": pa.date32(), "int": pa.int64(), "float": pa.float64()}
+	converters = {"string": lambda v: None if v is None else str(v), "date": lambda v: v,
+		"int": lambda v: None if v is None else cint(v), "float": lambda v: None if v is None else flt(v)}
+	schema = pa.schema([(column, arrow_types[kind]) for column, kind in columns])
+
+	count = 0
+	with pq.ParquetWriter(path, schema) as writer:
+		batch = {column: [] for column, _ in columns}
+		for row in rows:
+			summary.add(row)
+			for column, kind in columns:
+				batch[column].append(converters[kind](row[column]))
+			count += 1
+
+			if count % chunk_size == 0:
+				writer.write_table(pa.Table.from_pydict(batch, schema=schema))
+				batch = {column: [] for column, _ in columns}
+
+		if batch[columns[0][0]]:
+			writer.write_table(pa.Table.from_pydict(batch, schema=schema))
+	return count
+
+def export_report(report_name, query, values, columns, summary, file_format="csv"):
+	"""Stream a report query to a private file and return its URL and summary"""
+	if file_format not in EXPORT_FORMATS:
+		frappe.throw(f"Export format must be one of {', '.join(EXPORT_FORMATS)}")
+
+	file_name = f"{report_name}-{now_datetime().strftime('%Y%m%d-%H%M%S')}-{frappe.generate_hash(length=6)}.{file_format}"
+	path = frappe.get_site_path("private", "files", file_name)
+	rows = iter_query(query, values)
+
+	if file_format == "csv":
+		with open(path, "w", newline="", encoding="utf-8") as f:
+			count = write_csv(rows, f, columns, summary)
+	else:
+		count = write_parquet(rows, path, columns, summary)
+
+	file_doc = frappe.get_doc({
+		"doctype": "File",
+		"file_name": file_name,
+		"file_url": f"/private/files/{file_name}",
+		"is_private": 1,
+		"file_size": os.path.getsize(path)
+	})
+	file_doc.insert(ignore_permissions=True)
+
+	return {
+		"file_url": file_doc.file_url,
+		"format": file_format,
+		"rows": count,
+		"statistics": summary.result()
+	}
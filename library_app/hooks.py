@@ -57,7 +57,26 @@ app_license = "MIT"
 # ------------
 
 # before_install = "library_app.install.before_install"
-# after_install = "library_app.install.after_install"
+after_install = "library_app.install.after_install"
+
+# Migration
+# ---------
+
+after_migrate = [
+	"library_app.indexes.ensure_indexes",
+	"library_app.membership.ensure_sequences"
+]
+
+# Requests
+# --------
+
+before_request = ["library_app.instrumentation.before_request"]
+
+# The cache may turn a response into a 304, so it runs before the payload is measured
+after_request = [
+	"library_app.response_cache.after_request",
+	"library_app.instrumentation.after_request"
+]
 
 # Uninstallation
 # ---------------
@@ -107,8 +126,16 @@ app_license = "MIT"
 # ---------------
 
 scheduler_events = {
+	# Fallback for notifications whose drain job was lost or is due for a retry
+	"all": [
+		"library_app.outbox.drain_outbox"
+	],
 	"daily": [
-		"library_app.tasks.send_overdue_notifications"
+		# Creates next year's membership sequence ahead of New Year
+		"library_app.membership.ensure_sequences",
+		"library_app.overdue.sweep_overdue_loans",
+		"library_app.tasks.send_overdue_notifications",
+		"library_app.statistics.reconcile_statistics"
 	]
 }
 
@@ -0,0 +1,175 @@
+import frappe
+
+# Composite indexes backing the hot filters of library_app.api, per doctype
+COMPOSITE_INDEXES = {
+	"Loan": {
+		"book_returned_index": ["book", "returned"],
+		"member_returned_index": ["member", "returned"],
+		"returned_return_date_index": ["returned", "return_date"],
+		"overdue_return_date_index": ["is_overdue", "return_date"],
+		"overdue_member_index": ["is_overdue", "member"]
+	},
+	"Reservation": {
+		"book_status_reserve_date_index": ["book", "status", "reserve_date"],
+		"book_status_queue_sequence_index": ["book", "status", "queue_sequence"],
+		"status_expiry_date_index": ["status", "expiry_date"]
+	},
+	"Book Copy": {
+		"book_status_index": ["book", "status"]
+	},
+	"Notification Outbox": {
+		"status_next_attempt_index": ["status", "next_attempt_at"],
+		"status_locked_until_index": ["status", "locked_until"],
+		"email_queue_index": ["email_queue"]
+	},
+	"Book Popularity Daily": {
+		"day_book_index": ["day", "book"]
+	}
+}
+
+# Representative queries of the API endpoints, checked with EXPLAIN
+HOT_QUERIES = [
+	("active loan of a book", """
+		SELECT name FROM `tabLoan` WHERE book = %(book)s AND returned = 0 LIMIT 1
+	"""),
+	("active loans of a member", """
+		SELECT name FROM `tabLoan` WHERE member = %(member)s AND returned = 0
+	"""),
+	("active loans by due date", """
+		SELECT name FROM `tabLoan` WHERE returned = 0 ORDER BY return_date ASC
+	"""),
+	("overdue loans", """
+		SELECT name FROM `tabLoan` WHERE is_overdue = 1 ORDER BY return_date ASC
+	"""),
+	("members with overdue loans", """
+		SELECT DISTINCT member FROM `tabLoan` WHERE is_overdue = 1 AND member > %(member)s ORDER BY member
+	"""),
+	("loans falling overdue since the last sweep", """
+		SELECT name FROM `tabLoan`
+		WHERE returned = 0 AND return_date <= CURDATE() - INTERVAL 1 DAY
+		  AND return_date > CURDATE() - INTERVAL 2 DAY
+	"""),
+	("free copy of a book", """
+		SELECT name FROM `tabBook Copy` WHERE book = %(book)s AND status = 'Available' LIMIT 1
+	"""),
+	("queue position of a reservation", """
+		SELECT COUNT(*) FROM `tabReservation`
+		WHERE book = %(book)s AND status = 'Pending' AND queue_sequence < 10
+	"""),
+	("due notifications", """
+		SELECT name FROM `tabNotification Outbox`
+		WHERE (status = 'Queued' AND next_attempt_at <= NOW())
+		   OR (status = 'Sending' AND locked_until <= NOW())
+		ORDER BY next_attempt_at LIMIT 100
+	"""),
+	("undelivered notifications", """
+		SELECT o.name FROM `tabEmail Queue` eq
+		JOIN `tabNotification Outbox` o ON o.email_queue = eq.name
+		WHERE eq.status = 'Error' AND o.status = 'Sent'
+	"""),
+	("expired ready reservations", """
+		SELECT name FROM `tabReservation` WHERE status = 'Ready' AND expiry_date < CURDATE()
+	""")
+]
+
+def ensure_indexes():
+	"""Create any missing composite index, then verify all of them exist"""
+	for doctype, indexes in COMPOSITE_INDEXES.items():
+		for index_name, fields in indexes.items():
+			frappe.db.add_index(doctype, fields, index_name=index_name)
+
+	missing = get_missing_indexes()
+	if missing:
+		frappe.throw(f"Could not create indexes: {', '.join(missing)}")
+
+def get_missing_indexes():
+	"""List composite indexes that do not exist in the database"""
+	missing = []
+	for doctype, indexes in COMPOSITE_INDEXES.items():
+		for index_name in indexes:
+			if not frappe.db.has_index(f"tab{doctype}", index_name):
+				missing.append(f"{doctype}.{index_name}")
+	return missing
+
+# A full scan reading fewer rows than this is a small table, not a missing index
+FULL_SCAN_MIN_ROWS = 1000
+
+# Statements EXPLAIN accepts
+EXPLAINABLE = ("select", "with", "update", "delete")
+
+def find_full_scans(description, query, values=None):
+	"""EXPLAIN a query and list the steps reading a whole large table
+
+	Derived tables and unions (shown as <derived2> and the like) are
+	results the query built itself, so scanning them is expected.
+	"""
+	full_scans = []
+	for step in frappe.db.sql(f"EXPLAIN {query}", values, as_dict=True):
+		table = step.get("table") or ""
+		if step.get("type") == "ALL" and not table.startswith("<") and (step.get("rows") or 0) >= FULL_SCAN_MIN_ROWS:
+			full_scans.append({"query": description, "table": table, "rows": step.get("rows")})
+	return full_scans
+
+def capture_endpoint_queries(seed=42):
+	"""Call every benchmark scenario of library_app.api once and collect its statements
+
+	The response cache is bypassed so the queries actually run, and
+	writing calls are rolled back. Returns (endpoint, query, values) for
+	every distinct explainable statement, first caller first.
+	"""
+	from library_app.benchmark.scenarios import SCENARIOS, Pool
+	from library_app.query_budget import QueryCounter
+
+	pool = Pool(seed)
+	statements = {}
+	frappe.flags.library_bypass_response_cache = True
+	try:
+		for method, scenario in SCENARIOS.items():
+			fn = frappe.get_attr(f"library_app.api.{method}")
+			kwargs = scenario.args(pool)
+			with QueryCounter() as counter:
+				try:
+					result = fn(**kwargs)
+				except Exception:
+					result = None
+			if scenario.writes:
+				frappe.db.rollback()
+			if scenario.cleanup:
+				scenario.cleanup(kwargs, result)
+			frappe.clear_messages()
+
+			for query in counter.queries:
+				if query.fingerprint.lstrip("( ").startswith(EXPLAINABLE) and query.fingerprint not in statements:
+					statements[query.fingerprint] = (method, query.query, query.values)
+	finally:
+		frappe.flags.library_bypass_response_cache = False
+	return list(statements.values())
+
+def get_full_scans():
+	"""EXPLAIN the hot queries and every statement the API endpoints run
+
+	Scheduled jobs are covered by HOT_QUERIES; the endpoints are called
+	through the benchmark scenarios, so their real SQL is checked. Needs
+	the benchmark data (generate-benchmark-data), since the optimizer may
+	legitimately prefer a full scan on a nearly empty table.
+	"""
+	params = {"book": "", "member": ""}
+	full_scans = []
+	for description, query in HOT_QUERIES:
+		full_scans += find_full_scans(description, query, params)
+
+	statements = capture_endpoint_queries()
+	for method, query, values in statements:
+		try:
+			full_scans += find_full_scans(f"{method}: {' '.join(query.split())[:120]}", query, values)
+		except Exception as e:
+			print(f"Could not EXPLAIN a statement of {method}: {e}")
+	return full_scans, len(HOT_QUERIES) + len(statements)
+
+def check_query_plans():
+	"""Fail if a hot query or an API endpoint statement falls back to a full table scan"""
+	full_scans, checked = get_full_scans()
+	if full_scans:
+		details = "\n".join(f"{scan['query']} ({scan['table']}, ~{scan['rows']} rows)" for scan in full_scans)
+		frappe.throw(f"Full table scans:\n{details}")
+	print(f"All {checked} hot queries and endpoint statements use an index")
@@ -0,0 +1,7 @@
+from library_app.indexes import ensure_indexes
+from library_app.membership import ensure_sequences
+
+def after_install():
+	"""Prepare the database once the app is installed"""
+	ensure_indexes()
+	ensure_sequences()
@@ -0,0 +1,211 @@
+import cProfile
+import os
+import random
+import re
+import time
+
+import frappe
+from frappe.utils import now_datetime
+
+API_PATH_PREFIX = "/api/method/library_app.api."
+
+METRICS_KEY_PREFIX = "library_app:metrics"
+REQUESTS_METRIC = "library_api_requests_total"
+
+# Site config keys of the opt-in profiler
+PROFILE_THRESHOLD_KEY = "library_profile_threshold_ms"
+PROFILE_SAMPLE_RATE_KEY = "library_profile_sample_rate"
+
+# Profiles kept on disk, newest first
+MAX_PROFILES = 100
+
+def log_buckets(low, high):
+	"""Bucket bounds from low to high with six steps per decade
+
+	Like an HDR histogram, bucket width grows with the value, so every
+	bucket has about the same relative precision.
+	"""
+	bounds = []
+	decade = low
+	while decade <= high:
+		for step in (1, 1.5, 2, 3, 5, 7):
+			bound = round(decade * step, 6)
+			if bound <= high:
+				bounds.append(bound)
+		decade *= 10
+	return bounds
+
+# name -> (help, bucket bounds, how the value is read from a finished request)
+HISTOGRAMS = {
+	"library_api_request_duration_seconds": (
+		"Wall time of library_app.api calls",
+		log_buckets(0.001, 60),
+		lambda state, response: state.duration
+	),
+	"library_api_db_queries": (
+		"Database queries run per call",
+		log_buckets(1, 10000),
+		lambda state, response: state.queries
+	),
+	"library_api_db_duration_seconds": (
+		"Time spent in database queries per call",
+		log_buckets(0.0001, 60),
+		lambda state, response: state.query_time
+	),
+	"library_api_db_rows": (
+		"Rows returned by database queries per call",
+		log_buckets(1, 1000000),
+		lambda state, response: state.rows
+	),
+	"library_api_response_bytes": (
+		"Size of the response payload",
+		log_buckets(100, 100000000),
+		lambda state, response: response.calculate_content_length() or 0
+	)
+}
+
+def get_metric_key(metric):
+	return frappe.cache().make_key(f"{METRICS_KEY_PREFIX}:{metric}")
+
+def format_bound(bound):
+	return f"{bound:g}"
+
+def before_request():
+	"""Start timing a library_app.api call and counting its queries"""
+	path = frappe.local.request.path
+	if not path.startswith(API_PATH_PREFIX):
+		return
+
+	method = path[len(API_PATH_PREFIX):].rstrip("/")
+	# Only existing API methods become labels, so stray URLs cannot add series
+	if not re.match(r"^[a-z_]+\.[a-z_]+$", method):
+		return
+	try:
+		frappe.get_attr(f"library_app.api.{method}")
+	except Exception:
+		return
+
+	state = frappe._dict(method=method, start=time.perf_counter(), queries=0, query_time=0.0, rows=0)
+	frappe.local.library_request_metrics = state
+
+	# Wrap this request's connection, as frappe.recorder does
+	state.sql = sql = frappe.db.sql
+	def timed_sql(*args, **kwargs):
+		start = time.perf_counter()
+		try:
+			result = sql(*args, **kwargs)
+		finally:
+			state.queries += 1
+			state.query_time += time.perf_counter() - start
+		if isinstance(result, (list, tuple)):
+			state.rows += len(result)
+		return result
+	frappe.db.sql = timed_sql
+
+	if should_profile():
+		state.profiler = cProfile.Profile()
+		state.profiler.enable()
+
+def after_request(response, request):
+	"""Record the metrics of a finished call and dump its profile if slow"""
+	state = getattr(frappe.local, "library_request_metrics", None)
+	frappe.local.library_request_metrics = None
+	if not state:
+		return
+
+	state.duration = time.perf_counter() - state.start
+	if frappe.db:
+		frappe.db.sql = state.sql
+
+	if state.profiler:
+		state.profiler.disable()
+		if state.duration * 1000 >= float(frappe.conf.get(PROFILE_THRESHOLD_KEY)):
+			dump_profile(state)
+
+	try:
+		record(state, response)
+	except Exception:
+		# Metrics must never fail the request they describe
+		pass
+
+def should_profile():
+	"""Profile a sample of calls once a slow-call threshold is configured"""
+	if not frappe.conf.get(PROFILE_THRESHOLD_KEY):
+		return False
+	return random.random() < float(frappe.conf.get(PROFILE_SAMPLE_RATE_KEY) or 0.1)
+
+def get_profile_dir():
+	path = frappe.get_site_path("private", "profiles")
+	os.makedirs(path, exist_ok=True)
+	return path
+
+def dump_profile(state):
+	"""Write a cProfile dump of a slow call, keeping the newest MAX_PROFILES"""
+	path = get_profile_dir()
+	filename = f"{now_datetime():%Y%m%d-%H%M%S}-{state.method}-{round(state.duration * 1000)}ms.prof"
+	state.profiler.dump_stats(os.path.join(path, filename))
+
+	profiles = sorted(os.listdir(path), reverse=True)
+	for old in profiles[MAX_PROFILES:]:
+		os.remove(os.path.join(path, old))
+
+def record(state, response):
+	"""Add a finished call to the histograms in Redis with one round trip"""
+	pipe = frappe.cache().pipeline()
+	for metric, (_, bounds, read) in HISTOGRAMS.items():
+		value = read(state, response)
+		bucket = next((format_bound(bound) for bound in bounds if value <= bound), "+Inf")
+		key = get_metric_key(metric)
+		pipe.hincrby(key, f"{state.method}|{bucket}", 1)
+		pipe.hincrbyfloat(key, f"{state.method}|sum", value)
+	pipe.hincrby(get_metric_key(REQUESTS_METRIC), f"{state.method}|{response.status_code}", 1)
+	pipe.execute()
+
+def read_metrics():
+	"""Read the raw counters of every metric in one round trip"""
+	names = [*HISTOGRAMS, REQUESTS_METRIC]
+	pipe = frappe.cache().pipeline()
+	for metric in names:
+		pipe.hgetall(get_metric_key(metric))
+
+	metrics = {}
+	for metric, fields in zip(names, pipe.execute()):
+		metrics[metric] = {field.decode(): float(value) for field, value in fields.items()}
+	return metrics
+
+def render_metrics():
+	"""Render every metric in the Prometheus text exposition format"""
+	metrics = read_metrics()
+	lines = []
+
+	for metric, (help_text, bounds, _) in HISTOGRAMS.items():
+		lines.append(f"# HELP {metric} {help_text}")
+		lines.append(f"# TYPE {metric} histogram")
+
+		by_method = {}
+		for field, value in metrics[metric].items():
+			method, _, bucket = field.rpartition("|")
+			by_method.setdefault(method, {})[bucket] = value
+
+		for method, values in sorted(by_method.items()):
+			cumulative = 0
+			for bucket in [format_bound(bound) for bound in bounds] + ["+Inf"]:
+				cumulative += values.get(bucket, 0)
+				lines.append(f'{metric}_bucket{{method="{method}",le="{bucket}"}} {int(cumulative)}')
+			lines.append(f'{metric}_sum{{method="{method}"}} {values.get("sum", 0)}')
+			lines.append(f'{metric}_count{{method="{method}"}} {int(cumulative)}')
+
+	lines.append(f"# HELP {REQUESTS_METRIC} Calls of library_app.api by HTTP status")
+	lines.append(f"# TYPE {REQUESTS_METRIC} counter")
+	for field, value in sorted(metrics[REQUESTS_METRIC].items()):
+		method, _, status = field.rpartition("|")
+		lines.append(f'{REQUESTS_METRIC}{{method="{method}",status="{status}"}} {int(value)}')
+
+	return "\n".join(lines) + "\n"
+
+def reset_metrics():
+	"""Drop every recorded metric"""
+	pipe = frappe.cache().pipeline()
+	for metric in [*HISTOGRAMS, REQUESTS_METRIC]:
+		pipe.delete(get_metric_key(metric))
+	pipe.execute()
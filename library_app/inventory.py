@@ -0,0 +1,186 @@
+import frappe
+from frappe.utils import cint, now
+from library_app import response_cache, statistics
+from library_app.locking import LOCK_WAIT_TIMEOUT
+
+def generate_barcode():
+	"""Make up a barcode for a copy registered without one"""
+	return frappe.generate_hash(length=10).upper()
+
+def claim_copy(book, copy=None):
+	"""Pick and lock a free copy of a book for the current transaction
+
+	Without an explicit copy the first free one is taken with SKIP LOCKED,
+	so concurrent checkouts of the same title grab different copies instead
+	of queueing on each other. Returns None when no copy is free.
+	"""
+	if copy:
+		rows = frappe.db.sql(f"""
+			SELECT name FROM `tabBook Copy`
+			WHERE name = %(copy)s AND book = %(book)s AND status = 'Available'
+			FOR UPDATE WAIT {cint(LOCK_WAIT_TIMEOUT)}
+		""", {"book": book, "copy": copy})
+	else:
+		rows = frappe.db.sql("""
+			SELECT name FROM `tabBook Copy`
+			WHERE book = %(book)s AND status = 'Available'
+			LIMIT 1
+			FOR UPDATE SKIP LOCKED
+		""", {"book": book})
+	return rows[0][0] if rows else None
+
+def claim_free_copies(books):
+	"""Lock every free copy of many books at once, for batch checkouts"""
+	if not books:
+		return []
+	return frappe.db.sql("""
+		SELECT name, book FROM `tabBook Copy`
+		WHERE book IN %(books)s AND status = 'Available'
+		ORDER BY book, name
+		FOR UPDATE SKIP LOCKED
+	""", {"books": tuple(books)}, as_dict=True)
+
+def set_copy_status(copies, status):
+	"""Move copies between Available and On Loan without loading them"""
+	if not copies:
+		return
+	frappe.db.sql("""
+		UPDATE `tabBook Copy`
+		SET status = %(status)s, modified = %(now)s, modified_by = %(user)s
+		WHERE name IN %(copies)s
+	""", {"copies": tuple(copies), "status": status, "now": now(), "user": frappe.session.user})
+
+def adjust_counters(book, available_delta, total_delta=0):
+	"""Move the copy counters of a book and keep is_available in step
+
+	is_available flips only when the last free copy goes or the first one
+	comes back, and only then do the title-level statistics change.
+	"""
+	if not available_delta and not total_delta:
+		return
+	# is_available is assigned first so it reads the old counter whatever
+	# the server's assignment semantics
+	frappe.db.sql("""
+		UPDATE `tabBook`
+		SET is_available = available_copies + %(available)s > 0,
+		    available_copies = available_copies + %(available)s,
+		    total_copies = total_copies + %(total)s,
+		    modified = %(now)s,
+		    modified_by = %(user)s
+		WHERE name = %(book)s
+	""", {"book": book, "available": available_delta, "total": total_delta, "now": now(), "user": frappe.session.user})
+	response_cache.invalidate(("Book", book))
+
+	available = frappe.db.get_value("Book", book, "available_copies")
+	before = available - available_delta
+	if before > 0 and available <= 0:
+		statistics.update_statistics({"available_books": -1, "books_on_loan": 1})
+	elif before <= 0 and available > 0:
+		statistics.update_statistics({"available_books": 1, "books_on_loan": -1})
+
+def checkout_copy(book, copy):
+	"""Mark a claimed copy as lent out"""
+	set_copy_status([copy], "On Loan")
+	adjust_counters(book, -1)
+
+def release_copy(book, copy):
+	"""Put a returned copy back on the shelf"""
+	set_copy_status([copy], "Available")
+	adjust_counters(book, 1)
+
+def insert_copies(book, count=1, location=None):
+	"""Insert available copies of a book, leaving its counters alone"""
+	return insert_many_copies([(book, count, location)])
+
+def insert_many_copies(books):
+	"""Insert available copies for many (book, count, location) in one query"""
+	timestamp = now()
+	names = []
+	values = []
+	for book, count, location in books:
+		for _ in range(max(cint(count), 0)):
+			name = frappe.generate_hash(length=10)
+			names.append(name)
+			values.append((name, book, generate_barcode(), "Available", location,
+				timestamp, timestamp, frappe.session.user, frappe.session.user))
+
+	if values:
+		frappe.db.bulk_insert("Book Copy",
+			fields=["name", "book", "barcode", "status", "location", "creation", "modified", "owner", "modified_by"],
+			values=values
+		)
+	return names
+
+def add_copies(book, count=1, location=None):
+	"""Register new available copies of an existing book and return their names"""
+	names = insert_copies(book, count, location)
+	adjust_counters(book, len(names), len(names))
+	return names
+
+def count_copies(book):
+	"""Count all and free copies of a book straight from the copy table"""
+	total, available = frappe.db.sql("""
+		SELECT COUNT(*), COALESCE(SUM(status = 'Available'), 0)
+		FROM `tabBook Copy`
+		WHERE book = %(book)s
+	""", {"book": book})[0]
+	return cint(total), cint(available)
+
+def sync_book(book):
+	"""Bring the counters of a book in line with its copies
+
+	Used after copies are edited by hand. Returns how many copies became
+	free, so the caller can release that many reservations.
+	"""
+	total, available = count_copies(book)
+	stored = frappe.db.get_value("Book", book, ["total_copies", "available_copies"], as_dict=True, for_update=True)
+	if not stored:
+		return 0
+
+	available_delta = available - cint(stored.available_copies)
+	adjust_counters(book, available_delta, total - cint(stored.total_copies))
+	return max(available_delta, 0)
+
+def remove_book(book):
+	"""Drop the copies of a deleted book"""
+	frappe.db.delete("Book Copy", {"book": book})
+
+def create_initial_copies():
+	"""Give every book without copies a single copy
+
+	The copy is On Loan when the book has an active loan, and that loan is
+	pointed at it. Counters are recomputed from the copy table afterwards.
+	"""
+	books = frappe.db.sql("""
+		SELECT b.name, l.name as loan
+		FROM `tabBook` b
+		LEFT JOIN `tabLoan` l ON l.book = b.name AND l.returned = 0
+		WHERE NOT EXISTS (SELECT 1 FROM `tabBook Copy` c WHERE c.book = b.name)
+	""", as_dict=True)
+
+	timestamp = now()
+	copies = []
+	for book in books:
+		name = frappe.generate_hash(length=10)
+		copies.append((name, book.name, generate_barcode(), "On Loan" if book.loan else "Available", None,
+			timestamp, timestamp, "Administrator", "Administrator"))
+		if book.loan:
+			frappe.db.set_value("Loan", book.loan, "book_copy", name, update_modified=False)
+
+	if copies:
+		frappe.db.bulk_insert("Book Copy",
+			fields=["name", "book", "barcode", "status", "location", "creation", "modified", "owner", "modified_by"],
+			values=copies
+		)
+
+	frappe.db.sql("""
+		UPDATE `tabBook` b
+		LEFT JOIN (
+			SELECT book, COUNT(*) as total, SUM(status = 'Available') as available
+			FROM `tabBook Copy`
+			GROUP BY book
+		) c ON c.book = b.name
+		SET b.total_copies = IFNULL(c.total, 0),
+		    b.available_copies = IFNULL(c.available, 0),
+		    b.is_available = IFNULL(c.available, 0) > 0
+	""")
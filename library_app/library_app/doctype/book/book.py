@@ -3,6 +3,8 @@
 
 import frappe
 from frappe.model.document import Document
+from frappe.utils import cint
+from library_app import inventory, popularity, reservation_queue, response_cache, search, statistics
 
 class Book(Document):
 	def validate(self):
@@ -10,6 +12,13 @@ class Book(Document):
 		if self.isbn and len(self.isbn) not in [10, 13]:
 			frappe.throw("ISBN must be either 10 or 13 characters long")
 	
+	def before_insert(self):
+		"""Actions before creating the book"""
+		# One copy unless the caller registers a different number
+		copies = self.flags.initial_copies
+		self.total_copies = self.available_copies = cint(copies) if copies is not None else 1
+		self.is_available = 1 if self.available_copies else 0
+	
 	def before_save(self):
 		"""Actions before saving the book"""
 		if self.title:
@@ -19,63 +28,36 @@ class Book(Document):
 	
 	def on_update(self):
 		"""Actions after updating the book"""
-		# Update loan status if book availability changes
-		if self.has_value_changed('is_available'):
-			self.update_loan_status()
+		statistics.track_changes(self)
+		response_cache.invalidate_doc(self)
+		
+		# Keep the search index in sync with the indexed fields
+		if search.has_indexed_changes(self):
+			search.index_book(self)
 	
-	def update_loan_status(self):
-		"""Update loan status based on book availability"""
-		if not self.is_available:
-			# Check if there's an active loan
-			active_loan = frappe.get_all("Loan", 
-				filters={
-					"book": self.name,
-					"returned": 0
-				},
-				limit=1
-			)
-			if not active_loan:
-				# If no active loan but book is marked unavailable, 
-				# it might be reserved or damaged
-				pass
-		else:
-			# Book is available, check for reservations
-			self.process_reservations()
+	def after_insert(self):
+		"""Actions after creating the book"""
+		# The counters were set in before_insert
+		inventory.insert_copies(self.name, self.total_copies, self.flags.copy_location)
 	
-	def process_reservations(self):
-		"""Process pending reservations when book becomes available"""
-		reservations = frappe.get_all("Reservation",
-			filters={
-				"book": self.name,
-				"status": "Pending"
-			},
-			order_by="reserve_date asc",
-			limit=1
-		)
-		
-		if reservations:
-			# Notify the first person in queue
-			reservation = frappe.get_doc("Reservation", reservations[0].name)
-			reservation.status = "Ready"
-			reservation.save()
-			
-			# Send notification email
-			self.send_reservation_ready_email(reservation)
+	def on_trash(self):
+		"""Actions before deleting the book"""
+		statistics.track_removal(self)
+		response_cache.invalidate_doc(self)
+		search.remove_book(self.name)
+		popularity.remove_book(self.name)
+		inventory.remove_book(self.name)
+	
+	def after_rename(self, old_name, new_name, merge=False):
+		"""Actions after renaming the book"""
+		search.rename_book(old_name, new_name)
+		popularity.rename_book(old_name, new_name)
+		response_cache.invalidate(("Book", old_name), ("Book", new_name))
 	
-	def send_reservation_ready_email(self, reservation):
-		"""Send email notification when reserved book is ready"""
-		member = frappe.get_doc("Member", reservation.member)
+	def process_reservations(self):
+		"""Hand free copies to the members first in the queue
 		
-		frappe.sendmail(
-			recipients=[member.email],
-			subject=f"Reserved Book Ready: {self.title}",
-			message=f"""
-			Dear {member.name},
-			
-			Your reserved book "{self.title}" by {self.author} is now available for pickup.
-			Please visit the library within 3 days to collect your book.
-			
-			Best regards,
-			Library Management System
-			"""
-		)
+		Members already notified keep their copy, so only free copies beyond
+		the ready reservations release the next pending ones.
+		"""
+		reservation_queue.promote_pending({self.name})
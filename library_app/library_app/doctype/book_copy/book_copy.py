@@ -0,0 +1,42 @@
+# Copyright (c) 2025, Library Admin and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from library_app import inventory, response_cache
+
+class BookCopy(Document):
+	"""One physical item of a Book, tracked by barcode"""
+	def before_insert(self):
+		"""Actions before registering the copy"""
+		if not self.barcode:
+			self.barcode = inventory.generate_barcode()
+	
+	def validate(self):
+		"""Validate copy data before saving"""
+		previous = self.get_doc_before_save()
+		previous_status = previous.status if previous else None
+		
+		# Loans claim and release copies themselves, keeping the counters exact
+		if self.status != previous_status and "On Loan" in (self.status, previous_status):
+			frappe.throw("Copies are put on and taken off loan by checkout and return only")
+		
+		if previous and previous.book != self.book:
+			frappe.throw("A copy cannot be moved to another book")
+	
+	def on_update(self):
+		"""Actions after updating the copy"""
+		response_cache.invalidate_doc(self)
+		freed = inventory.sync_book(self.book)
+		if freed:
+			frappe.get_doc("Book", self.book).process_reservations()
+	
+	def on_trash(self):
+		"""Actions before deleting the copy"""
+		if self.status == "On Loan":
+			frappe.throw("Cannot delete a copy that is on loan")
+	
+	def after_delete(self):
+		"""Actions after deleting the copy"""
+		response_cache.invalidate_doc(self)
+		inventory.sync_book(self.book)
@@ -0,0 +1,8 @@
+# Copyright (c) 2025, Library Admin and contributors
+# For license information, please see license.txt
+
+from frappe.model.document import Document
+
+class BookPopularity(Document):
+	"""Lifetime loan and queue counters of one book, named after the book"""
+	pass
@@ -0,0 +1,8 @@
+# Copyright (c) 2025, Library Admin and contributors
+# For license information, please see license.txt
+
+from frappe.model.document import Document
+
+class BookPopularityDaily(Document):
+	"""Loans and reservations of one book on one day, named book|day"""
+	pass
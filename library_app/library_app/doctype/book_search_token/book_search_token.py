@@ -0,0 +1,8 @@
+# Copyright (c) 2025, Library Admin and contributors
+# For license information, please see license.txt
+
+from frappe.model.document import Document
+
+class BookSearchToken(Document):
+	"""One row per (book, token) pair of the book search index"""
+	pass
@@ -0,0 +1,10 @@
+# Copyright (c) 2025, Library Admin and contributors
+# For license information, please see license.txt
+
+from frappe.model.document import Document
+from library_app import settings
+
+class LibrarySettings(Document):
+	def on_update(self):
+		"""Actions after updating the settings"""
+		settings.clear_settings_cache()
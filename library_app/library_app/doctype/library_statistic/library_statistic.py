@@ -0,0 +1,8 @@
+# Copyright (c) 2025, Library Admin and contributors
+# For license information, please see license.txt
+
+from frappe.model.document import Document
+
+class LibraryStatistic(Document):
+	"""A single dashboard counter, keyed by statistic name"""
+	pass
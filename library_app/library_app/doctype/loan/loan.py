@@ -3,6 +3,9 @@
 
 import frappe
 from frappe.model.document import Document
+from frappe.utils import getdate
+from library_app import eligibility, inventory, member_profile, overdue, popularity, response_cache, statistics
+from library_app.settings import get_settings
 from datetime import date, timedelta
 
 class Loan(Document):
@@ -13,30 +16,26 @@ class Loan(Document):
 		self.validate_dates()
 	
 	def validate_book_availability(self):
-		"""Check if book is available for loan"""
-		if not self.returned:
-			# Check if book is already on loan
-			existing_loan = frappe.get_all("Loan",
-				filters={
-					"book": self.book,
-					"returned": 0,
-					"name": ["!=", self.name]
-				},
-				limit=1
-			)
+		"""Claim a free copy of the book for a new loan"""
+		# Only checkouts claim a copy; saving an existing loan (extension,
+		# return) must not trip over the copy it already holds
+		if self.is_new() and not self.returned:
+			if not frappe.db.exists("Book", self.book):
+				frappe.throw(f"Book '{self.book}' not found")
 			
-			if existing_loan:
-				frappe.throw(f"Book '{self.book}' is already on loan")
-			
-			# Check book availability status
-			book = frappe.get_doc("Book", self.book)
-			if not book.is_available:
+			# The claimed copy stays locked until the loan is committed, and
+			# concurrent checkouts skip it rather than wait for it
+			copy = inventory.claim_copy(self.book, self.book_copy)
+			if not copy:
+				if self.book_copy:
+					frappe.throw(f"Copy '{self.book_copy}' of book '{self.book}' is not available for loan")
 				frappe.throw(f"Book '{self.book}' is not available for loan")
+			
+			self.book_copy = copy
 	
 	def validate_member_eligibility(self):
 		"""Check if member is eligible to borrow"""
-		member = frappe.get_doc("Member", self.member)
-		can_borrow, message = member.can_borrow_book()
+		can_borrow, message = eligibility.check_eligibility(self.member)
 		
 		if not can_borrow and not self.returned:
 			frappe.throw(message)
@@ -55,56 +54,67 @@ class Loan(Document):
 		"""Actions before saving the loan"""
 		if not self.return_date and self.loan_date:
 			# Set default return date (14 days from loan date)
-			loan_period = frappe.db.get_single_value("Library Settings", "default_loan_period") or 14
-			self.return_date = self.loan_date + timedelta(days=loan_period)
+			self.return_date = getdate(self.loan_date) + timedelta(days=get_settings().default_loan_period)
 		
 		# Calculate fine if returned late
 		if self.returned and self.actual_return_date and self.return_date:
 			if self.actual_return_date > self.return_date:
 				self.calculate_fine()
+		
+		# Returns and extensions settle the overdue state right away; the
+		# daily sweep only handles loans falling overdue with time
+		self.is_overdue, self.overdue_bucket = overdue.get_overdue_state(self.return_date, self.returned)
 	
 	def after_insert(self):
 		"""Actions after creating new loan"""
-		# Mark book as unavailable
-		book = frappe.get_doc("Book", self.book)
-		book.is_available = 0
-		book.save()
+		# Lend out the claimed copy
+		inventory.checkout_copy(self.book, self.book_copy)
 	
 	def on_update(self):
 		"""Actions after updating loan"""
+		statistics.track_changes(self)
+		popularity.track_loan(self)
+		member_profile.track_loan(self)
+		eligibility.clear_cache(self.member)
+		response_cache.invalidate_doc(self)
+		
 		if self.has_value_changed('returned') and self.returned:
 			self.process_return()
 	
+	def on_trash(self):
+		"""Actions before deleting loan"""
+		statistics.track_removal(self)
+		popularity.track_loan_removal(self)
+		member_profile.track_loan_removal(self)
+		eligibility.clear_cache(self.member)
+		response_cache.invalidate_doc(self)
+		
+		# Deleting an active loan puts its copy back on the shelf
+		if not self.returned and self.book_copy:
+			inventory.release_copy(self.book, self.book_copy)
+	
 	def process_return(self):
 		"""Process book return"""
 		# Set actual return date if not set
 		if not self.actual_return_date:
 			self.actual_return_date = date.today()
 		
-		# Mark book as available
-		book = frappe.get_doc("Book", self.book)
-		book.is_available = 1
-		book.save()
+		# Put the copy back on the shelf
+		if self.book_copy:
+			inventory.release_copy(self.book, self.book_copy)
 		
-		# Process any pending reservations
-		book.process_reservations()
+		# Process any pending reservations, once for the freed copy
+		frappe.get_doc("Book", self.book).process_reservations()
 	
 	def calculate_fine(self):
 		"""Calculate fine for overdue return"""
 		if self.actual_return_date and self.return_date:
 			overdue_days = (self.actual_return_date - self.return_date).days
 			if overdue_days > 0:
-				fine_per_day = frappe.db.get_single_value("Library Settings", "fine_per_day") or 1.0
-				self.fine_amount = overdue_days * fine_per_day
-	
-	def is_overdue(self):
-		"""Check if loan is overdue"""
-		if self.returned:
-			return False
-		return date.today() > self.return_date
+				self.fine_amount = overdue_days * get_settings().fine_per_day
 	
 	def days_overdue(self):
 		"""Get number of days overdue"""
-		if not self.is_overdue():
+		if not self.is_overdue:
 			return 0
-		return (date.today() - self.return_date).days
+		return (date.today() - getdate(self.return_date)).days
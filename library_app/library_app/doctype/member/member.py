@@ -3,6 +3,7 @@
 
 import frappe
 from frappe.model.document import Document
+from library_app import eligibility, response_cache, statistics
 import re
 
 class Member(Document):
@@ -30,9 +31,9 @@ class Member(Document):
 	def validate_membership_id(self):
 		"""Validate membership ID format"""
 		if self.membership_id:
-			# Check if membership ID follows pattern (e.g., LIB-2025-001)
-			if not re.match(r'^LIB-\d{4}-\d{3}$', self.membership_id):
-				frappe.throw("Membership ID must follow format: LIB-YYYY-XXX (e.g., LIB-2025-001)")
+			# Check if membership ID follows pattern (e.g., LIB-2025-001, LIB-2025-1234)
+			if not re.match(r'^LIB-\d{4}-\d{3,}$', self.membership_id):
+				frappe.throw("Membership ID must follow format: LIB-YYYY-XXX with three or more digits (e.g., LIB-2025-001)")
 	
 	def before_save(self):
 		"""Actions before saving the member"""
@@ -41,6 +42,18 @@ class Member(Document):
 		if self.email:
 			self.email = self.email.strip().lower()
 	
+	def on_update(self):
+		"""Actions after updating the member"""
+		statistics.track_changes(self)
+		eligibility.clear_cache(self.name)
+		response_cache.invalidate_doc(self)
+	
+	def on_trash(self):
+		"""Actions before deleting the member"""
+		statistics.track_removal(self)
+		eligibility.clear_cache(self.name)
+		response_cache.invalidate_doc(self)
+	
 	def get_active_loans(self):
 		"""Get all active loans for this member"""
 		return frappe.get_all("Loan",
@@ -53,30 +66,14 @@ class Member(Document):
 	
 	def get_overdue_loans(self):
 		"""Get all overdue loans for this member"""
-		from datetime import date
 		return frappe.get_all("Loan",
 			filters={
 				"member": self.name,
-				"returned": 0,
-				"return_date": ["<", date.today()]
+				"is_overdue": 1
 			},
 			fields=["name", "book", "loan_date", "return_date"]
 		)
 	
 	def can_borrow_book(self):
 		"""Check if member can borrow more books"""
-		active_loans = len(self.get_active_loans())
-		max_loans = frappe.db.get_single_value("Library Settings", "max_loans_per_member") or 5
-		
-		if active_loans >= max_loans:
-			return False, f"Maximum loan limit ({max_loans}) reached"
-		
-		if self.status != "Active":
-			return False, f"Member status is {self.status}"
-		
-		# Check for overdue books
-		overdue_loans = self.get_overdue_loans()
-		if overdue_loans:
-			return False, "Cannot borrow new books while having overdue items"
-		
-		return True, "Can borrow"
+		return eligibility.check_eligibility(self.name)
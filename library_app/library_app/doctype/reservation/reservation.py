@@ -3,9 +3,17 @@
 
 import frappe
 from frappe.model.document import Document
+from library_app import outbox, popularity, reservation_queue, response_cache, statistics
+from library_app.settings import get_settings
 from datetime import date, timedelta
 
 class Reservation(Document):
+	def before_insert(self):
+		"""Actions before creating reservation"""
+		# Takes the Book row lock, so the checks in validate cannot race
+		# with another reservation for the same book
+		self.queue_sequence = reservation_queue.next_sequence(self.book)
+	
 	def validate(self):
 		"""Validate reservation data before saving"""
 		self.validate_book_availability()
@@ -35,8 +43,8 @@ class Reservation(Document):
 	def before_save(self):
 		"""Actions before saving reservation"""
 		if self.status == "Ready" and not self.expiry_date:
-			# Set expiry date (3 days from ready date)
-			self.expiry_date = date.today() + timedelta(days=3)
+			# Set expiry date (hold period from ready date)
+			self.expiry_date = date.today() + timedelta(days=get_settings().reservation_hold_days)
 	
 	def after_insert(self):
 		"""Actions after creating reservation"""
@@ -45,82 +53,49 @@ class Reservation(Document):
 	
 	def on_update(self):
 		"""Actions after updating reservation"""
+		statistics.track_changes(self)
+		popularity.track_reservation(self)
+		response_cache.invalidate_doc(self)
+		
 		if self.has_value_changed('status'):
 			if self.status == "Ready":
 				self.send_ready_notification()
 			elif self.status == "Expired":
 				self.process_expiry()
 	
+	def on_trash(self):
+		"""Actions before deleting reservation"""
+		statistics.track_removal(self)
+		popularity.track_reservation_removal(self)
+		response_cache.invalidate_doc(self)
+	
 	def send_reservation_confirmation(self):
-		"""Send reservation confirmation email"""
-		member = frappe.get_doc("Member", self.member)
-		book = frappe.get_doc("Book", self.book)
-		
-		# Get queue position
-		queue_position = self.get_queue_position()
-		
-		frappe.sendmail(
-			recipients=[member.email],
-			subject=f"Reservation Confirmed: {book.title}",
-			message=f"""
-			Dear {member.name1},
-			
-			Your reservation for "{book.title}" by {book.author} has been confirmed.
-			
-			Queue Position: {queue_position}
-			Reservation Date: {self.reserve_date}
-			
-			You will be notified when the book becomes available.
-			
-			Best regards,
-			Library Management System
-			"""
+		"""Queue the reservation confirmation email"""
+		outbox.enqueue_notification("Reservation Confirmed", self.member,
+			dedupe_key=f"reservation_confirmed:{self.name}",
+			reference_doctype=self.doctype,
+			reference_name=self.name,
+			book=self.book,
+			queue_position=self.get_queue_position(),
+			reserve_date=str(self.reserve_date)
 		)
 	
 	def send_ready_notification(self):
-		"""Send notification when book is ready"""
-		member = frappe.get_doc("Member", self.member)
-		book = frappe.get_doc("Book", self.book)
-		
-		frappe.sendmail(
-			recipients=[member.email],
-			subject=f"Book Ready for Pickup: {book.title}",
-			message=f"""
-			Dear {member.name1},
-			
-			Great news! Your reserved book "{book.title}" by {book.author} is now ready for pickup.
-			
-			Please collect your book by {self.expiry_date} or your reservation will expire.
-			
-			Best regards,
-			Library Management System
-			"""
+		"""Queue the notification that the book is ready"""
+		# Keyed by reservation, so however many paths announce it, one email goes out
+		outbox.enqueue_notification("Reservation Ready", self.member,
+			dedupe_key=f"reservation_ready:{self.name}",
+			reference_doctype=self.doctype,
+			reference_name=self.name,
+			book=self.book,
+			expiry_date=str(self.expiry_date)
 		)
 	
 	def get_queue_position(self):
 		"""Get position in reservation queue"""
-		earlier_reservations = frappe.get_all("Reservation",
-			filters={
-				"book": self.book,
-				"status": "Pending",
-				"reserve_date": ["<", self.reserve_date]
-			}
-		)
-		return len(earlier_reservations) + 1
+		return reservation_queue.get_queue_position(self.book, self.queue_sequence)
 	
 	def process_expiry(self):
 		"""Process expired reservation"""
-		# Move to next person in queue
-		next_reservation = frappe.get_all("Reservation",
-			filters={
-				"book": self.book,
-				"status": "Pending"
-			},
-			order_by="reserve_date asc",
-			limit=1
-		)
-		
-		if next_reservation:
-			next_res = frappe.get_doc("Reservation", next_reservation[0].name)
-			next_res.status = "Ready"
-			next_res.save()
+		# Hand the released copy to the next in queue, unless it is already held
+		reservation_queue.promote_pending({self.book})
@@ -0,0 +1,33 @@
+import functools
+import random
+import time
+
+import frappe
+
+# Seconds to wait for a row lock before giving up on an attempt
+LOCK_WAIT_TIMEOUT = 5
+
+LOCK_RETRY_ATTEMPTS = 3
+
+# Base delay in seconds, doubled on every retry and jittered by up to 100%
+LOCK_RETRY_BASE_DELAY = 0.05
+
+def retry_on_lock_timeout(fn):
+	"""Retry a transactional function when it loses a lock race
+
+	On a lock wait timeout or deadlock the transaction is rolled back and
+	the function is run again after an exponential, jittered backoff. The
+	last failure is re-raised once LOCK_RETRY_ATTEMPTS is exhausted.
+	"""
+	@functools.wraps(fn)
+	def wrapper(*args, **kwargs):
+		for attempt in range(1, LOCK_RETRY_ATTEMPTS + 1):
+			try:
+				return fn(*args, **kwargs)
+			except (frappe.QueryTimeoutError, frappe.QueryDeadlockError):
+				if attempt == LOCK_RETRY_ATTEMPTS:
+					raise
+				frappe.db.rollback()
+				delay = LOCK_RETRY_BASE_DELAY * (2 ** (attempt - 1))
+				time.sleep(delay * (1 + random.random()))
+	return wrapper
@@ -0,0 +1,123 @@
+from datetime import date
+
+import frappe
+from library_app import projection
+
+# Returned loans shown on a member profile, newest first
+HISTORY_LIMIT = 10
+
+SUMMARY_FIELDS = ["lifetime_loans", "total_fines"]
+
+def adjust_summary(member, loans=0, fines=0):
+	"""Move the lifetime loan count and fine total of a member"""
+	if not loans and not fines:
+		return
+	frappe.db.sql("""
+		UPDATE `tabMember`
+		SET lifetime_loans = IFNULL(lifetime_loans, 0) + %(loans)s,
+		    total_fines = IFNULL(total_fines, 0) + %(fines)s
+		WHERE name = %(member)s
+	""", {"member": member, "loans": loans, "fines": fines})
+
+def track_loan(loan):
+	"""Update the member summary after a loan is inserted or updated"""
+	previous = loan.get_doc_before_save()
+	if previous and previous.member != loan.member:
+		adjust_summary(previous.member, loans=-1, fines=-(previous.fine_amount or 0))
+		previous = None
+
+	if not previous:
+		adjust_summary(loan.member, loans=1, fines=loan.fine_amount or 0)
+	else:
+		adjust_summary(loan.member, fines=(loan.fine_amount or 0) - (previous.fine_amount or 0))
+
+def track_loan_removal(loan):
+	"""Update the member summary after a loan is deleted"""
+	adjust_summary(loan.member, loans=-1, fines=-(loan.fine_amount or 0))
+
+def rebuild_summaries():
+	"""Recompute every member summary from the Loan table"""
+	frappe.db.sql("""
+		UPDATE `tabMember` m
+		LEFT JOIN (
+			SELECT member, COUNT(*) as loan_count, SUM(IFNULL(fine_amount, 0)) as fines
+			FROM `tabLoan`
+			GROUP BY member
+		) loans ON loans.member = m.name
+		SET m.lifetime_loans = IFNULL(loans.loan_count, 0),
+		    m.total_fines = IFNULL(loans.fines, 0)
+	""")
+
+def load_profile(member, fields=None):
+	"""Load everything the member detail page shows, in two queries
+
+	The member row, with its stored summary, is read first. A single UNION
+	then fetches the active loans with their overdue days, the latest
+	returned loans and the open reservations with their place in the
+	queue, each joined to the title and author of its book.
+	"""
+	fields = projection.parse_fields("Member", fields)
+	row = projection.get_projection("Member", member, [*fields, *SUMMARY_FIELDS])
+	summary = {field: row[field] if field in fields else row.pop(field) for field in SUMMARY_FIELDS}
+
+	entries = frappe.db.sql("""
+		(SELECT 'active' as kind, l.name, l.book, b.title as book_title, b.author as book_author,
+			l.loan_date, l.return_date, NULL as actual_return_date, l.fine_amount,
+			GREATEST(DATEDIFF(%(today)s, l.return_date), 0) as overdue_days,
+			NULL as status, NULL as reserve_date, NULL as expiry_date, NULL as queue_position
+		FROM `tabLoan` l
+		LEFT JOIN `tabBook` b ON b.name = l.book
+		WHERE l.member = %(member)s AND l.returned = 0)
+		UNION ALL
+		(SELECT 'history', l.name, l.book, b.title, b.author,
+			l.loan_date, l.return_date, l.actual_return_date, l.fine_amount,
+			NULL, NULL, NULL, NULL, NULL
+		FROM `tabLoan` l
+		LEFT JOIN `tabBook` b ON b.name = l.book
+		WHERE l.member = %(member)s AND l.returned = 1
+		ORDER BY l.loan_date DESC
+		LIMIT %(history_limit)s)
+		UNION ALL
+		(SELECT 'reservation', r.name, r.book, b.title, b.author,
+			NULL, NULL, NULL, NULL, NULL,
+			r.status, r.reserve_date, r.expiry_date,
+			CASE WHEN r.status = 'Pending' THEN (
+				SELECT COUNT(*) + 1 FROM `tabReservation` q
+				WHERE q.book = r.book AND q.status = 'Pending' AND q.queue_sequence < r.queue_sequence
+			) END
+		FROM `tabReservation` r
+		LEFT JOIN `tabBook` b ON b.name = r.book
+		WHERE r.member = %(member)s AND r.status IN ('Pending', 'Ready'))
+	""", {"member": member, "today": date.today(), "history_limit": HISTORY_LIMIT}, as_dict=True)
+
+	loan_fields = ["name", "book", "book_title", "book_author", "loan_date", "return_date"]
+	active_loans = [
+		frappe._dict({field: entry[field] for field in [*loan_fields, "overdue_days"]})
+		for entry in entries if entry.kind == "active"
+	]
+	loan_history = [
+		frappe._dict({field: entry[field] for field in [*loan_fields, "actual_return_date", "fine_amount"]})
+		for entry in entries if entry.kind == "history"
+	]
+	reservations = [
+		frappe._dict({field: entry[field] for field in
+			["name", "book", "book_title", "book_author", "reserve_date", "status", "expiry_date", "queue_position"]})
+		for entry in entries if entry.kind == "reservation"
+	]
+
+	# A UNION does not keep the order of its branches
+	active_loans.sort(key=lambda loan: loan.loan_date, reverse=True)
+	loan_history.sort(key=lambda loan: loan.loan_date, reverse=True)
+	reservations.sort(key=lambda reservation: reservation.reserve_date, reverse=True)
+
+	summary.update(
+		active_loans=len(active_loans),
+		overdue_loans=sum(1 for loan in active_loans if loan.overdue_days)
+	)
+	return {
+		"member": row,
+		"summary": summary,
+		"active_loans": active_loans,
+		"loan_history": loan_history,
+		"reservations": reservations
+	}
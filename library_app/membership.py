@@ -0,0 +1,68 @@
+import frappe
+from frappe.utils import cint, now_datetime
+
+SEQUENCE_PREFIX = "library_membership_seq"
+
+# Largest block of IDs reserved by a single call
+MAX_BLOCK_SIZE = 10000
+
+def get_sequence_name(year):
+	return f"{SEQUENCE_PREFIX}_{cint(year)}"
+
+def format_membership_id(year, number):
+	"""Format LIB-YYYY-NNN, growing past three digits once a year passes 999"""
+	return f"LIB-{year}-{number:03d}"
+
+def get_last_number(year):
+	"""Get the highest membership number issued for a year"""
+	return cint(frappe.db.sql("""
+		SELECT MAX(CAST(SUBSTRING_INDEX(membership_id, '-', -1) AS UNSIGNED))
+		FROM `tabMember`
+		WHERE membership_id LIKE %(pattern)s
+	""", {"pattern": f"LIB-{cint(year)}-%"})[0][0])
+
+def ensure_sequence(year):
+	"""Create the membership sequence of a year, starting after the highest issued ID
+
+	This is DDL and commits the current transaction, so it runs from
+	after_migrate and the daily scheduler; allocation only falls back to
+	it when a sequence is unexpectedly missing.
+	"""
+	start = get_last_number(year) + 1
+	# Numbers are cached in memory for speed; a server restart may skip
+	# some, which is harmless for IDs that only need to be unique
+	frappe.db.sql_ddl(f"""
+		CREATE SEQUENCE IF NOT EXISTS `{get_sequence_name(year)}`
+		START WITH {start} INCREMENT BY 1 CACHE 100
+	""")
+
+def ensure_sequences():
+	"""Make sure this year's and next year's sequences exist"""
+	year = now_datetime().year
+	ensure_sequence(year)
+	ensure_sequence(year + 1)
+
+def allocate_membership_ids(count=1, year=None):
+	"""Reserve `count` membership IDs without taking any row lock
+
+	NEXTVAL is not transactional, so concurrent registrations never wait on
+	or collide with each other, and a block for a batch import is drawn in
+	one statement. IDs of a rolled back transaction are simply not reused.
+	"""
+	count = cint(count)
+	if count <= 0:
+		return []
+	if count > MAX_BLOCK_SIZE:
+		frappe.throw(f"At most {MAX_BLOCK_SIZE} membership IDs can be reserved at once")
+
+	year = cint(year) or now_datetime().year
+	query = f"SELECT NEXTVAL(`{get_sequence_name(year)}`) FROM seq_1_to_{count}"
+	try:
+		numbers = frappe.db.sql_list(query)
+	except Exception as e:
+		if not frappe.db.is_table_missing(e):
+			raise
+		ensure_sequence(year)
+		numbers = frappe.db.sql_list(query)
+
+	return [format_membership_id(year, number) for number in sorted(numbers)]
@@ -0,0 +1,341 @@
+import frappe
+from frappe.utils import add_to_date, now, now_datetime
+from library_app.settings import get_settings
+
+# Rows claimed per batch, and batches drained per worker run
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_MAX_BATCHES = 50
+
+# A failing notification is retried after 1, 2, 4, ... minutes, then given up
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 60
+
+# Seconds a drain owns the rows it claimed before another may reclaim them
+CLAIM_LEASE_SECONDS = 300
+
+OUTBOX_JOB_ID = "library_app_drain_outbox"
+
+# Subject and body templates (Jinja) per notification type; every template
+# sees the member and book rows plus the context stored with the event
+TEMPLATES = {
+	"Reservation Confirmed": (
+		"Reservation Confirmed: {{ book.title }}",
+		"""
+		Dear {{ member.name1 }},
+
+		Your reservation for "{{ book.title }}" by {{ book.author }} has been confirmed.
+
+		Queue Position: {{ queue_position }}
+		Reservation Date: {{ reserve_date }}
+
+		You will be notified when the book becomes available.
+
+		Best regards,
+		Library Management System
+		"""
+	),
+	"Reservation Ready": (
+		"Book Ready for Pickup: {{ book.title }}",
+		"""
+		Dear {{ member.name1 }},
+
+		Great news! Your reserved book "{{ book.title }}" by {{ book.author }} is now ready for pickup.
+
+		Please collect your book within {{ hold_days }} days, by {{ expiry_date }}, or your reservation will expire.
+
+		Best regards,
+		Library Management System
+		"""
+	),
+	"Reservation Reminder": (
+		"Reservation Expiring Tomorrow: {{ book.title }}",
+		"""
+		Dear {{ member.name1 }},
+
+		This is a reminder that your reservation for "{{ book.title }}" by {{ book.author }}
+		will expire tomorrow ({{ expiry_date }}).
+
+		Please collect your book today to avoid losing your reservation.
+
+		Best regards,
+		Library Management System
+		"""
+	),
+	"Overdue Digest": (
+		"{% if loans|length == 1 %}Overdue Book: {{ loans[0].book_title }}{% else %}{{ loans|length }} Overdue Books{% endif %}",
+		"""
+		Dear {{ member.name1 }},
+
+		This is a reminder that the following books are overdue:
+
+		{% for loan in loans %}- {{ loan.book_title }} by {{ loan.author }} (due {{ loan.return_date }}, {{ loan.days_overdue }} days overdue, fine ${{ "%.2f"|format(loan.days_overdue * fine_per_day) }})
+		{% endfor %}
+		Total Fine Amount: ${{ "%.2f"|format(total_fine) }}
+
+		Please return the books as soon as possible to avoid additional fines.
+
+		Best regards,
+		Library Management System
+		"""
+	)
+}
+
+def enqueue_notification(notification_type, member, dedupe_key, reference_doctype=None, reference_name=None, **context):
+	"""Record a notification in the current transaction and wake the outbox worker
+
+	Nothing is loaded or rendered here. An event whose dedupe_key was
+	already recorded is dropped, so callers racing to announce the same
+	event send a single email.
+	"""
+	enqueue_notifications([frappe._dict(
+		notification_type=notification_type,
+		member=member,
+		dedupe_key=dedupe_key,
+		reference_doctype=reference_doctype,
+		reference_name=reference_name,
+		context=context
+	)])
+
+def enqueue_notifications(notifications):
+	"""Record many notifications with one insert, as enqueue_notification does for one"""
+	if not notifications:
+		return
+
+	timestamp = now()
+	frappe.db.bulk_insert("Notification Outbox",
+		fields=[
+			"name", "notification_type", "dedupe_key", "status", "member",
+			"reference_doctype", "reference_name", "context", "attempts", "next_attempt_at",
+			"creation", "modified", "owner", "modified_by"
+		],
+		values=[(
+			frappe.generate_hash(length=10), n.notification_type, n.dedupe_key, "Queued", n.member,
+			n.reference_doctype, n.reference_name, frappe.as_json(n.context), 0, timestamp,
+			timestamp, timestamp, frappe.session.user, frappe.session.user
+		) for n in notifications],
+		ignore_duplicates=True
+	)
+	wake_worker()
+
+def wake_worker():
+	"""Start a drain job once this transaction commits, at most once per request"""
+	if getattr(frappe.local, "library_outbox_woken", False):
+		return
+	frappe.local.library_outbox_woken = True
+	frappe.enqueue("library_app.outbox.drain_outbox",
+		queue="short",
+		job_id=OUTBOX_JOB_ID,
+		deduplicate=True,
+		enqueue_after_commit=True
+	)
+
+def drain_outbox(batch_size=OUTBOX_BATCH_SIZE, max_batches=OUTBOX_MAX_BATCHES):
+	"""Hand due notifications to the Email Queue batch by batch
+
+	A batch is claimed with a committed lease before any mail is built:
+	its rows move to Sending until locked_until, so another drain (the
+	scheduler fallback or a second worker) skips them even when something
+	commits part way through. Each mail is queued in Email Queue in the
+	same transaction that marks its row Sent, so a crash keeps both or
+	neither and the expired lease lets the next drain pick the row up.
+	"""
+	metrics = {"sent": 0, "retried": 0, "failed": 0}
+	for outcome in requeue_undelivered().values():
+		metrics[outcome] += 1
+	frappe.db.commit()
+
+	for _ in range(max_batches):
+		rows = claim_batch(batch_size)
+		if not rows:
+			break
+
+		for outcome in send_batch(rows).values():
+			metrics[outcome] += 1
+		frappe.db.commit()
+	return metrics
+
+def claim_batch(batch_size):
+	"""Lease the next due notifications to this drain and commit the claim
+
+	Rows left Sending by a drain that died are reclaimed once their lease
+	has run out.
+	"""
+	timestamp = now()
+	rows = frappe.db.sql("""
+		SELECT name, notification_type, member, reference_doctype, reference_name, context, attempts
+		FROM `tabNotification Outbox`
+		WHERE (status = 'Queued' AND next_attempt_at <= %(now)s)
+		   OR (status = 'Sending' AND locked_until <= %(now)s)
+		ORDER BY next_attempt_at
+		LIMIT %(limit)s
+		FOR UPDATE SKIP LOCKED
+	""", {"now": timestamp, "limit": batch_size}, as_dict=True)
+	if not rows:
+		return rows
+
+	lease = add_to_date(now_datetime(), seconds=CLAIM_LEASE_SECONDS)
+	frappe.db.sql("""
+		UPDATE `tabNotification Outbox`
+		SET status = 'Sending', locked_until = %(lease)s, modified = %(now)s
+		WHERE name IN %(names)s
+	""", {"names": tuple(row.name for row in rows), "lease": lease, "now": timestamp})
+	frappe.db.commit()
+
+	for row in rows:
+		row.locked_until = lease
+	return rows
+
+def get_owned(rows):
+	"""Lock the claimed rows whose lease this drain still holds
+
+	A drain that outlived its lease may have lost rows to another drain;
+	those are left to their new owner.
+	"""
+	lease = rows[0].locked_until
+	return set(frappe.db.sql_list("""
+		SELECT name FROM `tabNotification Outbox`
+		WHERE name IN %(names)s AND status = 'Sending' AND locked_until = %(lease)s
+		FOR UPDATE
+	""", {"names": tuple(row.name for row in rows), "lease": lease}))
+
+def send_batch(rows):
+	"""Render claimed notifications into the Email Queue, returning the outcome per row
+
+	Members and books are read with one query each for the whole batch and
+	each template is compiled once. The mail is only queued here; Email
+	Queue delivers it, and requeue_undelivered handles what it gives up on.
+	"""
+	owned = get_owned(rows)
+	rows = [row for row in rows if row.name in owned]
+	if not rows:
+		return {}
+
+	contexts = {row.name: frappe.parse_json(row.context) or {} for row in rows}
+	members = get_rows("Member", {row.member for row in rows}, ["name", "name1", "email"])
+	books = get_rows("Book", {context.get("book") for context in contexts.values()}, ["name", "title", "author"])
+
+	jenv = frappe.get_jenv()
+	templates = {
+		notification_type: (jenv.from_string(subject), jenv.from_string(message))
+		for notification_type, (subject, message) in TEMPLATES.items()
+		if any(row.notification_type == notification_type for row in rows)
+	}
+	hold_days = get_settings().reservation_hold_days
+
+	outcomes = {}
+	communications = []
+	for row in rows:
+		context = contexts[row.name]
+		member = members.get(row.member)
+		frappe.db.savepoint("outbox_send")
+		try:
+			if not member or not member.email:
+				raise frappe.ValidationError(f"Member {row.member} has no email address")
+
+			subject_template, message_template = templates[row.notification_type]
+			values = {**context, "member": member, "book": books.get(context.get("book")), "hold_days": hold_days}
+			subject = subject_template.render(values).strip()
+			message = message_template.render(values)
+
+			email_queue = frappe.sendmail(
+				recipients=[member.email],
+				subject=subject,
+				message=message,
+				reference_doctype=row.reference_doctype,
+				reference_name=row.reference_name
+			)
+		except Exception as e:
+			frappe.db.rollback(save_point="outbox_send")
+			outcomes[row.name] = mark_failed(row, e)
+			continue
+
+		mark_sent(row, getattr(email_queue, "name", None))
+		outcomes[row.name] = "sent"
+
+		# Overdue digests are logged against every loan they list
+		for loan in context.get("loans", []):
+			communications.append({
+				"subject": subject,
+				"content": message,
+				"recipients": member.email,
+				"reference_name": loan["name"]
+			})
+
+	insert_communications(communications)
+	return outcomes
+
+def get_rows(doctype, names, fields):
+	"""Fetch many rows of a doctype by name in one query"""
+	names = [name for name in names if name]
+	if not names:
+		return {}
+	return {row.name: row for row in frappe.get_all(doctype, filters={"name": ["in", names]}, fields=fields)}
+
+def mark_sent(row, email_queue=None):
+	"""Record a notification handed to the Email Queue"""
+	frappe.db.sql("""
+		UPDATE `tabNotification Outbox`
+		SET status = 'Sent', attempts = attempts + 1, sent_at = %(now)s, email_queue = %(email_queue)s,
+		    locked_until = NULL, last_error = NULL, modified = %(now)s
+		WHERE name = %(name)s
+	""", {"name": row.name, "email_queue": email_queue, "now": now()})
+
+def requeue_undelivered():
+	"""Retry notifications whose mail the Email Queue failed to deliver
+
+	Email Queue records SMTP errors on its own row rather than raising
+	them, so its errored rows are matched back to the outbox and go
+	through mark_failed's backoff like any other failure.
+	"""
+	rows = frappe.db.sql("""
+		SELECT o.name, o.notification_type, o.attempts, eq.error
+		FROM `tabEmail Queue` eq
+		JOIN `tabNotification Outbox` o ON o.email_queue = eq.name
+		WHERE eq.status = 'Error' AND o.status = 'Sent'
+		FOR UPDATE SKIP LOCKED
+	""", as_dict=True)
+	return {row.name: mark_failed(row, row.error or "Email Queue could not deliver the mail") for row in rows}
+
+def mark_failed(row, error):
+	"""Schedule a retry with exponential backoff, or give up after MAX_ATTEMPTS"""
+	attempts = row.attempts + 1
+	status = "Failed" if attempts >= MAX_ATTEMPTS else "Queued"
+	next_attempt_at = add_to_date(now_datetime(), seconds=RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+
+	frappe.db.sql("""
+		UPDATE `tabNotification Outbox`
+		SET status = %(status)s, attempts = %(attempts)s, next_attempt_at = %(next_attempt_at)s,
+		    locked_until = NULL, last_error = %(error)s, modified = %(now)s
+		WHERE name = %(name)s
+	""", {
+		"name": row.name,
+		"status": status,
+		"attempts": attempts,
+		"next_attempt_at": next_attempt_at,
+		"error": str(error)[:1000],
+		"now": now()
+	})
+
+	if status == "Failed":
+		frappe.log_error(f"Giving up on {row.notification_type} notification {row.name}: {str(error)}")
+		return "failed"
+	return "retried"
+
+def insert_communications(communications):
+	"""Log sent emails against their loans in one insert"""
+	if not communications:
+		return
+
+	timestamp = now()
+	frappe.db.bulk_insert("Communication",
+		fields=[
+			"name", "communication_type", "communication_medium", "sent_or_received",
+			"subject", "content", "recipients", "reference_doctype", "reference_name",
+			"communication_date", "creation", "modified", "owner", "modified_by"
+		],
+		values=[(
+			frappe.generate_hash(length=10), "Communication", "Email", "Sent",
+			c["subject"], c["content"], c["recipients"], "Loan", c["reference_name"],
+			timestamp, timestamp, timestamp, "Administrator", "Administrator"
+		) for c in communications]
+	)
@@ -0,0 +1,185 @@
+import threading
+
+import frappe
+from frappe.utils import get_datetime, now_datetime, today
+from library_app.check_fixtures import create_book, create_members, remove_members
+
+# Notifications enqueued by the check, drains racing over them, and rows each claims at a time
+CHECK_NOTIFICATIONS = 20
+CHECK_DRAINS = 2
+CHECK_BATCH_SIZE = 5
+
+class SmtpStub:
+	"""aiosmtpd handler keeping the recipients of every mail it accepts"""
+	def __init__(self):
+		self.recipients = []
+		self.lock = threading.Lock()
+
+	async def handle_DATA(self, server, session, envelope):
+		with self.lock:
+			self.recipients.extend(envelope.rcpt_tos)
+		return "250 Message accepted for delivery"
+
+def use_stub_account(port):
+	"""Make an Email Account pointing at the stub the default outgoing one
+
+	Returns the account and the previous default, which restore_account
+	puts back.
+	"""
+	previous = frappe.db.get_value("Email Account", {"default_outgoing": 1}, "name")
+	account = frappe.get_doc({
+		"doctype": "Email Account",
+		"email_account_name": f"Outbox Check {frappe.generate_hash(length=6)}",
+		"email_id": "outbox-check@example.com",
+		"enable_incoming": 0,
+		"enable_outgoing": 1,
+		"default_outgoing": 1,
+		"smtp_server": "localhost",
+		"smtp_port": port,
+		"use_tls": 0,
+		"no_smtp_authentication": 1
+	})
+	account.insert(ignore_permissions=True)
+	frappe.db.commit()
+	return account.name, previous
+
+def restore_account(account, previous):
+	frappe.delete_doc("Email Account", account, ignore_permissions=True, force=True)
+	if previous:
+		frappe.db.set_value("Email Account", previous, "default_outgoing", 1)
+	frappe.db.commit()
+
+def create_fixture():
+	"""A book and one member per notification, committed so the drain threads see them"""
+	book = create_book("Outbox Check")
+	members = create_members(CHECK_NOTIFICATIONS, "Outbox Check")
+	frappe.db.commit()
+	return book, members
+
+def remove_fixture(book, members):
+	"""Delete the fixture with its outbox rows and queued mail"""
+	email_queues = frappe.get_all("Notification Outbox",
+		filters={"member": ["in", list(members)]}, pluck="email_queue")
+	email_queues = [name for name in email_queues if name]
+	if email_queues:
+		frappe.db.delete("Email Queue Recipient", {"parent": ["in", email_queues]})
+		frappe.db.delete("Email Queue", {"name": ["in", email_queues]})
+	frappe.db.delete("Notification Outbox", {"member": ["in", list(members)]})
+	remove_members(members)
+	frappe.delete_doc("Book", book, ignore_permissions=True, force=True)
+	frappe.db.commit()
+
+def run_drains(count):
+	"""Run drain_outbox from several connections at once"""
+	from library_app.outbox import drain_outbox
+
+	site = frappe.local.site
+	sites_path = frappe.local.sites_path
+	errors = []
+
+	def worker():
+		frappe.init(site=site, sites_path=sites_path)
+		try:
+			frappe.connect()
+			frappe.set_user("Administrator")
+			drain_outbox(batch_size=CHECK_BATCH_SIZE)
+		except Exception as e:
+			errors.append(repr(e))
+		finally:
+			frappe.destroy()
+
+	threads = [threading.Thread(target=worker) for _ in range(count)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	return errors
+
+def get_outbox_rows(members):
+	return frappe.get_all("Notification Outbox",
+		filters={"member": ["in", list(members)]},
+		fields=["name", "member", "status", "attempts", "email_queue", "next_attempt_at", "last_error"])
+
+def check_delivery(stub, book, members):
+	"""Drain concurrently, deliver through Email Queue and test the retry path"""
+	from library_app.outbox import enqueue_notifications, drain_outbox
+
+	# The check drains the outbox itself rather than waking the worker
+	frappe.local.library_outbox_woken = True
+	enqueue_notifications([frappe._dict(
+		notification_type="Reservation Confirmed",
+		member=member,
+		dedupe_key=f"outbox-check:{member}",
+		reference_doctype="Book",
+		reference_name=book,
+		context={"book": book, "queue_position": 1, "reserve_date": today()}
+	) for member in members])
+	frappe.db.commit()
+
+	problems = [f"drain failed: {error}" for error in run_drains(CHECK_DRAINS)]
+	rows = get_outbox_rows(members)
+
+	unsent = [row.name for row in rows if row.status != "Sent" or not row.email_queue]
+	if unsent:
+		problems.append(f"{len(unsent)} notifications were not handed to the Email Queue: {', '.join(unsent)}")
+	email_queues = [row.email_queue for row in rows if row.email_queue]
+	if len(set(email_queues)) != len(email_queues):
+		problems.append("a notification was queued as mail more than once")
+
+	for name in set(email_queues):
+		frappe.get_doc("Email Queue", name).send()
+	frappe.db.commit()
+
+	for member, email in members.items():
+		delivered = stub.recipients.count(email)
+		if delivered != 1:
+			problems.append(f"member {member} received {delivered} mails instead of one")
+
+	# An SMTP error is recorded on the Email Queue row, as Frappe does when delivery fails
+	failed = rows[0]
+	frappe.db.set_value("Email Queue", failed.email_queue, {"status": "Error", "error": "Rejected by the outbox check"})
+	frappe.db.commit()
+	drain_outbox(batch_size=CHECK_BATCH_SIZE)
+
+	row = next(row for row in get_outbox_rows(members) if row.name == failed.name)
+	if row.status != "Queued" or row.attempts != failed.attempts + 1 or get_datetime(row.next_attempt_at) <= now_datetime():
+		problems.append(f"an undelivered mail was not scheduled for a retry: {row}")
+
+	return problems
+
+def check_outbox_delivery(port=1025):
+	"""Send notifications through an SMTP stub and fail unless each arrives exactly once
+
+	Starts an aiosmtpd server on `port`, makes it the default outgoing
+	Email Account for the duration, and races several drains over a batch
+	of notifications before delivering the queued mail. A mail the Email
+	Queue reports as failed must go back to the outbox for a retry.
+	"""
+	try:
+		from aiosmtpd.controller import Controller
+	except ImportError:
+		frappe.throw("The outbox delivery check requires the aiosmtpd package")
+
+	if frappe.flags.mute_emails or frappe.conf.get("mute_emails"):
+		frappe.throw("Emails are muted on this site, unset mute_emails to run the check")
+
+	stub = SmtpStub()
+	controller = Controller(stub, hostname="localhost", port=port)
+	controller.start()
+	try:
+		account, previous = use_stub_account(port)
+		try:
+			book, members = create_fixture()
+			try:
+				problems = check_delivery(stub, book, members)
+			finally:
+				remove_fixture(book, members)
+		finally:
+			restore_account(account, previous)
+	finally:
+		controller.stop()
+
+	if problems:
+		frappe.throw("Outbox delivery check failed:\n" + "\n".join(problems))
+	print(f"{CHECK_NOTIFICATIONS} notifications delivered exactly once across {CHECK_DRAINS} drains, "
+		"and an undelivered mail was scheduled for a retry")
@@ -0,0 +1,95 @@
+from datetime import date, timedelta
+
+import frappe
+from frappe.utils import getdate, now
+from library_app import response_cache, statistics
+
+SWEEP_CHECKPOINT_KEY = "library_app_overdue_sweep_date"
+
+# Days past the due date at which an active loan enters each bucket, ascending
+OVERDUE_BUCKETS = [
+	(1, "1-7 Days"),
+	(8, "8-30 Days"),
+	(31, "Over 30 Days")
+]
+
+# Loans flagged per UPDATE when many become overdue at once
+SWEEP_CHUNK_SIZE = 1000
+
+def get_overdue_state(return_date, returned=0, today=None):
+	"""Work out the overdue flag and bucket of a loan as of today"""
+	if returned or not return_date:
+		return 0, None
+
+	days_overdue = ((today or date.today()) - getdate(return_date)).days
+	bucket = None
+	for threshold, label in OVERDUE_BUCKETS:
+		if days_overdue >= threshold:
+			bucket = label
+	return (1 if bucket else 0), bucket
+
+def sweep_overdue_loans():
+	"""Flag loans that became overdue, or moved bucket, since the last sweep
+
+	A loan enters a bucket on a known day (its due date plus the threshold),
+	so only loans whose due date falls in the window since the previous
+	sweep are read, through the (returned, return_date) index. Saving a
+	loan sets its state directly, so returns and extensions never wait for
+	the sweep. Running it again on the same day does nothing.
+	"""
+	today = date.today()
+	last_sweep = frappe.db.get_global(SWEEP_CHECKPOINT_KEY)
+	last_sweep = getdate(last_sweep) if last_sweep else None
+	if last_sweep and last_sweep >= today:
+		return 0
+
+	newly_overdue = 0
+	for threshold, bucket in OVERDUE_BUCKETS:
+		values = {"until": today - timedelta(days=threshold)}
+		window = "return_date <= %(until)s"
+		if last_sweep:
+			values["since"] = last_sweep - timedelta(days=threshold)
+			window += " AND return_date > %(since)s"
+
+		# Loans only ever move up, from no bucket or a lower one
+		lower = tuple(label for lower_threshold, label in OVERDUE_BUCKETS if lower_threshold < threshold)
+		moving = "overdue_bucket IS NULL"
+		if lower:
+			values["lower"] = lower
+			moving = "(overdue_bucket IS NULL OR overdue_bucket IN %(lower)s)"
+
+		# Lock the loans crossing into the bucket so a concurrent return
+		# cannot slip between the read and the update
+		loans = frappe.db.sql_list(f"""
+			SELECT name FROM `tabLoan`
+			WHERE returned = 0 AND {window} AND {moving}
+			FOR UPDATE
+		""", values)
+
+		for start in range(0, len(loans), SWEEP_CHUNK_SIZE):
+			chunk = loans[start:start + SWEEP_CHUNK_SIZE]
+			frappe.db.sql("""
+				UPDATE `tabLoan`
+				SET is_overdue = 1, overdue_bucket = %(bucket)s, modified = %(now)s
+				WHERE name IN %(loans)s
+			""", {"loans": tuple(chunk), "bucket": bucket, "now": now()})
+
+		# Every loan entering the first bucket is one more overdue loan
+		if threshold == OVERDUE_BUCKETS[0][0]:
+			newly_overdue = len(loans)
+
+	statistics.update_statistics({"overdue_loans": newly_overdue})
+	response_cache.invalidate(("Loan", None))
+	frappe.db.set_global(SWEEP_CHECKPOINT_KEY, str(today))
+	frappe.db.commit()
+	return newly_overdue
+
+def backfill_overdue_state():
+	"""Recompute the overdue state of every loan from scratch"""
+	frappe.db.sql("""
+		UPDATE `tabLoan`
+		SET is_overdue = 0, overdue_bucket = NULL
+		WHERE is_overdue = 1 OR overdue_bucket IS NOT NULL
+	""")
+	frappe.db.set_global(SWEEP_CHECKPOINT_KEY, None)
+	sweep_overdue_loans()
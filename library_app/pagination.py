@@ -0,0 +1,71 @@
+import base64
+import hashlib
+import json
+
+import frappe
+from frappe.query_builder import Order
+from frappe.utils import cint
+
+# Seconds a cached total stays valid for cursor pages
+TOTAL_ESTIMATE_TTL = 60
+
+def encode_cursor(row, sort_field):
+	"""Build an opaque cursor pointing just after the given row"""
+	payload = json.dumps([str(row.get(sort_field)), row.get("name")], separators=(",", ":"))
+	return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+	"""Decode a cursor into its (sort value, name) pair"""
+	try:
+		padded = cursor + "=" * (-len(cursor) % 4)
+		sort_value, name = json.loads(base64.urlsafe_b64decode(padded.encode()))
+		return sort_value, name
+	except Exception:
+		frappe.throw("Invalid pagination cursor")
+
+def get_keyset_page(doctype, sort_field, descending=False, filters=None, fields=None,
+		limit=20, cursor=None):
+	"""Fetch one page ordered by (sort_field, name), starting after the cursor"""
+	filters = frappe.parse_json(filters) if filters else {}
+	fields = list(frappe.parse_json(fields) if isinstance(fields, str) else fields)
+	limit = cint(limit) or 20
+
+	# The cursor is built from these, so they must always be selected
+	for field in (sort_field, "name"):
+		if field not in fields:
+			fields.append(field)
+
+	table = frappe.qb.DocType(doctype)
+	order = Order.desc if descending else Order.asc
+	query = (frappe.qb.get_query(doctype, fields=fields, filters=filters)
+		.orderby(table[sort_field], order=order)
+		.orderby(table.name, order=order)
+		.limit(limit + 1))
+
+	if cursor:
+		sort_value, name = decode_cursor(cursor)
+		if descending:
+			after = (table[sort_field] < sort_value) | ((table[sort_field] == sort_value) & (table.name < name))
+		else:
+			after = (table[sort_field] > sort_value) | ((table[sort_field] == sort_value) & (table.name > name))
+		query = query.where(after)
+
+	rows = query.run(as_dict=True)
+	next_cursor = None
+	if len(rows) > limit:
+		rows = rows[:limit]
+		next_cursor = encode_cursor(rows[-1], sort_field)
+
+	return rows, next_cursor
+
+def get_estimated_count(doctype, filters=None):
+	"""Get a row count, served from cache for a short while"""
+	filters = frappe.parse_json(filters) if filters else {}
+	digest = hashlib.md5(frappe.as_json(filters).encode()).hexdigest()
+	key = f"library_app:count:{doctype}:{digest}"
+
+	count = frappe.cache().get_value(key)
+	if count is None:
+		count = frappe.db.count(doctype, filters)
+		frappe.cache().set_value(key, count, expires_in_sec=TOTAL_ESTIMATE_TTL)
+	return count
@@ -0,0 +1,5 @@
+from library_app.member_profile import rebuild_summaries
+
+def execute():
+	"""Backfill lifetime loans and total fines of every member from existing loans"""
+	rebuild_summaries()
@@ -0,0 +1,7 @@
+from library_app.overdue import backfill_overdue_state
+from library_app.statistics import reconcile_statistics
+
+def execute():
+	"""Flag existing overdue loans and restart the sweep from today"""
+	backfill_overdue_state()
+	reconcile_statistics()
@@ -0,0 +1,5 @@
+from library_app.reservation_queue import backfill_sequences
+
+def execute():
+	"""Give existing reservations a per-book queue sequence"""
+	backfill_sequences()
@@ -0,0 +1,5 @@
+from library_app.search import rebuild_index
+
+def execute():
+	"""Index every existing book for search"""
+	rebuild_index()
@@ -0,0 +1,7 @@
+from library_app.inventory import create_initial_copies
+from library_app.statistics import reconcile_statistics
+
+def execute():
+	"""Turn every existing book into a title with one physical copy"""
+	create_initial_copies()
+	reconcile_statistics()
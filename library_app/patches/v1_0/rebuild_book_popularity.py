@@ -0,0 +1,5 @@
+from library_app.popularity import rebuild_popularity
+
+def execute():
+	"""Backfill the book popularity rollups from existing loans and reservations"""
+	rebuild_popularity()
@@ -0,0 +1,180 @@
+import frappe
+from frappe.utils import cint, getdate, now
+
+# Rolling windows offered by the popular books report, in days
+POPULARITY_WINDOWS = (30, 90, 365)
+
+def increment(doctype, name, keys, deltas):
+	"""Add deltas to the counters of a rollup row, creating it if needed"""
+	increment_many(doctype, {name: (keys, deltas)})
+
+def increment_many(doctype, rows):
+	"""Add deltas to many rollup rows with one multi-row upsert
+
+	`rows` maps a row name to its (keys, deltas); every row has the same
+	key fields, and a delta field missing from a row counts as zero.
+	"""
+	delta_fields = sorted({field for _, deltas in rows.values() for field, delta in deltas.items() if delta})
+	rows = {name: (keys, deltas) for name, (keys, deltas) in rows.items() if any(deltas.get(f) for f in delta_fields)}
+	if not rows:
+		return
+
+	key_fields = list(next(iter(rows.values()))[0])
+	columns = ["name"] + key_fields + delta_fields + ["creation", "modified", "owner", "modified_by"]
+	timestamp = now()
+	values = []
+	for name, (keys, deltas) in rows.items():
+		values += [name, *(keys[c] for c in key_fields), *(deltas.get(c, 0) for c in delta_fields),
+			timestamp, timestamp, "Administrator", "Administrator"]
+	row_placeholders = "(" + ", ".join(["%s"] * len(columns)) + ")"
+	updates = [f"`{c}` = `{c}` + VALUES(`{c}`)" for c in delta_fields] + ["modified = VALUES(modified)"]
+
+	frappe.db.sql(f"""
+		INSERT INTO `tab{doctype}` ({", ".join(f"`{c}`" for c in columns)})
+		VALUES {", ".join([row_placeholders] * len(rows))}
+		ON DUPLICATE KEY UPDATE {", ".join(updates)}
+	""", values)
+
+def increment_book(book, **deltas):
+	"""Add deltas to the lifetime counters of a book"""
+	increment("Book Popularity", book, {}, deltas)
+
+def increment_books(deltas):
+	"""Add deltas to the lifetime counters of many books, given as {book: {field: delta}}"""
+	increment_many("Book Popularity", {book: ({}, book_deltas) for book, book_deltas in deltas.items()})
+
+def increment_day(book, day, **deltas):
+	"""Add deltas to the daily bucket of a book"""
+	day = getdate(day)
+	increment("Book Popularity Daily", f"{book}|{day}", {"book": book, "day": day}, deltas)
+
+def increment_days(deltas):
+	"""Add deltas to many daily buckets, given as {(book, day): {field: delta}}"""
+	rows = {}
+	for (book, day), day_deltas in deltas.items():
+		day = getdate(day)
+		rows[f"{book}|{day}"] = ({"book": book, "day": day}, day_deltas)
+	increment_many("Book Popularity Daily", rows)
+
+def track_loan(loan):
+	"""Update rollups after a loan is inserted or updated"""
+	previous = loan.get_doc_before_save()
+	current_delta = (0 if loan.returned else 1) - (0 if not previous or previous.returned else 1)
+
+	if not previous:
+		increment_book(loan.book, loan_count=1, current_loans=current_delta)
+		increment_day(loan.book, loan.loan_date, loan_count=1)
+	else:
+		increment_book(loan.book, current_loans=current_delta)
+
+def track_loan_removal(loan):
+	"""Update rollups after a loan is deleted"""
+	increment_book(loan.book, loan_count=-1, current_loans=0 if loan.returned else -1)
+	increment_day(loan.book, loan.loan_date, loan_count=-1)
+
+def track_reservation(reservation):
+	"""Update rollups after a reservation is inserted or updated"""
+	previous = reservation.get_doc_before_save()
+	pending_delta = (1 if reservation.status == "Pending" else 0) - \
+		(1 if previous and previous.status == "Pending" else 0)
+
+	increment_book(reservation.book, pending_reservations=pending_delta)
+	if not previous:
+		increment_day(reservation.book, reservation.reserve_date, reservation_count=1)
+
+def track_reservation_removal(reservation):
+	"""Update rollups after a reservation is deleted"""
+	increment_book(reservation.book, pending_reservations=-1 if reservation.status == "Pending" else 0)
+	increment_day(reservation.book, reservation.reserve_date, reservation_count=-1)
+
+def remove_book(book):
+	"""Drop rollups of a deleted book"""
+	frappe.db.delete("Book Popularity", {"name": book})
+	frappe.db.delete("Book Popularity Daily", {"book": book})
+
+def rename_book(old_name, new_name):
+	"""Move rollups of a renamed book to its new name"""
+	frappe.db.sql("""
+		UPDATE `tabBook Popularity` SET name = %(new_name)s WHERE name = %(old_name)s
+	""", {"old_name": old_name, "new_name": new_name})
+	frappe.db.sql("""
+		UPDATE `tabBook Popularity Daily`
+		SET book = %(new_name)s, name = CONCAT(%(new_name)s, '|', day)
+		WHERE book = %(old_name)s
+	""", {"old_name": old_name, "new_name": new_name})
+
+def get_popular_books(limit=10, window=None):
+	"""Top books by loans, lifetime or over the last `window` days"""
+	limit = cint(limit) or 10
+	window = cint(window)
+
+	if not window:
+		return frappe.db.sql("""
+			SELECT b.name, b.title, b.author, b.category,
+			       p.loan_count, p.current_loans,
+			       p.pending_reservations as reservation_count
+			FROM `tabBook Popularity` p
+			JOIN `tabBook` b ON b.name = p.name
+			WHERE p.loan_count > 0 OR p.pending_reservations > 0
+			ORDER BY p.loan_count DESC, p.pending_reservations DESC
+			LIMIT %(limit)s
+		""", {"limit": limit}, as_dict=True)
+
+	if window not in POPULARITY_WINDOWS:
+		frappe.throw(f"Window must be one of {', '.join(map(str, POPULARITY_WINDOWS))} days")
+
+	return frappe.db.sql("""
+		SELECT b.name, b.title, b.author, b.category,
+		       d.loan_count, IFNULL(p.current_loans, 0) as current_loans,
+		       d.reservation_count
+		FROM (
+			SELECT book, SUM(loan_count) as loan_count, SUM(reservation_count) as reservation_count
+			FROM `tabBook Popularity Daily`
+			WHERE day > CURDATE() - INTERVAL %(window)s DAY
+			GROUP BY book
+		) d
+		JOIN `tabBook` b ON b.name = d.book
+		LEFT JOIN `tabBook Popularity` p ON p.name = d.book
+		WHERE d.loan_count > 0 OR d.reservation_count > 0
+		ORDER BY d.loan_count DESC, d.reservation_count DESC
+		LIMIT %(limit)s
+	""", {"limit": limit, "window": window}, as_dict=True)
+
+def rebuild_popularity():
+	"""Recompute all rollups from the Loan and Reservation tables"""
+	frappe.db.truncate("Book Popularity")
+	frappe.db.truncate("Book Popularity Daily")
+	timestamp = now()
+
+	# Loans and reservations are aggregated separately so each count is distinct
+	frappe.db.sql("""
+		INSERT INTO `tabBook Popularity`
+			(name, loan_count, current_loans, pending_reservations, creation, modified, owner, modified_by)
+		SELECT book, SUM(loan_count), SUM(current_loans), SUM(pending_reservations),
+		       %(now)s, %(now)s, 'Administrator', 'Administrator'
+		FROM (
+			SELECT book, COUNT(*) as loan_count, SUM(returned = 0) as current_loans, 0 as pending_reservations
+			FROM `tabLoan` GROUP BY book
+			UNION ALL
+			SELECT book, 0, 0, COUNT(*)
+			FROM `tabReservation` WHERE status = 'Pending' GROUP BY book
+		) counts
+		GROUP BY book
+	""", {"now": timestamp})
+
+	frappe.db.sql("""
+		INSERT INTO `tabBook Popularity Daily`
+			(name, book, day, loan_count, reservation_count, creation, modified, owner, modified_by)
+		SELECT CONCAT(book, '|', day), book, day, SUM(loan_count), SUM(reservation_count),
+		       %(now)s, %(now)s, 'Administrator', 'Administrator'
+		FROM (
+			SELECT book, loan_date as day, COUNT(*) as loan_count, 0 as reservation_count
+			FROM `tabLoan` GROUP BY book, loan_date
+			UNION ALL
+			SELECT book, reserve_date, 0, COUNT(*)
+			FROM `tabReservation` GROUP BY book, reserve_date
+		) counts
+		GROUP BY book, day
+	""", {"now": timestamp})
+
+	frappe.db.commit()
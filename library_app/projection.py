@@ -0,0 +1,62 @@
+import json
+
+import frappe
+
+try:
+	import orjson
+except ImportError:
+	orjson = None
+
+# Fields an API response carries for each doctype unless the caller asks for
+# others; standard fields such as owner, docstatus and idx are left out
+DEFAULT_FIELDS = {
+	"Book": ["name", "title", "author", "isbn", "publish_date", "is_available",
+		"total_copies", "available_copies", "description", "category"],
+	"Book Copy": ["name", "book", "barcode", "status", "location"],
+	"Member": ["name", "name1", "membership_id", "email", "phone", "address", "join_date", "status"],
+	"Loan": ["name", "book", "book_copy", "member", "loan_date", "return_date", "actual_return_date",
+		"returned", "is_overdue", "overdue_bucket", "fine_amount", "notes"],
+	"Reservation": ["name", "book", "member", "reserve_date", "status", "queue_sequence", "expiry_date", "notes"]
+}
+
+# Standard columns a caller may ask for on top of the doctype's own fields
+STANDARD_FIELDS = {"name", "creation", "modified", "owner", "modified_by"}
+
+def parse_fields(doctype, fields=None):
+	"""Resolve a requested projection to a list of valid fields
+
+	`fields` may be a list, a JSON list or a comma separated string. Unknown
+	fields are rejected rather than passed on to the query.
+	"""
+	if not fields:
+		return list(DEFAULT_FIELDS[doctype])
+	if isinstance(fields, str):
+		fields = frappe.parse_json(fields) if fields.lstrip().startswith("[") else fields.split(",")
+
+	fields = list(dict.fromkeys(field.strip() for field in fields if field and field.strip()))
+	valid = STANDARD_FIELDS | {df.fieldname for df in frappe.get_meta(doctype).fields}
+	unknown = [field for field in fields if field not in valid]
+	if unknown:
+		frappe.throw(f"Unknown {doctype} fields: {', '.join(unknown)}")
+	return fields
+
+def get_projection(doctype, name, fields=None):
+	"""Read the projected fields of one document straight from its row
+
+	Raises frappe.DoesNotExistError like frappe.get_doc, but no Document is
+	built, so child tables, meta defaults and permissions-on-load are skipped.
+	"""
+	row = frappe.db.get_value(doctype, name, parse_fields(doctype, fields), as_dict=True)
+	if row is None:
+		raise frappe.DoesNotExistError(f"{doctype} {name} not found")
+	return row
+
+def project(doc, fields=None):
+	"""Project a document already in memory, such as one just inserted or saved"""
+	return frappe._dict({field: doc.get(field) for field in parse_fields(doc.doctype, fields)})
+
+def dumps(value):
+	"""Serialize a response to compact JSON bytes, with orjson when installed"""
+	if orjson:
+		return orjson.dumps(value, default=str, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+	return json.dumps(value, default=str, sort_keys=True, separators=(",", ":")).encode()
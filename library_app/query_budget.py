@@ -0,0 +1,170 @@
+import re
+import time
+import traceback
+from collections import Counter
+
+import frappe
+from library_app.check_fixtures import create_book, create_members
+
+# Most queries each operation may run against the fixture in run_operations,
+# set to the count check-query-budgets prints plus QUERY_BUDGET_MARGIN
+QUERY_BUDGETS = {
+	"checkout": 36,
+	"reserve": 24,
+	"return": 56,
+	"cancel": 38
+}
+
+# Queries a budget keeps above the measured count; a budget further above
+# it fails the check too, so it is lowered when an operation gets cheaper
+QUERY_BUDGET_MARGIN = 3
+
+# The same statement run more often than this in one operation is an N+1
+REPEAT_THRESHOLD = 4
+
+class QueryCounter:
+	"""Count and fingerprint the queries run inside a with block
+
+	Wraps the connection's sql method the way frappe.recorder does, keeping
+	for every query its text, values, fingerprint and the library_app
+	frames that ran it.
+	"""
+	def __enter__(self):
+		self.queries = []
+		self.query_time = 0.0
+		self.sql = sql = frappe.db.sql
+
+		def counted_sql(query, *args, **kwargs):
+			start = time.perf_counter()
+			try:
+				return sql(query, *args, **kwargs)
+			finally:
+				self.query_time += time.perf_counter() - start
+				self.queries.append(frappe._dict(
+					query=str(query),
+					values=args[0] if args else kwargs.get("values"),
+					fingerprint=fingerprint(query),
+					stack=get_app_stack()
+				))
+
+		frappe.db.sql = counted_sql
+		return self
+
+	def __exit__(self, *exc):
+		frappe.db.sql = self.sql
+
+	@property
+	def count(self):
+		return len(self.queries)
+
+	def repeated(self, threshold=REPEAT_THRESHOLD):
+		"""Statements run more than `threshold` times, with the stack of the first"""
+		counts = Counter(query.fingerprint for query in self.queries)
+		return [
+			frappe._dict(
+				fingerprint=statement,
+				count=count,
+				stack=next(query.stack for query in self.queries if query.fingerprint == statement)
+			)
+			for statement, count in counts.most_common()
+			if count > threshold
+		]
+
+def fingerprint(query):
+	"""Reduce a query to its shape, so repeats with other values compare equal"""
+	query = str(query)
+	query = re.sub(r"'(?:[^'\\]|\\.)*'", "?", query)
+	query = re.sub(r"%\([^)]*\)s|%s|\b\d+(?:\.\d+)?\b", "?", query)
+	query = re.sub(r"\(\s*\?(?:\s*,\s*\?)*\s*\)", "(?+)", query)
+	return re.sub(r"\s+", " ", query).strip().lower()
+
+def get_app_stack():
+	"""The app frames of the current stack, innermost last"""
+	return [
+		f"{frame.filename.split('/library_app/', 1)[-1]}:{frame.lineno} {frame.name}"
+		for frame in traceback.extract_stack()
+		if "/library_app/" in frame.filename and not frame.filename.endswith("query_budget.py")
+	]
+
+def measure(operation, fn, *args, **kwargs):
+	"""Run an API call, failing if it errors, misses its budget or repeats a statement
+
+	A budget is missed when the call runs more queries than it allows, or
+	so many fewer that the budget would no longer catch a regression.
+	"""
+	with QueryCounter() as counter:
+		result = fn(*args, **kwargs)
+
+	if isinstance(result, dict) and not result.get("success"):
+		frappe.throw(f"{operation} failed: {result.get('error')}")
+
+	problems = []
+	budget = QUERY_BUDGETS[operation]
+	if counter.count > budget:
+		problems.append(f"ran {counter.count} queries, over its budget of {budget}")
+	elif counter.count + QUERY_BUDGET_MARGIN < budget:
+		problems.append(f"ran {counter.count} queries, lower its budget from {budget} to {counter.count + QUERY_BUDGET_MARGIN}")
+	for statement in counter.repeated():
+		stack = "\n    ".join(statement.stack)
+		problems.append(f"ran {statement.count} times: {statement.fingerprint}\n    {stack}")
+
+	print(f"{operation}: {counter.count} queries in {counter.query_time * 1000:.1f} ms "
+		f"(budget {budget})")
+	return result, problems
+
+# Copies of the fixture book and members queued for it; both exceed
+# REPEAT_THRESHOLD, so a statement run per copy or per queued reservation
+# shows up as an N+1
+FIXTURE_COPIES = 5
+FIXTURE_QUEUE_LENGTH = 10
+
+def create_fixture():
+	"""A book with several copies, a borrower per copy and a member per place in its queue"""
+	book = create_book("Query Budget", copies=FIXTURE_COPIES)
+	members = list(create_members(FIXTURE_COPIES + FIXTURE_QUEUE_LENGTH, "Query Budget"))
+	return book, members[:FIXTURE_COPIES], members[FIXTURE_COPIES:]
+
+def run_operations():
+	"""Check out, reserve, return and cancel on a fixture, measuring each call
+
+	The measured checkout takes the last free copy and the measured
+	reservation joins the end of a full queue, where both do the most
+	work. Everything runs in one transaction that is rolled back at the
+	end, so the site is left as it was.
+	"""
+	from library_app.api import loan, reservation
+
+	problems = {}
+	book, borrowers, queue = create_fixture()
+
+	loans = [loan.create_loan(book, borrower)["data"]["name"] for borrower in borrowers[:-1]]
+	result, problems["checkout"] = measure("checkout", loan.create_loan, book, borrowers[-1])
+	loans.append(result["data"]["name"])
+
+	for member in queue[:-1]:
+		reservation.create_reservation(book, member)
+	_, problems["reserve"] = measure("reserve", reservation.create_reservation, book, queue[-1])
+
+	# The return hands the copy to the first reservation in the queue
+	_, problems["return"] = measure("return", loan.return_book, loans[0])
+
+	ready = frappe.get_all("Reservation", filters={"book": book, "status": "Ready"}, pluck="name")
+	_, problems["cancel"] = measure("cancel", reservation.cancel_reservation, ready[0])
+
+	return {operation: found for operation, found in problems.items() if found}
+
+def check_query_budgets():
+	"""Fail with the offending statements if any operation breaks its query budget"""
+	from library_app.membership import ensure_sequences
+
+	# DDL commits, so it has to happen before the fixture is written
+	ensure_sequences()
+	try:
+		problems = run_operations()
+	finally:
+		frappe.db.rollback()
+
+	if problems:
+		details = "\n".join(f"{operation} {problem}" for operation, found in problems.items() for problem in found)
+		frappe.throw(f"Query budget missed:\n{details}")
+	print(f"All {len(QUERY_BUDGETS)} operations are within their query budget")
@@ -0,0 +1,149 @@
+from collections import Counter
+from datetime import timedelta
+
+import frappe
+from frappe.utils import getdate, now
+from library_app import outbox, popularity, response_cache, statistics
+from library_app.settings import get_settings
+
+def next_sequence(book):
+	"""Hand out the next queue sequence of a book
+
+	The counter lives on the Book row and is bumped with a single UPDATE,
+	so concurrent reservations for the same book are serialized on that
+	row lock and can never share a sequence. The UPDATE also moves the
+	book's modified timestamp, so saving a Book loaded before it fails the
+	timestamp check instead of writing back an old sequence.
+	"""
+	frappe.db.sql("""
+		UPDATE `tabBook`
+		SET reservation_sequence = LAST_INSERT_ID(IFNULL(reservation_sequence, 0) + 1),
+		    modified = %(now)s
+		WHERE name = %(book)s
+	""", {"book": book, "now": now()})
+	return frappe.db.sql("SELECT LAST_INSERT_ID()")[0][0]
+
+def get_queue_position(book, sequence):
+	"""Get the 1-based position of a pending reservation in its book's queue"""
+	ahead = frappe.db.sql("""
+		SELECT COUNT(*) FROM `tabReservation`
+		WHERE book = %(book)s AND status = 'Pending' AND queue_sequence < %(sequence)s
+	""", {"book": book, "sequence": sequence})[0][0]
+	return ahead + 1
+
+def backfill_sequences():
+	"""Number existing reservations per book in reservation order"""
+	frappe.db.sql("""
+		UPDATE `tabReservation` r
+		JOIN (
+			SELECT name, ROW_NUMBER() OVER (PARTITION BY book ORDER BY reserve_date, creation, name) as seq
+			FROM `tabReservation`
+		) ranked ON ranked.name = r.name
+		SET r.queue_sequence = ranked.seq
+	""")
+	frappe.db.sql("""
+		UPDATE `tabBook` b
+		JOIN (
+			SELECT book, MAX(queue_sequence) as last_sequence
+			FROM `tabReservation`
+			GROUP BY book
+		) queues ON queues.book = b.name
+		SET b.reservation_sequence = queues.last_sequence
+	""")
+
+def expire_reservations(today=None):
+	"""Expire every Ready reservation past its hold and pass the copies on
+
+	Set based: one UPDATE expires all lapsed holds and one ranked query
+	picks who the freed copies go to, whatever the number of reservations.
+	Reservation hooks do not run, so counters, rollups, cached responses
+	and emails are updated here. Running it again finds nothing to do.
+	"""
+	today = getdate(today)
+	expired = frappe.db.sql("""
+		SELECT name, book, member FROM `tabReservation`
+		WHERE status = 'Ready' AND expiry_date < %(today)s
+		ORDER BY name
+		FOR UPDATE
+	""", {"today": today}, as_dict=True)
+	if not expired:
+		return {"expired": 0, "promoted": 0}
+
+	frappe.db.sql("""
+		UPDATE `tabReservation`
+		SET status = 'Expired', modified = %(now)s
+		WHERE name IN %(names)s
+	""", {"names": tuple(r.name for r in expired), "now": now()})
+
+	statistics.update_statistics({"ready_reservations": -len(expired)})
+	response_cache.invalidate(("Reservation", None), *{("Book", r.book) for r in expired}, *{("Member", r.member) for r in expired})
+
+	promoted = promote_pending({r.book for r in expired}, today)
+	return {"expired": len(expired), "promoted": len(promoted)}
+
+def promote_pending(books, today=None):
+	"""Mark Ready the pending reservations that free copies of the books can serve
+
+	A book serves as many pending reservations, in queue order, as it has
+	free copies not already held for a Ready reservation, so a book is
+	never promoted twice for the same copy.
+	"""
+	if not books:
+		return []
+
+	today = getdate(today)
+	values = {"books": tuple(sorted(books))}
+
+	# Lock the books so checkouts and returns cannot move their free copies meanwhile
+	frappe.db.sql("""
+		SELECT name FROM `tabBook` WHERE name IN %(books)s ORDER BY name FOR UPDATE
+	""", values)
+
+	promoted = frappe.db.sql("""
+		SELECT ranked.name, ranked.book, ranked.member
+		FROM (
+			SELECT name, book, member,
+			       ROW_NUMBER() OVER (PARTITION BY book ORDER BY queue_sequence) as position
+			FROM `tabReservation`
+			WHERE status = 'Pending' AND book IN %(books)s
+		) ranked
+		JOIN `tabBook` b ON b.name = ranked.book
+		LEFT JOIN (
+			SELECT book, COUNT(*) as held
+			FROM `tabReservation`
+			WHERE status = 'Ready' AND book IN %(books)s
+			GROUP BY book
+		) ready ON ready.book = ranked.book
+		WHERE ranked.position <= b.available_copies - IFNULL(ready.held, 0)
+		ORDER BY ranked.book, ranked.position
+	""", values, as_dict=True)
+	if not promoted:
+		return []
+
+	expiry_date = today + timedelta(days=get_settings().reservation_hold_days)
+	frappe.db.sql("""
+		UPDATE `tabReservation`
+		SET status = 'Ready', expiry_date = %(expiry_date)s, modified = %(now)s
+		WHERE name IN %(names)s
+	""", {"names": tuple(r.name for r in promoted), "expiry_date": expiry_date, "now": now()})
+
+	statistics.update_statistics({
+		"pending_reservations": -len(promoted),
+		"ready_reservations": len(promoted)
+	})
+	popularity.increment_books({
+		book: {"pending_reservations": -count}
+		for book, count in Counter(r.book for r in promoted).items()
+	})
+	response_cache.invalidate(("Reservation", None), *{("Book", r.book) for r in promoted}, *{("Member", r.member) for r in promoted})
+
+	# Same dedupe key as Reservation.send_ready_notification
+	outbox.enqueue_notifications([frappe._dict(
+		notification_type="Reservation Ready",
+		member=r.member,
+		dedupe_key=f"reservation_ready:{r.name}",
+		reference_doctype="Reservation",
+		reference_name=r.name,
+		context={"book": r.book, "expiry_date": str(expiry_date)}
+	) for r in promoted])
+	return promoted
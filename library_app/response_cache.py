@@ -0,0 +1,187 @@
+import functools
+import hashlib
+import inspect
+import threading
+from collections import OrderedDict
+
+import frappe
+from library_app import projection
+
+# Seconds a cached response lives in Redis when nothing invalidates it
+RESPONSE_CACHE_TTL = 3600
+
+# Responses kept per process in front of Redis
+LOCAL_CACHE_SIZE = 512
+
+RESPONSE_KEY_PREFIX = "library_app:response"
+TAG_KEY_PREFIX = "library_app:cache_tag"
+
+# Read by responses that show the title and author of books they do not
+# otherwise depend on, such as member profiles
+BOOK_TITLES_TAG = ("Book Titles", None)
+
+# Documents whose cached responses change when a document of each doctype does
+DEPENDENCIES = {
+	"Book": lambda doc: [("Book", doc.name)] + (
+		[BOOK_TITLES_TAG] if doc.has_value_changed("title") or doc.has_value_changed("author") else []
+	),
+	"Book Copy": lambda doc: [("Book", doc.book)],
+	"Member": lambda doc: [("Member", doc.name)],
+	"Loan": lambda doc: [("Book", doc.book), ("Member", doc.member)],
+	"Reservation": lambda doc: [("Book", doc.book), ("Member", doc.member)]
+}
+
+# (site, key) -> entry, least recently used first; batch.run_parallel
+# reads it from several threads, so every access holds the lock
+_local_cache = OrderedDict()
+_local_cache_lock = threading.Lock()
+
+def get_tag_key(doctype, name=None):
+	"""Key of the version of one document, or of a whole doctype when name is None"""
+	return f"{TAG_KEY_PREFIX}:{doctype}:{name or '*'}"
+
+def get_tag_versions(tags):
+	"""Get the current version of every tag, creating missing ones"""
+	versions = {}
+	for doctype, name in tags:
+		key = get_tag_key(doctype, name)
+		version = frappe.cache().get_value(key)
+		if not version:
+			version = frappe.generate_hash(length=10)
+			frappe.cache().set_value(key, version)
+		versions[key] = version
+	return versions
+
+def invalidate(*tags):
+	"""Drop every cached response depending on the given (doctype, name) tags
+
+	A tag with a name also drops the doctype-wide tag, which list-style
+	responses such as reports depend on. Versions are bumped now and again
+	once the transaction commits, so a response recomputed from the old
+	data in between is not kept.
+	"""
+	keys = set()
+	for doctype, name in tags:
+		keys.add(get_tag_key(doctype))
+		if name:
+			keys.add(get_tag_key(doctype, name))
+
+	bump_tags(keys)
+
+	pending = getattr(frappe.local, "library_cache_pending_tags", None)
+	if pending is None:
+		pending = frappe.local.library_cache_pending_tags = set()
+		frappe.db.after_commit.add(flush_pending_tags)
+		frappe.db.after_rollback.add(discard_pending_tags)
+	pending |= keys
+
+def invalidate_doc(doc):
+	"""Drop the cached responses depending on a saved or deleted document"""
+	invalidate((doc.doctype, doc.name), *DEPENDENCIES[doc.doctype](doc))
+
+def bump_tags(keys):
+	for key in keys:
+		frappe.cache().set_value(key, frappe.generate_hash(length=10))
+
+def flush_pending_tags():
+	keys = getattr(frappe.local, "library_cache_pending_tags", None) or set()
+	frappe.local.library_cache_pending_tags = None
+	bump_tags(keys)
+
+def discard_pending_tags():
+	frappe.local.library_cache_pending_tags = None
+
+def get_entry(key, versions):
+	"""Get a cached entry if it was computed at the current tag versions"""
+	local_key = (frappe.local.site, key)
+	with _local_cache_lock:
+		entry = _local_cache.get(local_key)
+	if entry is None:
+		entry = frappe.cache().get_value(key, expires=True)
+	if entry is None or entry["versions"] != versions:
+		with _local_cache_lock:
+			_local_cache.pop(local_key, None)
+		return None
+
+	remember(local_key, entry)
+	return entry
+
+def set_entry(key, entry, ttl):
+	frappe.cache().set_value(key, entry, expires_in_sec=ttl)
+	remember((frappe.local.site, key), entry)
+
+def remember(local_key, entry):
+	with _local_cache_lock:
+		_local_cache[local_key] = entry
+		_local_cache.move_to_end(local_key)
+		while len(_local_cache) > LOCAL_CACHE_SIZE:
+			_local_cache.popitem(last=False)
+
+def make_etag(response):
+	return '"' + hashlib.md5(projection.dumps(response)).hexdigest() + '"'
+
+def cached(tags, ttl=RESPONSE_CACHE_TTL):
+	"""Cache the successful responses of a read endpoint, keyed on its arguments
+
+	`tags` maps the call's arguments to the (doctype, name) pairs the
+	response depends on; a name of None stands for every document of the
+	doctype. An entry is only served while none of its tags has been
+	invalidated since it was computed. Place it below @frappe.whitelist().
+
+	Entries live in Redis with a small LRU per process in front, which
+	still checks the tag versions in Redis on every read. The response
+	carries an ETag, and a GET repeating it in If-None-Match gets a 304.
+	Setting frappe.flags.library_bypass_response_cache skips the cache.
+	"""
+	def decorator(fn):
+		signature = inspect.signature(fn)
+		method = f"{fn.__module__}.{fn.__name__}"
+
+		@functools.wraps(fn)
+		def wrapper(*args, **kwargs):
+			# Form values such as cmd reach whitelisted methods too
+			kwargs = {k: v for k, v in kwargs.items() if k in signature.parameters}
+			if frappe.flags.library_bypass_response_cache:
+				return fn(*args, **kwargs)
+			bound = signature.bind(*args, **kwargs)
+			bound.apply_defaults()
+			arguments = dict(bound.arguments)
+
+			digest = hashlib.md5(projection.dumps(arguments)).hexdigest()
+			key = f"{RESPONSE_KEY_PREFIX}:{method}:{digest}"
+
+			# Versions are read before computing, so an invalidation racing
+			# with the computation leaves the entry already stale
+			versions = get_tag_versions(tags(**arguments))
+			entry = get_entry(key, versions)
+			if entry is None:
+				response = fn(**arguments)
+				if not (isinstance(response, dict) and response.get("success")):
+					return response
+
+				entry = {"versions": versions, "etag": make_etag(response), "response": response}
+				set_entry(key, entry, ttl)
+
+			frappe.local.library_response_etag = (method, entry["etag"])
+			return entry["response"]
+
+		return wrapper
+	return decorator
+
+def after_request(response, request):
+	"""Attach the ETag of a cached response and answer a matching GET with 304"""
+	etag = getattr(frappe.local, "library_response_etag", None)
+	frappe.local.library_response_etag = None
+	if not etag or response.status_code != 200:
+		return
+
+	# Only the endpoint that was called owns the response body
+	method, value = etag
+	if request.path.rstrip("/") != f"/api/method/{method}":
+		return
+
+	response.headers["ETag"] = value
+	response.headers["Cache-Control"] = "private, no-cache"
+	if request.method == "GET" and value in request.headers.get("If-None-Match", ""):
+		response.status_code = 304
+		response.set_data(b"")
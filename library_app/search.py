@@ -0,0 +1,203 @@
+import re
+import time
+import unicodedata
+
+import frappe
+from frappe.utils import cint, now
+
+# Weight of a token depending on the Book field it was taken from
+FIELD_WEIGHTS = {
+	"title": 8,
+	"author": 4,
+	"category": 2,
+	"isbn": 1,
+	"description": 1
+}
+
+# Multiplier applied when a query term matches a token exactly instead of by prefix
+EXACT_MATCH_BONUS = 2
+
+STOPWORDS = {"a", "an", "and", "by", "for", "in", "of", "on", "the", "to", "with"}
+
+MAX_TOKEN_LENGTH = 140
+
+ISBN_PATTERN = re.compile(r"^(\d{9}[\dX]|\d{13})$")
+
+def tokenize(text):
+	"""Split text into lowercase, accent-free search tokens"""
+	if not text:
+		return []
+
+	text = unicodedata.normalize("NFKD", str(text))
+	text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+	tokens = re.findall(r"[a-z0-9]+", text)
+
+	return [t[:MAX_TOKEN_LENGTH] for t in tokens if t not in STOPWORDS]
+
+def get_book_tokens(book):
+	"""Get the weighted tokens for a book, summing weights across fields"""
+	tokens = {}
+	for field, weight in FIELD_WEIGHTS.items():
+		for token in set(tokenize(book.get(field))):
+			tokens[token] = tokens.get(token, 0) + weight
+	return tokens
+
+def has_indexed_changes(book):
+	"""Check if any indexed field of a Book document changed in this save"""
+	return any(book.has_value_changed(field) for field in FIELD_WEIGHTS)
+
+def index_book(book):
+	"""Replace the index entries of a single book"""
+	remove_book(book.name)
+	insert_tokens([book])
+
+def remove_book(book_name):
+	"""Drop all index entries of a book"""
+	frappe.db.delete("Book Search Token", {"book": book_name})
+
+def rename_book(old_name, new_name):
+	"""Point index entries of a renamed book to its new name"""
+	frappe.db.sql("""
+		UPDATE `tabBook Search Token`
+		SET book = %(new_name)s
+		WHERE book = %(old_name)s
+	""", {"old_name": old_name, "new_name": new_name})
+
+def insert_tokens(books):
+	"""Bulk insert index entries for a list of books (docs or dicts)"""
+	timestamp = now()
+	values = []
+	for book in books:
+		for token, weight in get_book_tokens(book).items():
+			values.append((
+				frappe.generate_hash(length=10), token, book.get("name"), weight,
+				timestamp, timestamp, "Administrator", "Administrator"
+			))
+
+	if values:
+		frappe.db.bulk_insert("Book Search Token",
+			fields=["name", "token", "book", "weight", "creation", "modified", "owner", "modified_by"],
+			values=values
+		)
+	return len(values)
+
+def rebuild_index(chunk_size=1000):
+	"""Rebuild the whole book search index, committing per chunk"""
+	start_time = time.monotonic()
+	frappe.db.truncate("Book Search Token")
+
+	fields = ["name"] + list(FIELD_WEIGHTS)
+	last_name = ""
+	books_indexed = 0
+	tokens_indexed = 0
+
+	while True:
+		books = frappe.get_all("Book",
+			filters={"name": [">", last_name]},
+			fields=fields,
+			order_by="name asc",
+			limit=chunk_size
+		)
+		if not books:
+			break
+
+		tokens_indexed += insert_tokens(books)
+		books_indexed += len(books)
+		last_name = books[-1].name
+		frappe.db.commit()
+
+	elapsed = time.monotonic() - start_time
+	print(f"Indexed {books_indexed} books ({tokens_indexed} tokens) in {elapsed:.2f}s")
+	return {"books": books_indexed, "tokens": tokens_indexed, "seconds": elapsed}
+
+def normalize_isbn(query):
+	"""Return the query as a bare ISBN if it looks like one, else None"""
+	compact = re.sub(r"[\s-]", "", query or "").upper()
+	if ISBN_PATTERN.match(compact):
+		return compact
+	return None
+
+def search_books(query, limit=10):
+	"""Search books through the token index, best matches first"""
+	limit = cint(limit) or 10
+
+	isbn = normalize_isbn(query)
+	if isbn:
+		books = frappe.get_all("Book",
+			filters={"isbn": isbn},
+			fields=["name", "title", "author", "isbn", "is_available"],
+			limit=1
+		)
+		if books:
+			return books
+
+	terms = list(dict.fromkeys(tokenize(query)))
+	if not terms:
+		return []
+
+	values = {"limit": limit, "term_count": len(terms)}
+	subqueries = []
+	for i, term in enumerate(terms):
+		values[f"term_{i}"] = term
+		values[f"prefix_{i}"] = f"{term}%"
+		subqueries.append(f"""
+			SELECT book,
+			       MAX(weight * IF(token = %(term_{i})s, {EXACT_MATCH_BONUS}, 1)) AS score
+			FROM `tabBook Search Token`
+			WHERE token LIKE %(prefix_{i})s
+			GROUP BY book
+		""")
+
+	return frappe.db.sql(f"""
+		SELECT b.name, b.title, b.author, b.isbn, b.is_available
+		FROM (
+			SELECT book, SUM(score) AS score
+			FROM ({" UNION ALL ".join(subqueries)}) matches
+			GROUP BY book
+			HAVING COUNT(*) = %(term_count)s
+		) ranked
+		JOIN `tabBook` b ON b.name = ranked.book
+		ORDER BY ranked.score DESC, b.title ASC
+		LIMIT %(limit)s
+	""", values, as_dict=True)
+
+def search_books_like(query, limit=10):
+	"""Legacy LIKE based search, kept for benchmarking"""
+	return frappe.db.sql("""
+		SELECT name, title, author, isbn, is_available
+		FROM `tabBook`
+		WHERE title LIKE %(query)s
+		   OR author LIKE %(query)s
+		   OR isbn LIKE %(query)s
+		ORDER BY title
+		LIMIT %(limit)s
+	""", {
+		"query": f"%{query}%",
+		"limit": cint(limit) or 10
+	}, as_dict=True)
+
+def benchmark(queries=None, runs=5, limit=10):
+	"""Compare the token index against the LIKE path for a set of queries"""
+	if not queries:
+		titles = frappe.get_all("Book", fields=["title"], order_by="modified desc", limit=20)
+		queries = [tokens[0][:4] for tokens in (tokenize(t.title) for t in titles) if tokens]
+
+	def time_it(fn, query):
+		timings = []
+		for _ in range(runs):
+			start = time.perf_counter()
+			fn(query, limit)
+			timings.append(time.perf_counter() - start)
+		return sorted(timings)[len(timings) // 2] * 1000
+
+	results = []
+	for query in queries:
+		results.append({
+			"query": query,
+			"index_ms": round(time_it(search_books, query), 3),
+			"like_ms": round(time_it(search_books_like, query), 3)
+		})
+
+	for row in results:
+		print(f"{row['query']!r:>24}  index {row['index_ms']:>9.3f} ms   like {row['like_ms']:>9.3f} ms")
+	return results
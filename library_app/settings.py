@@ -0,0 +1,74 @@
+from dataclasses import dataclass, fields
+
+import frappe
+from frappe.utils import cint, flt
+from library_app import response_cache
+
+# Bumped on every save of Library Settings so other processes drop their copy
+SETTINGS_VERSION_KEY = "library_app:settings_version"
+
+@dataclass(frozen=True)
+class LibrarySettings:
+	"""Typed, read-only view of the Library Settings single doctype"""
+	default_loan_period: int = 14
+	max_loans_per_member: int = 5
+	fine_per_day: float = 1.0
+	due_soon_days: int = 3
+	reservation_hold_days: int = 3
+
+# site -> (version, LibrarySettings)
+_process_cache = {}
+
+def get_settings():
+	"""Get Library Settings, loaded at most once per request
+
+	Within a request the settings are kept on frappe.local. Across requests
+	each process keeps its last copy and reuses it for as long as the
+	version key in the shared cache is unchanged.
+	"""
+	settings = getattr(frappe.local, "library_settings", None)
+	if settings:
+		return settings
+
+	version = frappe.cache().get_value(SETTINGS_VERSION_KEY)
+	cached = _process_cache.get(frappe.local.site)
+
+	if version and cached and cached[0] == version:
+		settings = cached[1]
+	else:
+		if not version:
+			version = frappe.generate_hash(length=10)
+			frappe.cache().set_value(SETTINGS_VERSION_KEY, version)
+		settings = load_settings()
+		_process_cache[frappe.local.site] = (version, settings)
+
+	frappe.local.library_settings = settings
+	return settings
+
+def load_settings():
+	"""Read Library Settings from the database, falling back to defaults"""
+	values = frappe.db.get_singles_dict("Library Settings")
+	defaults = LibrarySettings()
+
+	converted = {}
+	for field in fields(LibrarySettings):
+		convert = flt if field.type is float else cint
+		converted[field.name] = convert(values.get(field.name)) or getattr(defaults, field.name)
+
+	return LibrarySettings(**converted)
+
+def clear_settings_cache():
+	"""Invalidate cached settings in every process
+
+	As with response_cache.invalidate, the version is bumped now and again
+	once the transaction commits, so a process that reloads the old values
+	in between does not keep them.
+	"""
+	bump_settings_version()
+	frappe.db.after_commit.add(bump_settings_version)
+	_process_cache.pop(frappe.local.site, None)
+	frappe.local.library_settings = None
+	response_cache.invalidate(("Library Settings", None))
+
+def bump_settings_version():
+	frappe.cache().set_value(SETTINGS_VERSION_KEY, frappe.generate_hash(length=10))
@@ -0,0 +1,130 @@
+import frappe
+from frappe.utils import now
+
+# How much a single document contributes to each dashboard counter
+CONTRIBUTIONS = {
+	"Book": lambda doc: {
+		"total_books": 1,
+		"available_books": 1 if doc.is_available else 0,
+		"books_on_loan": 0 if doc.is_available else 1
+	},
+	"Member": lambda doc: {
+		"total_members": 1,
+		"active_members": 1 if doc.status == "Active" else 0
+	},
+	"Loan": lambda doc: {
+		"total_loans": 1,
+		"active_loans": 0 if doc.returned else 1,
+		"overdue_loans": 1 if doc.is_overdue else 0
+	},
+	"Reservation": lambda doc: {
+		"pending_reservations": 1 if doc.status == "Pending" else 0,
+		"ready_reservations": 1 if doc.status == "Ready" else 0
+	}
+}
+
+STATISTICS = [
+	"total_books", "available_books", "books_on_loan",
+	"total_members", "active_members",
+	"total_loans", "active_loans", "overdue_loans",
+	"pending_reservations", "ready_reservations"
+]
+
+def compute_statistics():
+	"""Count every statistic straight from the tables"""
+	stats = {}
+
+	# Book statistics
+	stats['total_books'] = frappe.db.count('Book')
+	stats['available_books'] = frappe.db.count('Book', {'is_available': 1})
+	stats['books_on_loan'] = frappe.db.count('Book', {'is_available': 0})
+
+	# Member statistics
+	stats['total_members'] = frappe.db.count('Member')
+	stats['active_members'] = frappe.db.count('Member', {'status': 'Active'})
+
+	# Loan statistics
+	stats['total_loans'] = frappe.db.count('Loan')
+	stats['active_loans'] = frappe.db.count('Loan', {'returned': 0})
+	stats['overdue_loans'] = frappe.db.count('Loan', {'is_overdue': 1})
+
+	# Reservation statistics
+	stats['pending_reservations'] = frappe.db.count('Reservation', {'status': 'Pending'})
+	stats['ready_reservations'] = frappe.db.count('Reservation', {'status': 'Ready'})
+
+	return stats
+
+def store_statistics(stats):
+	"""Overwrite stored counters with the given values"""
+	timestamp = now()
+	for stat, value in stats.items():
+		frappe.db.sql("""
+			INSERT INTO `tabLibrary Statistic`
+				(name, value, as_of, creation, modified, owner, modified_by)
+			VALUES (%(stat)s, %(value)s, CURDATE(), %(now)s, %(now)s, 'Administrator', 'Administrator')
+			ON DUPLICATE KEY UPDATE value = VALUES(value), as_of = VALUES(as_of), modified = VALUES(modified)
+		""", {"stat": stat, "value": value, "now": timestamp})
+
+def get_statistics():
+	"""Get dashboard counters from the store without writing to it
+
+	Counters missing from the store are counted from the tables for this
+	call only; storing them is left to reconcile_statistics, which the
+	daily job and refresh_library_statistics run.
+	"""
+	stored = dict(frappe.db.sql("""
+		SELECT name, value FROM `tabLibrary Statistic`
+	"""))
+
+	if any(stat not in stored for stat in STATISTICS):
+		return compute_statistics()
+
+	# Loans falling overdue are counted in by the daily overdue sweep
+	return {stat: stored[stat] for stat in STATISTICS}
+
+def update_statistics(deltas):
+	"""Apply counter deltas inside the current transaction"""
+	# Sorted so concurrent transactions lock counter rows in the same order
+	for stat in sorted(deltas):
+		if deltas[stat]:
+			frappe.db.sql("""
+				UPDATE `tabLibrary Statistic`
+				SET value = value + %(delta)s
+				WHERE name = %(stat)s
+			""", {"stat": stat, "delta": deltas[stat]})
+
+def track_changes(doc):
+	"""Apply the counter deltas caused by inserting or updating a document"""
+	contribution = CONTRIBUTIONS[doc.doctype]
+	deltas = contribution(doc)
+
+	previous = doc.get_doc_before_save()
+	if previous:
+		for stat, value in contribution(previous).items():
+			deltas[stat] -= value
+
+	update_statistics(deltas)
+
+def track_removal(doc):
+	"""Apply the counter deltas caused by deleting a document"""
+	contribution = CONTRIBUTIONS[doc.doctype]
+	update_statistics({stat: -value for stat, value in contribution(doc).items()})
+
+def reconcile_statistics():
+	"""Recompute every counter from the tables and log any drift"""
+	stats = compute_statistics()
+
+	stored = dict(frappe.db.sql("""
+		SELECT name, value FROM `tabLibrary Statistic`
+	"""))
+	drift = {
+		stat: value - stored[stat]
+		for stat, value in stats.items()
+		if stat in stored and stored[stat] != value
+	}
+	if drift:
+		frappe.log_error(f"Library statistics drift corrected: {drift}")
+
+	store_statistics(stats)
+	frappe.db.commit()
+	return stats
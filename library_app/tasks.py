@@ -1,97 +1,118 @@
 import frappe
+import time
 from datetime import date, timedelta
+from library_app import outbox, overdue, reservation_queue
+from library_app.settings import get_settings
 
-def send_overdue_notifications():
-	"""Send email notifications for overdue books"""
+# Members handled per chunk; each chunk is committed and checkpointed
+OVERDUE_CHUNK_SIZE = 200
+
+OVERDUE_CHECKPOINT_KEY = "library_app_overdue_digest_checkpoint"
+CHECKPOINT_DONE = "__done__"
+
+def send_overdue_notifications(chunk_size=OVERDUE_CHUNK_SIZE):
+	"""Send one overdue digest email per member, in committed chunks"""
 	try:
-		# Get all overdue loans
-		overdue_loans = frappe.db.sql("""
-			SELECT l.name, l.book, b.title as book_title, b.author,
-			       l.member, m.name1 as member_name, m.email,
-			       l.loan_date, l.return_date,
-			       DATEDIFF(CURDATE(), l.return_date) as days_overdue
-			FROM `tabLoan` l
-			JOIN `tabBook` b ON l.book = b.name
-			JOIN `tabMember` m ON l.member = m.name
-			WHERE l.returned = 0 AND l.return_date < CURDATE()
-		""", as_dict=True)
+		start_time = time.monotonic()
+		today = str(date.today())
+		fine_per_day = get_settings().fine_per_day
+		
+		# Digests list the flagged loans, so flag today's first (no-op if done)
+		overdue.sweep_overdue_loans()
+		
+		# Resume after the last member handled by an interrupted run today
+		last_member = get_overdue_checkpoint(today)
+		metrics = {"members": 0, "loans": 0, "emails": 0, "chunks": 0}
+		
+		while last_member != CHECKPOINT_DONE:
+			members = frappe.db.sql_list("""
+				SELECT DISTINCT member FROM `tabLoan`
+				WHERE is_overdue = 1 AND member > %(after)s
+				ORDER BY member
+				LIMIT %(limit)s
+			""", {"after": last_member, "limit": chunk_size})
+			
+			if not members:
+				break
+			
+			overdue_loans = frappe.db.sql("""
+				SELECT l.name, l.book, b.title as book_title, b.author, l.member,
+				       l.loan_date, l.return_date,
+				       DATEDIFF(CURDATE(), l.return_date) as days_overdue
+				FROM `tabLoan` l
+				JOIN `tabBook` b ON l.book = b.name
+				WHERE l.is_overdue = 1 AND l.member IN %(members)s
+				ORDER BY l.member, l.return_date
+			""", {"members": tuple(members)}, as_dict=True)
+			
+			digests = {}
+			for loan in overdue_loans:
+				digests.setdefault(loan.member, []).append(loan)
+			
+			for loans in digests.values():
+				send_overdue_digest(loans, fine_per_day, today)
+			
+			last_member = members[-1]
+			set_overdue_checkpoint(today, last_member)
+			frappe.db.commit()
+			
+			metrics["members"] += len(digests)
+			metrics["emails"] += len(digests)
+			metrics["loans"] += len(overdue_loans)
+			metrics["chunks"] += 1
 		
-		for loan in overdue_loans:
-			send_overdue_email(loan)
+		set_overdue_checkpoint(today, CHECKPOINT_DONE)
 		
 		# Process expired reservations
 		process_expired_reservations()
 		
 		frappe.db.commit()
-		print(f"Processed {len(overdue_loans)} overdue notifications")
+		
+		elapsed = time.monotonic() - start_time
+		metrics["seconds"] = round(elapsed, 3)
+		metrics["loans_per_second"] = round(metrics["loans"] / elapsed, 1) if elapsed else 0
+		print(f"Processed {metrics['loans']} overdue loans for {metrics['members']} members "
+			f"in {metrics['chunks']} chunks ({metrics['loans_per_second']} loans/s)")
+		return metrics
 		
 	except Exception as e:
 		frappe.log_error(f"Error in overdue notifications: {str(e)}")
 
-def send_overdue_email(loan):
-	"""Send overdue email to member"""
-	try:
-		fine_per_day = frappe.db.get_single_value("Library Settings", "fine_per_day") or 1.0
-		total_fine = loan.days_overdue * fine_per_day
-		
-		subject = f"Overdue Book: {loan.book_title}"
-		message = f"""
-		Dear {loan.member_name},
-		
-		This is a reminder that the following book is overdue:
-		
-		Book: {loan.book_title} by {loan.author}
-		Loan Date: {loan.loan_date}
-		Due Date: {loan.return_date}
-		Days Overdue: {loan.days_overdue}
-		Fine Amount: ${total_fine:.2f}
-		
-		Please return the book as soon as possible to avoid additional fines.
-		
-		Best regards,
-		Library Management System
-		"""
-		
-		frappe.sendmail(
-			recipients=[loan.email],
-			subject=subject,
-			message=message
-		)
-		
-		# Log the notification
-		frappe.get_doc({
-			"doctype": "Communication",
-			"communication_type": "Email",
-			"subject": subject,
-			"content": message,
-			"sent_or_received": "Sent",
-			"reference_doctype": "Loan",
-			"reference_name": loan.name
-		}).insert(ignore_permissions=True)
-		
-	except Exception as e:
-		frappe.log_error(f"Error sending overdue email for loan {loan.name}: {str(e)}")
+def get_overdue_checkpoint(today):
+	"""Get the last member notified by today's run, or an empty string"""
+	checkpoint = frappe.db.get_global(OVERDUE_CHECKPOINT_KEY) or ""
+	run_date, _, last_member = checkpoint.partition("|")
+	return last_member if run_date == today else ""
+
+def set_overdue_checkpoint(today, last_member):
+	"""Record progress of today's run"""
+	frappe.db.set_global(OVERDUE_CHECKPOINT_KEY, f"{today}|{last_member}")
+
+def send_overdue_digest(loans, fine_per_day, today):
+	"""Queue a single email listing all overdue loans of one member"""
+	member = loans[0].member
+	outbox.enqueue_notification("Overdue Digest", member,
+		dedupe_key=f"overdue_digest:{member}:{today}",
+		reference_doctype="Member",
+		reference_name=member,
+		loans=[{
+			"name": loan.name,
+			"book_title": loan.book_title,
+			"author": loan.author,
+			"return_date": str(loan.return_date),
+			"days_overdue": loan.days_overdue
+		} for loan in loans],
+		fine_per_day=fine_per_day,
+		total_fine=sum(loan.days_overdue for loan in loans) * fine_per_day
+	)
 
 def process_expired_reservations():
-	"""Process expired reservations"""
+	"""Expire lapsed holds and pass their copies to the next in line"""
 	try:
-		expired_reservations = frappe.get_all("Reservation",
-			filters={
-				"status": "Ready",
-				"expiry_date": ["<", date.today()]
-			}
-		)
-		
-		for res in expired_reservations:
-			reservation = frappe.get_doc("Reservation", res.name)
-			reservation.status = "Expired"
-			reservation.save()
-			
-			# Process next in queue
-			book = frappe.get_doc("Book", reservation.book)
-			book.process_reservations()
-		
-		print(f"Processed {len(expired_reservations)} expired reservations")
+		result = reservation_queue.expire_reservations()
+		frappe.db.commit()
+		print(f"Expired {result['expired']} reservations and promoted {result['promoted']}")
+		return result
 		
 	except Exception as e:
 		frappe.log_error(f"Error processing expired reservations: {str(e)}")
@@ -101,34 +122,25 @@ def send_reservation_reminders():
 	try:
 		tomorrow = date.today() + timedelta(days=1)
 		
-		expiring_reservations = frappe.db.sql("""
-			SELECT r.name, r.book, b.title as book_title, b.author,
-			       r.member, m.name1 as member_name, m.email,
-			       r.expiry_date
-			FROM `tabReservation` r
-			JOIN `tabBook` b ON r.book = b.name
-			JOIN `tabMember` m ON r.member = m.name
-			WHERE r.status = 'Ready' AND r.expiry_date = %(tomorrow)s
-		""", {"tomorrow": tomorrow}, as_dict=True)
+		expiring_reservations = frappe.get_all("Reservation",
+			filters={
+				"status": "Ready",
+				"expiry_date": tomorrow
+			},
+			fields=["name", "book", "member", "expiry_date"]
+		)
 		
 		for reservation in expiring_reservations:
-			frappe.sendmail(
-				recipients=[reservation.email],
-				subject=f"Reservation Expiring Tomorrow: {reservation.book_title}",
-				message=f"""
-				Dear {reservation.member_name},
-				
-				This is a reminder that your reservation for "{reservation.book_title}" by {reservation.author} 
-				will expire tomorrow ({reservation.expiry_date}).
-				
-				Please collect your book today to avoid losing your reservation.
-				
-				Best regards,
-				Library Management System
-				"""
+			outbox.enqueue_notification("Reservation Reminder", reservation.member,
+				dedupe_key=f"reservation_reminder:{reservation.name}:{reservation.expiry_date}",
+				reference_doctype="Reservation",
+				reference_name=reservation.name,
+				book=reservation.book,
+				expiry_date=str(reservation.expiry_date)
 			)
 		
-		print(f"Sent {len(expiring_reservations)} reservation reminders")
+		frappe.db.commit()
+		print(f"Queued {len(expiring_reservations)} reservation reminders")
 		
 	except Exception as e:
 		frappe.log_error(f"Error sending reservation reminders: {str(e)}")